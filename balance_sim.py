@@ -0,0 +1,257 @@
+import argparse
+import collections
+import concurrent.futures
+import importlib
+import json
+import os
+import time
+
+import numpy as np
+
+import space_game
+from space_game import SpaceGameSimulation, TICK_RATE
+
+# Plays thousands of seeded games without a window, each flown by a
+# scripted pilot, across every CPU core, and summarizes how far they got
+# and what hurt them. Used to tune KILL_COUNT_THRESHOLDS, the spawn timer
+# tables and COLLECTABLES_ON_STAGE without playing by hand.
+#
+# Runs aren't cheap: one core plays about 4,000 ticks per second. Enemies
+# that ram the player aren't replaced, so many games reach a point where
+# every enemy of the stage has spawned and gone without enough kills to
+# clear it. Those games can't get any further and are stopped there as
+# stalled instead of flying on until BALANCE_TICKS. With DodgePilot that
+# leaves about 1.5 core-seconds per game, almost all of it in games that
+# are still clearing stages when they die, so 10,000 runs take about 4
+# core-hours: roughly 16 minutes on a 16 core workstation. Divide by the
+# number of workers for the wall clock time.
+#
+#   python balance_sim.py --runs 1000
+#   python balance_sim.py --pilot my_pilots:CarefulPilot --output runs.json
+#   python balance_sim.py --record telemetry.db
+
+# Ticks each game runs for at most, and the default number of games
+BALANCE_TICKS = 18000
+BALANCE_RUNS = 1000
+# Games given to a worker process at a time
+BALANCE_CHUNK_SIZE = 16
+
+# Keys a pilot holds down to steer, by direction
+PILOT_KEYS = {
+    "left": space_game.arcade.key.LEFT,
+    "right": space_game.arcade.key.RIGHT,
+    "up": space_game.arcade.key.UP,
+    "down": space_game.arcade.key.DOWN,
+}
+
+# Flies the player by pressing and releasing keys before each tick, the
+# same way a person would, so a pilot can't do anything a player can't.
+# Subclasses override act, which is called once before every tick.
+class Pilot:
+    def __init__(self, game):
+        self.game = game
+        self.held = dict.fromkeys(PILOT_KEYS, False)
+
+    def hold(self, direction, down):
+        if self.held[direction] != down:
+            self.held[direction] = down
+            key = PILOT_KEYS[direction]
+            if down:
+                self.game.on_key_press(key, 0)
+            else:
+                self.game.on_key_release(key, 0)
+
+    # Holds the keys that move the player towards x, within tolerance
+    def steer_to(self, x, tolerance = 8):
+        offset = x - self.game.player.center_x
+        self.hold("left", offset < -tolerance)
+        self.hold("right", offset > tolerance)
+
+    # Fires whenever the shoot cooldown allows
+    def shoot(self):
+        self.game.on_key_press(space_game.arcade.key.SPACE, 0)
+        self.game.on_key_release(space_game.arcade.key.SPACE, 0)
+
+    def act(self):
+        pass
+
+# Sits still and fires
+class TurretPilot(Pilot):
+    def act(self):
+        self.shoot()
+
+# Distance above the player that DodgePilot looks for threats in, and how
+# far to either side
+DODGE_LOOKAHEAD = 300
+DODGE_MARGIN = 70
+
+# Fires constantly, lines up under the nearest enemy, grabs collectables
+# that are close, and moves away from enemy bullets, enemies and obstacles
+# about to hit it
+class DodgePilot(Pilot):
+    def act(self):
+        game = self.game
+        player = game.player
+        self.shoot()
+
+        projectiles = game.projectiles
+        count = projectiles.count
+        above = projectiles.y[:count] - player.center_y
+        beside = np.abs(projectiles.x[:count] - player.center_x)
+        close = projectiles.x[:count][~projectiles.friendly[:count] & (above > 0)
+                                      & (above < DODGE_LOOKAHEAD) & (beside < DODGE_MARGIN)].tolist()
+        for sprite_list in (game.enemy_list, game.obstacle_list):
+            for sprite in sprite_list:
+                if not sprite.in_pool and 0 < sprite.center_y - player.center_y < DODGE_LOOKAHEAD \
+                        and abs(sprite.center_x - player.center_x) < DODGE_MARGIN + sprite.width / 2:
+                    close.append(sprite.center_x)
+        if close:
+            # Move to whichever side has more room from the threats
+            away = player.center_x - sum(close) / len(close)
+            direction = 1 if away >= 0 else -1
+            if not (space_game.GAME_AREA_LEFT + DODGE_MARGIN < player.center_x + direction * DODGE_MARGIN
+                    < space_game.GAME_AREA_RIGHT - DODGE_MARGIN):
+                direction = -direction
+            self.steer_to(player.center_x + direction * DODGE_MARGIN)
+            return
+
+        collectables = [collectable for collectable in game.collectable_list
+                        if not collectable.in_pool and collectable.center_y < player.center_y + DODGE_LOOKAHEAD]
+        if collectables:
+            self.steer_to(min(collectables, key = lambda sprite: sprite.center_y).center_x)
+            return
+        enemies = [enemy for enemy in game.enemy_list if not enemy.in_pool]
+        if enemies:
+            self.steer_to(min(enemies, key = lambda enemy: abs(enemy.center_x - player.center_x)).center_x)
+        else:
+            self.steer_to(player.center_x)
+
+# Built in pilots, by the name given to --pilot
+PILOTS = {
+    "turret": TurretPilot,
+    "dodge": DodgePilot,
+}
+
+# Returns the pilot class for a built in pilot name or "module:Class"
+def get_pilot(name):
+    if name in PILOTS:
+        return PILOTS[name]
+    module_name, _, class_name = name.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+# Returns whether the game can never clear its stage: every enemy of the
+# stage has spawned, none are left, and there weren't enough kills
+def is_stalled(game):
+    threshold = space_game.KILL_COUNT_THRESHOLDS[game.stage - 1]
+    return game.enemies_spawned >= threshold and game.kills < threshold \
+        and all(enemy.in_pool for enemy in game.enemy_list)
+
+# Plays one game with the given seed and returns its run stats (see
+# SpaceGameSimulation.get_run_stats), plus whether it was stopped early
+# because it stalled. Runs in a worker process.
+def play_game(seed, pilot_name, ticks):
+    game = SpaceGameSimulation(seed)
+    game.setup()
+    pilot = get_pilot(pilot_name)(game)
+    stalled = False
+    for _ in range(ticks):
+        pilot.act()
+        game.tick()
+        if game.game_over:
+            break
+        if is_stalled(game):
+            stalled = True
+            break
+    stats = game.get_run_stats()
+    stats["stalled"] = stalled
+    return stats
+
+def play_games(seeds, pilot_name, ticks, workers):
+    with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as executor:
+        return list(executor.map(play_game, seeds, [pilot_name] * len(seeds), [ticks] * len(seeds),
+                                 chunksize = BALANCE_CHUNK_SIZE))
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+# Prints tables of how far the runs got, how long each stage took, what
+# damaged the player, and how each collectable relates to the stage reached
+def summarize(runs, ticks):
+    print(f"Runs: {len(runs)}, average stage reached: {mean([run['stage'] for run in runs]):.2f}, "
+          f"survived all {ticks} ticks: {sum(run['ticks'] >= ticks for run in runs)}, "
+          f"stalled: {sum(run.get('stalled', False) for run in runs)}")
+
+    print("\nStage reached    Runs  Share  Avg seconds  Stalled  Top death cause")
+    stages = collections.Counter(run["stage"] for run in runs)
+    for stage in sorted(stages):
+        stage_runs = [run for run in runs if run["stage"] == stage]
+        stalled = sum(run.get("stalled", False) for run in stage_runs)
+        deaths = collections.Counter(run["death_cause"] for run in stage_runs
+                                     if run["ticks"] < ticks and not run.get("stalled", False))
+        top_cause = "none"
+        if deaths:
+            cause, count = deaths.most_common(1)[0]
+            top_cause = f"{cause} ({count / sum(deaths.values()):.0%} of {sum(deaths.values())} deaths)"
+        print(f"{stage:>13} {len(stage_runs):>7} {len(stage_runs) / len(runs):>6.1%} "
+              f"{mean([run['ticks'] for run in stage_runs]) / TICK_RATE:>12.1f} {stalled:>8}  {top_cause}")
+
+    print("\nStage  Cleared by  Avg seconds in stage")
+    stage_times = collections.defaultdict(list)
+    for run in runs:
+        # The last entry is the stage the run ended on, which wasn't cleared
+        for stage, stage_ticks in enumerate(run["stage_ticks"][:-1], 1):
+            stage_times[stage].append(stage_ticks)
+    for stage in sorted(stage_times):
+        print(f"{stage:>5} {len(stage_times[stage]):>11} {mean(stage_times[stage]) / TICK_RATE:>21.1f}")
+
+    print("\nDamage source                Total  Share")
+    damage = collections.Counter()
+    for run in runs:
+        damage.update(run["damage_taken"])
+    total_damage = sum(damage.values()) or 1
+    for source, amount in damage.most_common():
+        print(f"{source:<26} {amount:>8} {amount / total_damage:>6.1%}")
+
+    print("\nCollectable           Picked up  Avg stage with  Avg stage without")
+    types = sorted({type for run in runs for type in run["collected"]})
+    for type in types:
+        with_type = [run["stage"] for run in runs if run["collected"].get(type)]
+        without_type = [run["stage"] for run in runs if not run["collected"].get(type)]
+        total = sum(run["collected"].get(type, 0) for run in runs)
+        print(f"{type:<20} {total:>10} {mean(with_type):>15.2f} {mean(without_type):>18.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description = "Play seeded games with a scripted pilot "
+                                                   "and summarize how they went.")
+    parser.add_argument("--runs", type = int, default = BALANCE_RUNS)
+    parser.add_argument("--first-seed", type = int, default = 0)
+    parser.add_argument("--ticks", type = int, default = BALANCE_TICKS,
+                        help = "ticks each game runs for at most")
+    parser.add_argument("--pilot", default = "dodge",
+                        help = f"one of {', '.join(PILOTS)}, or module:Class for a Pilot subclass")
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--output", help = "file to save every run's stats to as JSON")
+    parser.add_argument("--record", help = "telemetry database to record every run to")
+    args = parser.parse_args()
+    get_pilot(args.pilot)
+
+    seeds = list(range(args.first_seed, args.first_seed + args.runs))
+    start_time = time.perf_counter()
+    runs = play_games(seeds, args.pilot, args.ticks, args.workers)
+    elapsed = time.perf_counter() - start_time
+    print(f"Played {len(runs)} games in {elapsed:.1f}s with {args.workers} workers "
+          f"({sum(run['ticks'] for run in runs) / elapsed:.0f} ticks per second, "
+          f"{elapsed * args.workers / len(runs):.2f} core-seconds per game)\n")
+    summarize(runs, args.ticks)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(runs, file)
+    if args.record is not None:
+        telemetry = space_game.TelemetryStore(args.record)
+        for run in runs:
+            telemetry.record_run(run)
+        telemetry.close()
+
+if __name__ == "__main__":
+    main()
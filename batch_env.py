@@ -0,0 +1,367 @@
+import argparse
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import space_game
+from space_game import SpaceGameSimulation
+
+# Runs many independent games in lockstep for training automated pilots.
+# Every game follows the same rules as SpaceGameView, but is stepped
+# without a window, and everything a pilot sees or is given back is kept in
+# one NumPy array per value, with row i of every array belonging to game i:
+#
+#   env = BatchEnv(256, workers = 8)
+#   observations = env.reset()
+#   while training:
+#       actions = choose_actions(observations)
+#       observations, rewards, dones = env.step(actions)
+#   env.close()
+#
+# This is not a vectorized environment. Only the actions, observations,
+# rewards and done flags are batch-major arrays. Each game is still its own
+# SpaceGameSimulation, with its own sprite lists and pools, stepped one
+# after another in a Python loop, so a step of N games costs N ticks and
+# steps per second don't grow with N inside one process. Stepping the game
+# rules themselves as batch-wide NumPy operations would mean rewriting
+# them apart from SpaceGameSimulation.
+#
+# Any scaling comes from splitting the games across worker processes. The
+# arrays are then kept in shared memory, so each worker writes straight
+# into its own rows and nothing but a one byte command and reply passes
+# between processes for a step. That only helps while there are idle cores
+# for the workers: on a single core, 1, 2 and 4 workers measured 1.0-1.1x
+# the steps per second of one. Measure the scaling on the machine that will
+# train with benchmark.py --batch-scaling.
+#
+#   python batch_env.py --games 64 --workers 4    Time random actions
+
+# Bits of an action, held down for the step like the keys they're named
+# after. Any combination can be given, so there are ACTION_COUNT actions.
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_UP = 4
+ACTION_DOWN = 8
+ACTION_SHOOT = 16
+ACTION_COUNT = 32
+
+# Values describing the player at the start of each observation
+PLAYER_FEATURES = ("x", "y", "health", "health_max", "speed", "can_shoot", "invincible",
+                   "bullet_power", "stage")
+# Number of each kind of entity nearest to the player included in each
+# observation. Each entity is described by ENTITY_FEATURES, and slots
+# without an entity are all zeros.
+OBSERVED_ENEMIES = 8
+OBSERVED_OBSTACLES = 4
+OBSERVED_BULLETS = 16
+OBSERVED_COLLECTABLES = 4
+ENTITY_FEATURES = ("present", "x", "y", "change_x", "change_y", "type_id")
+OBSERVATION_SIZE = len(PLAYER_FEATURES) + len(ENTITY_FEATURES) * (
+    OBSERVED_ENEMIES + OBSERVED_OBSTACLES + OBSERVED_BULLETS + OBSERVED_COLLECTABLES)
+
+# Observed positions are relative to the player and divided by the size of
+# the game area, and velocities are divided by VELOCITY_SCALE, so most
+# values are between -1 and 1
+GAME_AREA_WIDTH = space_game.GAME_AREA_RIGHT - space_game.GAME_AREA_LEFT
+GAME_AREA_HEIGHT = space_game.GAME_AREA_TOP - space_game.GAME_AREA_BOTTOM
+VELOCITY_SCALE = 20
+
+# The reward for a step is the score gained times SCORE_REWARD plus the
+# kills made times KILL_REWARD
+SCORE_REWARD = 0.01
+KILL_REWARD = 1.0
+
+# Ticks a game can last before it's ended as done
+BATCH_MAX_TICKS = 18000
+
+# Arrays shared by every game, by name, with their dtype and the shape of
+# one game's row
+BATCH_ARRAYS = {
+    "actions": (np.uint8, ()),
+    "observations": (np.float32, (OBSERVATION_SIZE,)),
+    "rewards": (np.float32, ()),
+    "dones": (np.bool_, ()),
+    "episodes": (np.int64, ()),
+    "final_scores": (np.int64, ()),
+    "final_kills": (np.int64, ()),
+    "final_stages": (np.int64, ()),
+    "final_ticks": (np.int64, ()),
+}
+
+# Commands sent to worker processes, which send the same command back
+# once it's done
+STEP_COMMAND = b"s"
+RESET_COMMAND = b"r"
+CLOSE_COMMAND = b"c"
+
+# Creates every array in BATCH_ARRAYS for count games. The arrays are views
+# of buffer when one is given, which must be at least get_batch_size(count)
+# bytes.
+def create_batch_arrays(count, buffer = None):
+    arrays = {}
+    offset = 0
+    for name, (dtype, shape) in BATCH_ARRAYS.items():
+        shape = (count,) + shape
+        if buffer is None:
+            arrays[name] = np.zeros(shape, dtype = dtype)
+        else:
+            arrays[name] = np.ndarray(shape, dtype = dtype, buffer = buffer, offset = offset)
+            offset += arrays[name].nbytes
+    return arrays
+
+def get_batch_size(count):
+    return sum(np.dtype(dtype).itemsize * count * int(np.prod(shape))
+               for dtype, shape in BATCH_ARRAYS.values())
+
+# Writes the entities nearest to (player_x, player_y) into slots, a view of
+# an observation shaped (number of slots, len(ENTITY_FEATURES)), nearest
+# first. x, y, change_x, change_y and type_id are arrays of every entity.
+def observe_nearest(slots, player_x, player_y, x, y, change_x, change_y, type_id):
+    slots.fill(0)
+    if len(x) == 0:
+        return
+    offset_x = (x - player_x) / GAME_AREA_WIDTH
+    offset_y = (y - player_y) / GAME_AREA_HEIGHT
+    distance = offset_x * offset_x + offset_y * offset_y
+    nearest = np.argsort(distance, kind = "stable")[:len(slots)]
+    count = len(nearest)
+    slots[:count, 0] = 1
+    slots[:count, 1] = offset_x[nearest]
+    slots[:count, 2] = offset_y[nearest]
+    slots[:count, 3] = change_x[nearest] / VELOCITY_SCALE
+    slots[:count, 4] = change_y[nearest] / VELOCITY_SCALE
+    slots[:count, 5] = type_id[nearest]
+
+# Returns x, y, change_x, change_y and type_id arrays for the live sprites
+# in an obstacle or collectable list
+def get_sprite_arrays(sprite_list):
+    values = [(sprite.center_x, sprite.center_y, sprite.change_x, sprite.change_y, sprite.type_id)
+              for sprite in sprite_list if not sprite.in_pool]
+    if not values:
+        return [np.zeros(0)] * 5
+    return list(np.array(values).T)
+
+# A range of the games in a batch, stepped in order by one process. Each
+# game's row of the batch arrays is only ever written by its shard.
+class GameShard:
+    # arrays are the batch arrays for the whole batch, and start and end
+    # the first game of the shard and the game after its last one. Game i
+    # plays seed + i for its first episode, then seed + i + count for its
+    # second and so on, so every game in the batch plays different seeds.
+    def __init__(self, arrays, start, end, count, seed, max_ticks):
+        self.arrays = { name: values[start:end] for name, values in arrays.items() }
+        self.start = start
+        self.count = count
+        self.seed = seed
+        self.max_ticks = max_ticks
+        self.games = [None] * (end - start)
+
+    def reset_game(self, index):
+        episode = int(self.arrays["episodes"][index])
+        game = SpaceGameSimulation(self.seed + self.start + index + episode * self.count)
+        game.setup()
+        self.games[index] = game
+
+    def reset(self):
+        self.arrays["episodes"][:] = 0
+        self.arrays["rewards"][:] = 0
+        self.arrays["dones"][:] = False
+        for index in range(len(self.games)):
+            self.reset_game(index)
+            self.observe(index)
+
+    # Holds the keys for each game's action, runs one tick of every game and
+    # writes each game's reward, done flag and observation. A game that's
+    # done has its final stats recorded and is started over with its next
+    # seed, and its observation is the first one of the new episode.
+    def step(self):
+        actions = self.arrays["actions"].tolist()
+        rewards = self.arrays["rewards"]
+        dones = self.arrays["dones"]
+        for index, (game, action) in enumerate(zip(self.games, actions)):
+            player = game.player
+            player.moving_left = bool(action & ACTION_LEFT)
+            player.moving_right = bool(action & ACTION_RIGHT)
+            player.moving_up = bool(action & ACTION_UP)
+            player.moving_down = bool(action & ACTION_DOWN)
+            if action & ACTION_SHOOT:
+                game.on_key_press(space_game.arcade.key.SPACE, 0)
+
+            score = game.score
+            kills = game.kills
+            game.tick()
+            # tick only notices the player has died at the start of the next
+            # tick, so that's checked here to end the episode straight away
+            done = game.game_over or game.player.health <= 0 or game.tick_count >= self.max_ticks
+            rewards[index] = (game.score - score) * SCORE_REWARD + (game.kills - kills) * KILL_REWARD
+            dones[index] = done
+            if done:
+                self.finish_game(index)
+            self.observe(index)
+
+    def finish_game(self, index):
+        game = self.games[index]
+        self.arrays["final_scores"][index] = game.score
+        self.arrays["final_kills"][index] = game.kills
+        self.arrays["final_stages"][index] = game.stage
+        self.arrays["final_ticks"][index] = game.tick_count
+        self.arrays["episodes"][index] += 1
+        self.reset_game(index)
+
+    def observe(self, index):
+        game = self.games[index]
+        player = game.player
+        observation = self.arrays["observations"][index]
+        observation[:len(PLAYER_FEATURES)] = (
+            (player.center_x - space_game.GAME_AREA_LEFT) / GAME_AREA_WIDTH,
+            (player.center_y - space_game.GAME_AREA_BOTTOM) / GAME_AREA_HEIGHT,
+            player.health / space_game.MAX_HEALTH_MAX,
+            player.health_max / space_game.MAX_HEALTH_MAX,
+            player.current_speed / space_game.PLAYER_SPEED_MAX,
+            player.shoot_cooldown < 0,
+            player.invincible_timer >= 0,
+            player.current_bullet_power / space_game.BULLET_POWER_MAX,
+            game.stage / space_game.MAX_STAGE,
+        )
+        entities = observation[len(PLAYER_FEATURES):].reshape(-1, len(ENTITY_FEATURES))
+        enemy_slots = entities[:OBSERVED_ENEMIES]
+        obstacle_slots = entities[OBSERVED_ENEMIES:OBSERVED_ENEMIES + OBSERVED_OBSTACLES]
+        bullet_slots = entities[OBSERVED_ENEMIES + OBSERVED_OBSTACLES:-OBSERVED_COLLECTABLES]
+        collectable_slots = entities[-OBSERVED_COLLECTABLES:]
+        x = player.center_x
+        y = player.center_y
+
+        batches = [batch for batch in game.enemy_behaviors.batches.values() if batch.count]
+        observe_nearest(enemy_slots, x, y,
+            *(np.concatenate([getattr(batch, name)[:batch.count] for batch in batches] or [np.zeros(0)])
+              for name in ("x", "y", "change_x", "change_y")),
+            np.concatenate([np.full(batch.count, batch.archetype.type_id) for batch in batches]
+                           or [np.zeros(0)]))
+        observe_nearest(obstacle_slots, x, y, *get_sprite_arrays(game.obstacle_list))
+        observe_nearest(collectable_slots, x, y, *get_sprite_arrays(game.collectable_list))
+
+        # Only enemy bullets are observed, since the player's own can't hurt it
+        projectiles = game.projectiles
+        enemy_bullets = np.flatnonzero(~projectiles.friendly[:projectiles.count])
+        observe_nearest(bullet_slots, x, y, projectiles.x[enemy_bullets], projectiles.y[enemy_bullets],
+                        projectiles.change_x[enemy_bullets], projectiles.change_y[enemy_bullets],
+                        projectiles.type_id[enemy_bullets])
+
+# Runs one GameShard of a BatchEnv in a worker process, following commands
+# from connection until told to close
+def run_worker(connection, memory_name, count, start, end, seed, max_ticks):
+    memory = shared_memory.SharedMemory(name = memory_name)
+    shard = GameShard(create_batch_arrays(count, memory.buf), start, end, count, seed, max_ticks)
+    try:
+        while True:
+            command = connection.recv_bytes()
+            if command == STEP_COMMAND:
+                shard.step()
+            elif command == RESET_COMMAND:
+                shard.reset()
+            else:
+                break
+            connection.send_bytes(command)
+    finally:
+        # The shard's arrays have to go before the memory they view can close
+        del shard
+        memory.close()
+
+# count games stepped together, split evenly across workers processes. With
+# one worker the games are stepped in this process and nothing is shared.
+# The arrays returned by reset and step are the batch's own, and are
+# overwritten by the next step; copy them to keep them.
+class BatchEnv:
+    def __init__(self, count, seed = 0, max_ticks = BATCH_MAX_TICKS, workers = 1):
+        self.count = count
+        workers = max(1, min(workers, count))
+        self.memory = None
+        self.connections = []
+        self.processes = []
+        self.shard = None
+        if workers == 1:
+            self.arrays = create_batch_arrays(count)
+            self.shard = GameShard(self.arrays, 0, count, count, seed, max_ticks)
+        else:
+            self.memory = shared_memory.SharedMemory(create = True, size = get_batch_size(count))
+            self.arrays = create_batch_arrays(count, self.memory.buf)
+            for worker in range(workers):
+                start = count * worker // workers
+                end = count * (worker + 1) // workers
+                connection, worker_connection = multiprocessing.Pipe()
+                process = multiprocessing.Process(target = run_worker, daemon = True,
+                    args = (worker_connection, self.memory.name, count, start, end, seed, max_ticks))
+                process.start()
+                self.connections.append(connection)
+                self.processes.append(process)
+        for name, values in self.arrays.items():
+            setattr(self, name, values)
+
+    def send(self, command):
+        for connection in self.connections:
+            connection.send_bytes(command)
+        for connection in self.connections:
+            connection.recv_bytes()
+
+    # Starts every game over on its first seed and returns the observations
+    def reset(self):
+        if self.shard is not None:
+            self.shard.reset()
+        else:
+            self.send(RESET_COMMAND)
+        return self.observations
+
+    # Steps every game once with actions, an array of one action per game
+    # (see ACTION_LEFT and the rest above). Returns the observations, the
+    # rewards and the done flags. Games that are done start over by
+    # themselves; their scores, kills, stages and ticks are in final_scores,
+    # final_kills, final_stages and final_ticks until they're done again.
+    def step(self, actions):
+        self.actions[:] = actions
+        if self.shard is not None:
+            self.shard.step()
+        else:
+            self.send(STEP_COMMAND)
+        return self.observations, self.rewards, self.dones
+
+    def close(self):
+        if self.memory is None:
+            return
+        for connection in self.connections:
+            connection.send_bytes(CLOSE_COMMAND)
+        for process in self.processes:
+            process.join()
+        self.arrays = None
+        for name in BATCH_ARRAYS:
+            setattr(self, name, None)
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+def main():
+    parser = argparse.ArgumentParser(description = "Step a batch of games with random actions "
+                                                   "and report how fast they ran.")
+    parser.add_argument("--games", type = int, default = 16)
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--steps", type = int, default = 600)
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    env = BatchEnv(args.games, args.seed, workers = args.workers)
+    rng = np.random.default_rng(args.seed)
+    env.reset()
+    episodes = 0
+    start_time = time.perf_counter()
+    for _ in range(args.steps):
+        _, _, dones = env.step(rng.integers(0, ACTION_COUNT, args.games))
+        episodes += np.count_nonzero(dones)
+    elapsed = time.perf_counter() - start_time
+    print(f"{args.games} games, {args.workers} workers: {args.games * args.steps / elapsed:.0f} "
+          f"steps per second, {episodes} episodes finished")
+    env.close()
+
+if __name__ == "__main__":
+    main()
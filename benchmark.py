@@ -0,0 +1,309 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import space_game
+from batch_env import ACTION_COUNT, BatchEnv
+from space_game import SpaceGameSimulation
+
+# Headless benchmarks for the game rules. Each scenario sets up a
+# SpaceGameSimulation, runs it for a while to fill its pools, then times
+# every tick and every phase of the tick (see PROFILER_PHASES). A second,
+# separate run of the scenario is traced with tracemalloc to measure
+# allocations and peak memory, since tracing slows the ticks down too much
+# to time them at the same time.
+#
+#   python benchmark.py                           Run every scenario
+#   python benchmark.py --output results.json     Also save the results
+#   python benchmark.py --compare baseline.json   Fail if any scenario's
+#                                                 mean tick time is more
+#                                                 than --threshold slower
+#   python benchmark.py --batch-scaling           Time BatchEnv steps with
+#                                                 1, 2 and 4 workers instead
+
+# Version of the results file format
+RESULTS_VERSION = 1
+# Seed every scenario is run with, so runs see the same spawns
+BENCHMARK_SEED = 1
+# Ticks run before timing starts, and ticks timed
+WARMUP_TICKS = 600
+BENCHMARK_TICKS = 3600
+# Fraction slower than the baseline a scenario's mean tick time can get
+# before --compare fails
+REGRESSION_THRESHOLD = 0.10
+# Number of enemies kept alive in the destroy_all_enemies scenario, and
+# ticks between each use of the powerup
+BURST_ENEMIES = 40
+BURST_INTERVAL = 120
+# Number of times a snapshot is taken and restored at the end of each
+# scenario to time them
+SNAPSHOT_REPEATS = 100
+# Worker counts the BatchEnv is timed with for --batch-scaling, the number
+# of games it holds, and the steps run before timing starts and timed
+BATCH_SCALING_WORKERS = (1, 2, 4)
+BATCH_SCALING_GAMES = 32
+BATCH_SCALING_WARMUP_STEPS = 60
+BATCH_SCALING_STEPS = 300
+
+# Stands in for a FrameProfiler, adding up the time spent in each phase of
+# the ticks run while it's attached
+class PhaseTimer:
+    def __init__(self):
+        self.phase_times = dict.fromkeys(space_game.PROFILER_PHASES, 0.0)
+        self.last_lap = time.perf_counter()
+
+    def restart(self):
+        self.last_lap = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phase_times[phase] += now - self.last_lap
+        self.last_lap = now
+
+    def record(self, phase, seconds):
+        self.phase_times[phase] += seconds
+
+# The player can't die in any scenario, so every scenario runs for as long
+# as it's meant to. Max health is raised too, since health pickups cap
+# health to it.
+def make_immortal(game):
+    game.player.health_max = 10 ** 9
+    game.player.health = 10 ** 9
+
+# Puts the game on the given stage, right after its between stage timer
+def go_to_stage(game, stage):
+    game.stage = stage
+    game.kills = space_game.KILL_COUNT_THRESHOLDS[stage - 2] if stage > 1 else 0
+    game.enemies_spawned = 0
+    game.between_stage_timer = -1
+
+def setup_stage_1_idle(game):
+    make_immortal(game)
+
+def tick_stage_1_idle(game, tick):
+    pass
+
+def setup_stage_10_waves(game):
+    make_immortal(game)
+    go_to_stage(game, space_game.MAX_STAGE)
+
+# Enemies keep spawning as if none of the stage's wave had spawned yet
+def tick_stage_10_waves(game, tick):
+    game.enemies_spawned = 0
+
+def setup_max_fire_rate(game):
+    make_immortal(game)
+    go_to_stage(game, space_game.MAX_STAGE)
+    game.player.shoot_cooldown_initial = space_game.PLAYER_COOLDOWN_MIN
+    game.player.current_bullet_speed = space_game.BULLET_SPEED_MAX
+    game.player.current_bullet_power = space_game.BULLET_POWER_MAX
+
+# Fires whenever the cooldown allows, sweeping the player across the screen
+def tick_max_fire_rate(game, tick):
+    game.enemies_spawned = 0
+    game.on_key_press(space_game.arcade.key.SPACE, 0)
+    game.player.center_x = space_game.GAME_AREA_LEFT + (tick * 4) % (
+        space_game.GAME_AREA_RIGHT - space_game.GAME_AREA_LEFT)
+
+def setup_destroy_all_burst(game):
+    make_immortal(game)
+    go_to_stage(game, space_game.MAX_STAGE)
+
+# Keeps BURST_ENEMIES enemies on screen and destroys them all at once
+# every BURST_INTERVAL ticks
+def tick_destroy_all_burst(game, tick):
+    stage_enemies = space_game.ENEMIES_ON_STAGE[game.stage - 1]
+    alive = sum(not enemy.in_pool for enemy in game.enemy_list)
+    if alive < BURST_ENEMIES:
+        game.spawn_enemy(game.rng.choice(stage_enemies))
+    if tick % BURST_INTERVAL == 0:
+        game.collect_collectable(game.player, "destroy_all_enemies")
+
+# Each scenario's setup and the function called before each of its ticks
+SCENARIOS = {
+    "stage_1_idle": (setup_stage_1_idle, tick_stage_1_idle),
+    "stage_10_waves": (setup_stage_10_waves, tick_stage_10_waves),
+    "max_fire_rate": (setup_max_fire_rate, tick_max_fire_rate),
+    "destroy_all_burst": (setup_destroy_all_burst, tick_destroy_all_burst),
+}
+
+def start_scenario(name):
+    setup, before_tick = SCENARIOS[name]
+    game = SpaceGameSimulation(BENCHMARK_SEED)
+    game.setup()
+    setup(game)
+    for tick in range(WARMUP_TICKS):
+        before_tick(game, tick)
+        game.tick()
+    return game, before_tick
+
+# Returns the tick and phase times for a scenario, and the time taken to
+# snapshot and restore it at the end, in milliseconds
+def time_scenario(name, ticks):
+    game, before_tick = start_scenario(name)
+    timer = PhaseTimer()
+    game.profiler = timer
+    tick_times = np.zeros(ticks)
+    for tick in range(ticks):
+        before_tick(game, WARMUP_TICKS + tick)
+        start_time = time.perf_counter()
+        game.tick()
+        tick_times[tick] = time.perf_counter() - start_time
+    tick_times *= 1000
+
+    start_time = time.perf_counter()
+    for _ in range(SNAPSHOT_REPEATS):
+        snapshot = game.get_snapshot()
+    snapshot_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    for _ in range(SNAPSHOT_REPEATS):
+        game.restore_snapshot(snapshot)
+    restore_time = time.perf_counter() - start_time
+    return {
+        "ticks": ticks,
+        "tick_ms": {
+            "mean": float(tick_times.mean()),
+            "p50": float(np.percentile(tick_times, 50)),
+            "p99": float(np.percentile(tick_times, 99)),
+            "max": float(tick_times.max()),
+        },
+        "phase_ms": { phase: seconds * 1000 / ticks
+                      for phase, seconds in timer.phase_times.items() if seconds > 0 },
+        "entities": {
+            "bullets": int(game.projectiles.count),
+            "enemies": len(game.enemy_list),
+            "obstacles": len(game.obstacle_list),
+            "collectables": len(game.collectable_list),
+            "explosions": len(game.explosion_list),
+        },
+        "snapshot_ms": snapshot_time * 1000 / SNAPSHOT_REPEATS,
+        "restore_ms": restore_time * 1000 / SNAPSHOT_REPEATS,
+        "snapshot_bytes": len(snapshot),
+    }
+
+# Returns the memory allocated over a scenario's ticks: the number of
+# blocks still allocated at the end that weren't before, and the peak
+# memory used above where the ticks started
+def trace_scenario(name, ticks):
+    game, before_tick = start_scenario(name)
+    tracemalloc.start()
+    start_memory, _ = tracemalloc.get_traced_memory()
+    before = tracemalloc.take_snapshot()
+    for tick in range(ticks):
+        before_tick(game, WARMUP_TICKS + tick)
+        game.tick()
+    after = tracemalloc.take_snapshot()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return {
+        "allocated_blocks": blocks,
+        "peak_memory_kb": (peak_memory - start_memory) / 1024,
+    }
+
+def run_benchmarks(names, ticks):
+    results = {
+        "version": RESULTS_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "scenarios": {},
+    }
+    for name in names:
+        result = time_scenario(name, ticks)
+        result.update(trace_scenario(name, ticks))
+        results["scenarios"][name] = result
+        tick_ms = result["tick_ms"]
+        print(f"{name}: mean {tick_ms['mean']:.3f} ms, p99 {tick_ms['p99']:.3f} ms, "
+              f"max {tick_ms['max']:.3f} ms, {result['allocated_blocks']} blocks, "
+              f"peak {result['peak_memory_kb']:.0f} KB, snapshot {result['snapshot_ms']:.3f} ms, "
+              f"restore {result['restore_ms']:.3f} ms ({result['snapshot_bytes']} bytes)")
+        slowest = sorted(result["phase_ms"].items(), key = lambda item: item[1], reverse = True)
+        for phase, phase_ms in slowest[:3]:
+            print(f"    {phase}: {phase_ms:.3f} ms")
+    return results
+
+# Returns the steps per second a BatchEnv runs with random actions for each
+# of BATCH_SCALING_WORKERS, and how much faster each is than one worker.
+# Steps only get faster while there are idle cores for the workers.
+def run_batch_scaling(steps):
+    print(f"BatchEnv scaling, {BATCH_SCALING_GAMES} games on {os.cpu_count()} cores:")
+    results = {}
+    for workers in BATCH_SCALING_WORKERS:
+        env = BatchEnv(BATCH_SCALING_GAMES, BENCHMARK_SEED, workers = workers)
+        rng = np.random.default_rng(BENCHMARK_SEED)
+        env.reset()
+        for _ in range(BATCH_SCALING_WARMUP_STEPS):
+            env.step(rng.integers(0, ACTION_COUNT, BATCH_SCALING_GAMES))
+        start_time = time.perf_counter()
+        for _ in range(steps):
+            env.step(rng.integers(0, ACTION_COUNT, BATCH_SCALING_GAMES))
+        elapsed = time.perf_counter() - start_time
+        env.close()
+        steps_per_second = BATCH_SCALING_GAMES * steps / elapsed
+        speedup = steps_per_second / results[1]["steps_per_second"] if results else 1.0
+        results[workers] = { "steps_per_second": steps_per_second, "speedup": speedup }
+        print(f"    {workers} workers: {steps_per_second:.0f} steps per second ({speedup:.2f}x)")
+    return results
+
+# Returns a message for each scenario whose mean tick time is more than
+# threshold slower than in the baseline
+def find_regressions(results, baseline, threshold):
+    regressions = []
+    for name, result in results["scenarios"].items():
+        if name not in baseline["scenarios"]:
+            continue
+        baseline_ms = baseline["scenarios"][name]["tick_ms"]["mean"]
+        current_ms = result["tick_ms"]["mean"]
+        if current_ms > baseline_ms * (1 + threshold):
+            regressions.append(f"{name}: mean tick {current_ms:.3f} ms, "
+                               f"baseline {baseline_ms:.3f} ms "
+                               f"(+{(current_ms / baseline_ms - 1) * 100:.0f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description = "Time the game rules without a window.")
+    parser.add_argument("scenarios", nargs = "*",
+                        help = f"scenarios to run, from {', '.join(SCENARIOS)} (default: all)")
+    parser.add_argument("--ticks", type = int, default = BENCHMARK_TICKS)
+    parser.add_argument("--output", help = "file to save the results to as JSON")
+    parser.add_argument("--compare", help = "results file to compare against")
+    parser.add_argument("--threshold", type = float, default = REGRESSION_THRESHOLD,
+                        help = "fraction slower than the baseline that counts as a regression")
+    parser.add_argument("--batch-scaling", action = "store_true",
+                        help = "time BatchEnv steps with more workers, running only the "
+                               "scenarios named")
+    parser.add_argument("--batch-steps", type = int, default = BATCH_SCALING_STEPS)
+    args = parser.parse_args()
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"unknown scenario: {name}")
+
+    names = args.scenarios
+    if not names and not args.batch_scaling:
+        names = list(SCENARIOS)
+    results = run_benchmarks(names, args.ticks)
+    if args.batch_scaling:
+        results["batch_scaling"] = run_batch_scaling(args.batch_steps)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent = 2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions past {args.threshold * 100:.0f}%")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 import arcade
+import collections
+import concurrent.futures
+import csv
+import functools
 import math
+import numpy as np
+import pyglet
+import queue
+import struct
+import threading
+import zlib
 import os
 import sqlite3
 import sys
 import random
+import time
+from array import array
 
 # Constants
 
@@ -22,64 +34,86 @@ WINDOW_TITLE = "SDEV 265 Space Game"
 WINDOW_DEFAULT_WIDTH = 1280
 WINDOW_DEFAULT_HEIGHT = 720
 
-# Obstacle types and their defaul stats
+# Obstacle types and their defaul stats, image and scale
 OBSTACLE_STATS = {
     "small":
         { "health": 1, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-5, 5), "strength": 1 },
+            "velocity_rotation": (-5, 5), "strength": 1,
+            "filename": "./res/img/Space Meatball.png", "scale": 0.6 },
     "small_fast":
         { "health": 1, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-5, 5), "strength": 1 },
+            "velocity_rotation": (-5, 5), "strength": 1,
+            "filename": "./res/img/Space Meatball.png", "scale": 0.6 },
     "medium":
         { "health": 3, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-3, 3,), "strength": 2 },
+            "velocity_rotation": (-3, 3,), "strength": 2,
+            "filename": "./res/img/Space Meatball.png", "scale": 1 },
     "medium_fast":
         { "health": 3, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-5, 5), "strength": 2 },
+            "velocity_rotation": (-5, 5), "strength": 2,
+            "filename": "./res/img/Space Meatball.png", "scale": 1 },
     "large":
         { "health": 5, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-1, 1), "strength": 3 },
+            "velocity_rotation": (-1, 1), "strength": 3,
+            "filename": "./res/img/Space Meatball.png", "scale": 2 },
     "large_fast":
         { "health": 5, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-5, 5), "strength": 3 },
+            "velocity_rotation": (-5, 5), "strength": 3,
+            "filename": "./res/img/Space Meatball.png", "scale": 2 },
     "long":
         { "health": 4, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-3, 3), "strength": 2 },
+            "velocity_rotation": (-3, 3), "strength": 2,
+            "filename": "./res/img/space_debris.png", "scale": 0.7 },
     "long_fast":
         { "health": 4, "velocity_x": (0, 0), "velocity_y": (-5, -2), \
-            "velocity_rotation": (-5, 5), "strength": 2 }
+            "velocity_rotation": (-5, 5), "strength": 2,
+            "filename": "./res/img/space_debris.png", "scale": 0.7 }
 }
 
-# Collectable types and their stats
+# Collectable types and their stats, image and scale
 COLLECTABLE_STATS = {
     "attack_up": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 13.png", "scale": 0.2 },
     "attack_down": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 12.png", "scale": 0.2 },
     "defense_up": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 3.png", "scale": 0.2 },
     "defense_down": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 4.png", "scale": 0.2 },
     "health_small": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Gold.png", "scale": 0.2 },
     "health_large": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Gold.png", "scale": 2 },
     "speed_up": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 10.png", "scale": 0.2 },
     "speed_down": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 11.png", "scale": 0.2 },
     "fire_rate_up": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 15.png", "scale": 0.2 },
     "fire_rate_down": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 14.png", "scale": 0.2 },
     "bullet_speed_up": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 8.png", "scale": 0.2 },
     "bullet_speed_down": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 9.png", "scale": 0.2 },
     "destroy_all_enemies": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 1.png", "scale": 0.2 },
     "invincible": 
-        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 }
+        { "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "filename": "./res/img/Buff-Debbuf 7.png", "scale": 0.2 }
 }
 
 PLAYER_SPEED_DEFAULT = 5
@@ -99,12 +133,16 @@ BULLET_POWER_DEFAULT = 1
 BULLET_POWER_MIN = 1
 BULLET_POWER_MAX = 10
 
-# Bullet types and their stats
+# Bullet types and their stats, image and scale. Every bullet type shares
+# the same image.
 BULLET_STATS = {
     "player_basic": { "velocity_x": (0, 0),
-        "velocity_y": (BULLET_SPEED_DEFAULT, BULLET_SPEED_DEFAULT), "friendly": True },
-    "enemy_basic": { "velocity_x": (0, 0), "velocity_y": (-8, -8), "friendly": False },
-    "enemy_tracker": { "velocity_x": (0, 0), "velocity_y": (0, 0), "friendly": False }
+        "velocity_y": (BULLET_SPEED_DEFAULT, BULLET_SPEED_DEFAULT), "friendly": True,
+        "filename": ":resources:images/space_shooter/laserRed01.png", "scale": 0.8 },
+    "enemy_basic": { "velocity_x": (0, 0), "velocity_y": (-8, -8), "friendly": False,
+        "filename": ":resources:images/space_shooter/laserRed01.png", "scale": 0.8 },
+    "enemy_tracker": { "velocity_x": (0, 0), "velocity_y": (0, 0), "friendly": False,
+        "filename": ":resources:images/space_shooter/laserRed01.png", "scale": 0.8 }
 }
 
 # Star properties; sizes must be integers
@@ -113,6 +151,10 @@ STAR_SIZE_MAX = 6
 STAR_SPEED_MIN = -1
 STAR_SPEED_MAX = -5
 NUM_STARS = 100
+# Star colors and the percent chance of a star being each color
+STAR_COLORS = [arcade.color.WHITE, arcade.color.WHITE_SMOKE, arcade.color.LIGHT_BLUE,
+               arcade.color.PASTEL_ORANGE, arcade.color.RED_ORANGE]
+STAR_COLOR_CHANCES = [70, 10, 10, 5, 5]
 
 # Values related to stages
 KILL_COUNT_THRESHOLDS = [ 5, 15, 35, 50, 65, 80, 100, 125, 150, 200 ]
@@ -174,15 +216,55 @@ COLLECTABLES_ON_STAGE = [
 # Save data values
 # Filename for the savefile
 DB_FILENAME = "save.db"
-# List of high scores in the following format:
-# { { Name, Score }, { Name, Score }, ... }
-high_scores = {}
-# SQLite database reference
+# List of the leaderboard's high scores in the following format:
+# [ (ID, Name, Score), (ID, Name, Score), ... ]
+high_scores = []
+# SQLite connection used while checking and creating the save file
 save_db = None
+# ScoreRepository for the scores in save_db
+score_repository = None
+# TelemetryStore that finished runs are recorded to, if any
+telemetry = None
+# Number of scores on the leaderboard, and on each page of it
+LEADERBOARD_SIZE = 10
 
 # Flag for displaying debug info
 debug_mode = False
 
+# Fixed timestep values
+# The game rules always run at this many ticks per second, no matter how
+# fast frames are drawn. Every speed and timer in the game counts ticks.
+TICK_RATE = 60
+TICK_DURATION = 1 / TICK_RATE
+# Most ticks run in one frame to catch up after a slow frame. If the game
+# falls further behind than this it slows down instead.
+MAX_TICKS_PER_FRAME = 5
+# Sprites that moved further than this in one tick, such as pooled sprites
+# reused somewhere else, are drawn where they are instead of interpolated
+INTERPOLATION_MAX_DISTANCE = 64
+
+# Number of ticks simulated by the headless mode when none is given
+HEADLESS_TICKS_DEFAULT = 36000
+
+# Filename that games are recorded to as replays, if set from the command line
+replay_filename = None
+
+# Filename that per-frame profiler numbers are written to as CSV, if set from
+# the command line
+profile_filename = None
+
+# Whether games take the snapshots that the rewind key goes back to. Taking
+# them costs a snapshot every REWIND_INTERVAL ticks, so it's off unless
+# turned on from the command line.
+rewind_mode = False
+
+# When the game started, and how long it took from then until every asset
+# was preloaded, and how long the preload itself took, in seconds. The
+# durations are None until the preload has finished.
+PROCESS_START_TIME = time.perf_counter()
+startup_time = None
+preload_time = None
+
 # An Arcade Window that will be set to display one of the following Views:
 # SpaceGameView: The main gameplay
 # TitleView: The title screen
@@ -223,136 +305,1231 @@ class SpaceGameWindow(arcade.Window):
             viewport_height = height
             self.ctx.viewport = (width - viewport_width) / 2, 0, viewport_width, viewport_height
         
-# Enemy types and their stats
+# Enemy types and their stats, behavior and image. Behaviors are listed in
+# ENEMY_BEHAVIORS below. Enemy images are flipped to face down unless
+# flipped_vertically is False.
 ENEMY_STATS = {
     "basic_straight": 
-        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-4, -2), "score": 100 },
+        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-4, -2), "score": 100,
+            "behavior": "straight", "filename": "./res/img/EnemyShip1.png" },
     "basic_zigzag": 
-        { "health": 1, "velocity_x": (-3, 3), "velocity_y": (-3, -1), "score": 200 },
+        { "health": 1, "velocity_x": (-3, 3), "velocity_y": (-3, -1), "score": 200,
+            "behavior": "zigzag", "filename": "./res/img/EnemyShip2.png" },
     "basic_wave": 
-        { "health": 1, "velocity_x": (4, 12), "velocity_y": (-6, -3), "score": 300 },
+        { "health": 1, "velocity_x": (4, 12), "velocity_y": (-6, -3), "score": 300,
+            "behavior": "wave", "filename": "./res/img/EnemyShip3.png", "flipped_vertically": False },
     "basic_wait": 
-        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-9, -5), "score": 200 },
+        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-9, -5), "score": 200,
+            "behavior": "wait", "filename": "./res/img/EnemyShip4.png" },
     "basic_fast": 
-        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-20, -13), "score": 200 },
+        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-20, -13), "score": 200,
+            "behavior": "fast", "filename": "./res/img/EnemyShip1.png" },
     "basic_dodge": 
-        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100 },
+        { "health": 1, "velocity_x": (0, 0), "velocity_y": (-3, -1), "score": 100,
+            "behavior": "dodge", "filename": "./res/img/EnemyShip5.png" },
+}
+
+# Bullet types by type_id, for the bullets in a ProjectileStore
+BULLET_TYPES = list(BULLET_STATS)
+
+# Every kind of entity built from archetypes, and the stats its types are
+# compiled from
+ARCHETYPE_STATS = {
+    "enemy": ENEMY_STATS,
+    "obstacle": OBSTACLE_STATS,
+    "collectable": COLLECTABLE_STATS,
+    "bullet": BULLET_STATS
 }
 
+# Everything needed to spawn one type of entity, compiled once from its
+# entry in one of the *_STATS dicts. The texture and hit box are loaded
+# when the archetype is compiled, so spawning never loads images or reads
+# the stats dicts. type_id is the type's index within its kind. Stats an
+# entity kind doesn't use keep their defaults.
+class Archetype:
+    def __init__(self, kind, type, type_id, stats):
+        self.kind = kind
+        self.type = type
+        self.type_id = type_id
+        self.scale = stats.get("scale", 1)
+        self.texture = arcade.load_texture(stats["filename"],
+            flipped_vertically = stats.get("flipped_vertically", kind == "enemy"))
+        self.hit_box = self.texture.hit_box_points
+        # Half the width and height of the box around the scaled hit box
+        self.half_width = max(abs(x) for x, y in self.hit_box) * self.scale
+        self.half_height = max(abs(y) for x, y in self.hit_box) * self.scale
+        # Height of the scaled hit box above its center, for sprites that
+        # don't rotate
+        self.top = max(y for x, y in self.hit_box) * self.scale
+        self.velocity_x = stats["velocity_x"]
+        self.velocity_y = stats["velocity_y"]
+        self.velocity_rotation = stats.get("velocity_rotation", (0, 0))
+        self.health = stats.get("health", 1)
+        self.strength = stats.get("strength", 1)
+        self.score = stats.get("score", 0)
+        self.friendly = stats.get("friendly", False)
+        self.behavior = stats.get("behavior")
+
+    # Creates a new sprite with the archetype's texture, hit box and scale
+    def create_sprite(self):
+        sprite = arcade.Sprite(texture = self.texture, scale = self.scale)
+        sprite.hit_box = self.hit_box
+        sprite.archetype = self
+        return sprite
+
+# Compiled archetypes by kind and then type, such as
+# archetypes["enemy"]["basic_wave"]
+archetypes = {}
+
+# Compiles an Archetype for every type in ARCHETYPE_STATS. Only the first
+# call does anything.
+def compile_archetypes():
+    if archetypes:
+        return
+    for kind, stats in ARCHETYPE_STATS.items():
+        archetypes[kind] = { type: Archetype(kind, type, type_id, type_stats)
+                             for type_id, (type, type_stats) in enumerate(stats.items()) }
+
 SHOOT_COOLDOWN = 40
 
+# Enemy sprite. An enemy's movement, timers and shooting state aren't kept
+# on the sprite, but in the EnemyBatch for its type, which updates every
+# enemy of that type at once and moves the sprite to match.
 class Enemy(arcade.Sprite):
-    def __init__(self, type):
-        flipped_vertically = True
-        if type == "basic_straight":
-            filename = "./res/img/EnemyShip1.png"
-        elif type == "basic_zigzag":
-            filename = "./res/img/EnemyShip2.png"
-        elif type == "basic_wave":
-            filename = "./res/img/EnemyShip3.png"
-            flipped_vertically = False
-        elif type == "basic_wait":
-            filename = "./res/img/EnemyShip4.png"
-        elif type == "basic_fast":
-            filename = "./res/img/EnemyShip1.png"
-        elif type == "basic_dodge":
-            filename = "./res/img/EnemyShip5.png"
-        else:
-            filename = ":resources:images/space_shooter/playerShip3_orange.png"
-        scale = 1
-        super().__init__(filename, scale, flipped_vertically = flipped_vertically)
-        self.center_x = random.uniform(GAME_AREA_LEFT + 20, GAME_AREA_RIGHT - 20)
+    # archetype is one of archetypes["enemy"]. Creating an enemy makes no
+    # random decisions, so how many enemies a pool creates never changes a
+    # seeded game; they're made in reset when the enemy spawns.
+    def __init__(self, archetype):
+        super().__init__(texture = archetype.texture, scale = archetype.scale)
+        self.hit_box = archetype.hit_box
+        self.archetype = archetype
+        self.type = archetype.type
+        self.type_id = archetype.type_id
+        self.health = archetype.health
+        self.strength = archetype.strength
+        self.score = archetype.score
+        # The EnemyBatch the enemy is in and its index there, while alive
+        self.batch = None
+        self.slot = 0
+
+    # Puts the enemy back into its starting state above the top of the screen.
+    # Enemies are pooled, so this is called every time the sprite is reused.
+    # rng is the random number generator of the game the enemy spawns in.
+    def reset(self, rng):
+        archetype = self.archetype
+        self.center_x = rng.uniform(GAME_AREA_LEFT + 20, GAME_AREA_RIGHT - 20)
         self.center_y = SCREEN_HEIGHT + self.height
-        self.change_x = random.uniform(*ENEMY_STATS[type]["velocity_x"])
-        self.change_y = random.uniform(*ENEMY_STATS[type]["velocity_y"])
-        self.type = type
-        self.health = ENEMY_STATS[type]["health"]
-        self.strength = 1 # Dictates how much damage this enemy does when colliding with player
-        self.score = ENEMY_STATS[type]["score"]
-        self.shooting = False
-        self.shoot_cooldown = SHOOT_COOLDOWN
-
-        if type == "basic_zigzag":
-            self.timer = random.uniform(120, 240)
-            self.tolerance = 200
-        elif type == "basic_wave":
-            self.initial_change_x = self.change_x
-            self.sine_input = 0.05
-            self.sine_input_change = 0.05
-        elif type == "basic_wait":
-            self.timer_move = random.uniform(40, 120)
-            self.timer_wait = random.uniform(40, 80)
-            self.zoom = False
-        elif type == "basic_dodge":
-            self.dodging = False
-            self.dodge_direction = 1
-            self.tolerance = 75
-            self.dodge_time = 5
-            self.timer = 0
-            self.dodge_speed = 25
-            self.dodge_count = random.randint(1, 4)
+        self.health = archetype.health
+        self.strength = archetype.strength # Dictates how much damage this enemy does when colliding with player
+        self.score = archetype.score
 
-    def update(self):
-        if self.type == "basic_straight":
-            self.shoot_cooldown -= 1
-            if self.shoot_cooldown < 0:
-                shoot_random_value = random.uniform(0, 100)
-                if shoot_random_value < 0.2:
-                    self.shooting = True
-                    self.shoot_cooldown = SHOOT_COOLDOWN
-
-        elif self.type == "basic_zigzag":
-            self.timer -= 1
-            self.shoot_cooldown -= 1
-            if self.timer < 0:
-                self.change_x = -self.change_x
-                self.timer = random.uniform(120, 240)
-
-        elif self.type == "basic_wave":
-            self.change_x = math.sin(self.sine_input) * self.initial_change_x
-            self.sine_input += self.sine_input_change
-
-        elif self.type == "basic_wait":
-            self.shoot_cooldown -= 1
-            if self.change_y < 0 and not self.zoom:
-                self.timer_move -= 1
-                if self.timer_move < 0:
-                    self.change_y = 0
-            elif self.change_y == 0:
-                self.timer_wait -= 1
-                if self.timer_wait < 0:
-                    self.zoom = True
-                    self.change_y = random.uniform(-20, -12)
-
-        elif self.type == "basic_dodge":
-            if self.dodging:
-                self.timer -= 1
-                if self.timer > 0:
-                    if self.dodge_direction > 0:
-                        self.change_x = self.dodge_speed
-                    else:
-                        self.change_x = -self.dodge_speed
-                else:
-                    self.dodging = False
-                    self.timer = self.dodge_time
-                    self.change_x = 0
-        return super().update()
-
-# Class for the main game loop, extends Arcade's View class
-class SpaceGameView(arcade.View):
+# Enemy behavior values
+# Chance out of 100 that a straight enemy shoots on a tick it's able to
+STRAIGHT_SHOOT_CHANCE = 0.2
+# Ticks between zigzag direction changes, how close to the player's x a
+# zigzag enemy has to be to shoot, and its chance out of 100 to shoot then
+ZIGZAG_TIMER = (120, 240)
+ZIGZAG_TOLERANCE = 200
+ZIGZAG_SHOOT_CHANCE = 1
+# Starting input and per-tick step of the sine wave that wave enemies follow
+WAVE_SINE_START = 0.05
+WAVE_SINE_STEP = 0.05
+# Ticks a waiting enemy moves before stopping, ticks it waits, and its speed
+# when it zooms off afterwards
+WAIT_TIMER_MOVE = (40, 120)
+WAIT_TIMER_WAIT = (40, 80)
+WAIT_ZOOM_VELOCITY_Y = (-20, -12)
+# Distance a friendly bullet must come within to make a dodging enemy dodge,
+# ticks and speed of a dodge, and the number of dodges each enemy has
+DODGE_TOLERANCE = 75
+DODGE_TIME = 5
+DODGE_SPEED = 25
+DODGE_COUNT = (1, 4)
+
+# Number of enemies each EnemyBatch has room for to start with. A batch
+# doubles its room whenever it runs out.
+ENEMY_BATCH_CAPACITY = 16
+
+# Every enemy of one type, stored as one NumPy array per value so each tick
+# of the type's behavior runs once for the whole batch instead of once per
+# enemy. Slot i of every array, and of sprites, belongs to the same enemy;
+# removing an enemy moves the last enemy into its slot. Subclasses add their
+# own values to FLOAT_FIELDS and BOOL_FIELDS and override spawn, behave and
+# shoot. This base class moves in a straight line and never shoots.
+class EnemyBatch:
+    FLOAT_FIELDS = ("x", "y", "change_x", "change_y", "shoot_cooldown", "timer")
+    BOOL_FIELDS = ("shooting",)
+    # Type of bullet the batch's enemies shoot
+    bullet_type = "enemy_basic"
+
+    def __init__(self, archetype, capacity = ENEMY_BATCH_CAPACITY):
+        self.archetype = archetype
+        self.sprites = []
+        self.count = 0
+        self.capacity = 0
+        for name in self.FLOAT_FIELDS:
+            setattr(self, name, np.zeros(0))
+        for name in self.BOOL_FIELDS:
+            setattr(self, name, np.zeros(0, dtype = bool))
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+            old_values = getattr(self, name)
+            values = np.zeros(capacity, dtype = old_values.dtype)
+            values[:self.count] = old_values[:self.count]
+            setattr(self, name, values)
+        self.capacity = capacity
+
+    # Adds a newly spawned enemy to the end of the batch, picking its
+    # starting velocity and behavior values with rng
+    def add(self, enemy, rng):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+        self.sprites.append(enemy)
+        enemy.batch = self
+        enemy.slot = slot
+
+        self.x[slot] = enemy.center_x
+        self.y[slot] = enemy.center_y
+        self.change_x[slot] = rng.uniform(*self.archetype.velocity_x)
+        self.change_y[slot] = rng.uniform(*self.archetype.velocity_y)
+        self.shoot_cooldown[slot] = SHOOT_COOLDOWN
+        self.timer[slot] = 0
+        self.shooting[slot] = False
+        self.spawn(slot, rng)
+
+    def remove(self, enemy):
+        slot = enemy.slot
+        last = self.count - 1
+        if slot != last:
+            for name in self.FLOAT_FIELDS + self.BOOL_FIELDS:
+                values = getattr(self, name)
+                values[slot] = values[last]
+            moved = self.sprites[last]
+            self.sprites[slot] = moved
+            moved.slot = slot
+        self.sprites.pop()
+        self.count = last
+        enemy.batch = None
+
+    # Sets the behavior's own starting values for the enemy in the given slot
+    def spawn(self, slot, rng):
+        pass
+
+    # Runs the behavior for one tick, before the enemies move. rng is a
+    # NumPy Generator.
+    def behave(self, rng):
+        pass
+
+    # Runs one tick for every enemy in the batch and moves their sprites
+    def update(self, rng):
+        if self.count == 0:
+            return
+        self.behave(rng)
+        count = self.count
+        self.x[:count] += self.change_x[:count]
+        self.y[:count] += self.change_y[:count]
+        for enemy, x, y in zip(self.sprites, self.x[:count].tolist(), self.y[:count].tolist()):
+            enemy.position = (x, y)
+
+    # Returns the slots of the enemies that shoot this tick. player_x is
+    # the player's x position.
+    def shoot(self, player_x, rng):
+        shooting = self.shooting[:self.count]
+        slots = np.flatnonzero(shooting)
+        shooting[slots] = False
+        return slots
+
+# Flies straight down, shooting at random
+class StraightEnemyBatch(EnemyBatch):
+    def behave(self, rng):
+        count = self.count
+        shoot_cooldown = self.shoot_cooldown[:count]
+        shoot_cooldown -= 1
+        ready = shoot_cooldown < 0
+        shooting = ready & (rng.uniform(0, 100, count) < STRAIGHT_SHOOT_CHANCE)
+        self.shooting[:count] |= shooting
+        shoot_cooldown[shooting] = SHOOT_COOLDOWN
+
+# Changes horizontal direction every so often, and may shoot when it's
+# close to being above the player
+class ZigzagEnemyBatch(EnemyBatch):
+    def spawn(self, slot, rng):
+        self.timer[slot] = rng.uniform(*ZIGZAG_TIMER)
+
+    def behave(self, rng):
+        count = self.count
+        timer = self.timer[:count]
+        change_x = self.change_x[:count]
+        timer -= 1
+        self.shoot_cooldown[:count] -= 1
+        turning = timer < 0
+        change_x[turning] = -change_x[turning]
+        timer[turning] = rng.uniform(*ZIGZAG_TIMER, np.count_nonzero(turning))
+
+    def shoot(self, player_x, rng):
+        count = self.count
+        shoot_cooldown = self.shoot_cooldown[:count]
+        ready = np.flatnonzero((shoot_cooldown < 0) &
+                               (np.abs(self.x[:count] - player_x) < ZIGZAG_TOLERANCE))
+        ready = ready[rng.uniform(0, 100, len(ready)) < ZIGZAG_SHOOT_CHANCE]
+        self.shooting[ready] = True
+        shoot_cooldown[ready] = SHOOT_COOLDOWN
+        return super().shoot(player_x, rng)
+
+# Sways from side to side along a sine wave
+class WaveEnemyBatch(EnemyBatch):
+    FLOAT_FIELDS = EnemyBatch.FLOAT_FIELDS + ("initial_change_x", "sine_input")
+
+    def spawn(self, slot, rng):
+        self.initial_change_x[slot] = self.change_x[slot]
+        self.sine_input[slot] = WAVE_SINE_START
+
+    def behave(self, rng):
+        count = self.count
+        sine_input = self.sine_input[:count]
+        np.multiply(np.sin(sine_input), self.initial_change_x[:count], out = self.change_x[:count])
+        sine_input += WAVE_SINE_STEP
+
+# Moves down for a while, stops and fires tracking bullets at the player,
+# then zooms off the bottom of the screen. timer counts down the time left
+# moving.
+class WaitEnemyBatch(EnemyBatch):
+    FLOAT_FIELDS = EnemyBatch.FLOAT_FIELDS + ("timer_wait",)
+    BOOL_FIELDS = EnemyBatch.BOOL_FIELDS + ("zoom",)
+    bullet_type = "enemy_tracker"
+
+    def spawn(self, slot, rng):
+        self.timer[slot] = rng.uniform(*WAIT_TIMER_MOVE)
+        self.timer_wait[slot] = rng.uniform(*WAIT_TIMER_WAIT)
+        self.zoom[slot] = False
+
+    def behave(self, rng):
+        count = self.count
+        change_y = self.change_y[:count]
+        timer_move = self.timer[:count]
+        timer_wait = self.timer_wait[:count]
+        zoom = self.zoom[:count]
+        self.shoot_cooldown[:count] -= 1
+
+        moving = (change_y < 0) & ~zoom
+        waiting = ~moving & (change_y == 0)
+        timer_move[moving] -= 1
+        change_y[moving & (timer_move < 0)] = 0
+        timer_wait[waiting] -= 1
+        zooming = waiting & (timer_wait < 0)
+        zoom[zooming] = True
+        change_y[zooming] = rng.uniform(*WAIT_ZOOM_VELOCITY_Y, np.count_nonzero(zooming))
+
+    # Waiting enemies always shoot when their cooldown is over
+    def shoot(self, player_x, rng):
+        count = self.count
+        shoot_cooldown = self.shoot_cooldown[:count]
+        slots = np.flatnonzero((self.change_y[:count] == 0) & (shoot_cooldown < 0))
+        shoot_cooldown[slots] = SHOOT_COOLDOWN // 4
+        return slots
+
+# Flies straight down, darting sideways away from the first few friendly
+# bullets that get close. timer counts down the time left in a dodge.
+class DodgeEnemyBatch(EnemyBatch):
+    FLOAT_FIELDS = EnemyBatch.FLOAT_FIELDS + ("dodge_direction", "dodge_count")
+    BOOL_FIELDS = EnemyBatch.BOOL_FIELDS + ("dodging",)
+
+    def spawn(self, slot, rng):
+        self.dodging[slot] = False
+        self.dodge_direction[slot] = 1
+        self.dodge_count[slot] = rng.randint(*DODGE_COUNT)
+
+    def behave(self, rng):
+        count = self.count
+        dodging = self.dodging[:count]
+        timer = self.timer[:count]
+        change_x = self.change_x[:count]
+        timer[dodging] -= 1
+        still_dodging = dodging & (timer > 0)
+        change_x[still_dodging] = np.where(self.dodge_direction[:count][still_dodging] > 0,
+                                           DODGE_SPEED, -DODGE_SPEED)
+        finished = dodging & ~still_dodging
+        timer[finished] = DODGE_TIME
+        change_x[finished] = 0
+        dodging[finished] = False
+
+    # Starts a dodge for each enemy that has dodges left and has a friendly
+    # bullet within DODGE_TOLERANCE. projectiles must be prepared for hits
+    # from friendly bullets.
+    def dodge(self, projectiles):
+        count = self.count
+        for slot in np.flatnonzero((self.dodge_count[:count] > 0) & ~self.dodging[:count]).tolist():
+            x = self.x[slot]
+            bullet = projectiles.find_within(x, self.y[slot], DODGE_TOLERANCE)
+            if bullet is not None:
+                self.dodging[slot] = True
+                self.dodge_direction[slot] = x - projectiles.x[bullet]
+                self.dodge_count[slot] -= 1
+                self.timer[slot] = DODGE_TIME
+
+# The EnemyBatch class for each behavior in ENEMY_STATS
+ENEMY_BEHAVIORS = {
+    "straight": StraightEnemyBatch,
+    "zigzag": ZigzagEnemyBatch,
+    "wave": WaveEnemyBatch,
+    "wait": WaitEnemyBatch,
+    "fast": EnemyBatch,
+    "dodge": DodgeEnemyBatch
+}
+
+# Keeps an EnemyBatch for each enemy type that has spawned in a game
+class EnemyBehaviorSystem:
     def __init__(self):
-        super().__init__()
+        self.batches = {}
+
+    def add(self, enemy, rng):
+        batch = self.batches.get(enemy.type)
+        if batch is None:
+            batch = ENEMY_BEHAVIORS[enemy.archetype.behavior](enemy.archetype)
+            self.batches[enemy.type] = batch
+        batch.add(enemy, rng)
+
+    # Removes an enemy from its batch. Does nothing if it isn't in one.
+    def remove(self, enemy):
+        if enemy.batch is not None:
+            enemy.batch.remove(enemy)
+
+    def update(self, rng):
+        for batch in self.batches.values():
+            batch.update(rng)
+
+# Explosion effect values
+EXPLOSION_POOL_SIZE = 48
+EXPLOSION_LARGE_FILENAME = "./res/img/explosion1.gif"
+EXPLOSION_LARGE_TIMER = 60
+EXPLOSION_SMALL_FILENAME = "./res/img/spark.png"
+EXPLOSION_SMALL_TIMER = 3
+
+# Decoded explosion frames, keyed by filename. Decoding the GIF is slow, so
+# each file is only decoded once per process and the frames are shared by
+# every explosion sprite.
+explosion_frame_cache = {}
+explosion_cache_hits = 0
+explosion_cache_misses = 0
+
+# Returns the list of animation keyframes for the given explosion image,
+# decoding it the first time it is requested. Still images are returned as a
+# single keyframe that never advances, so both explosion types can be
+# handled the same way.
+def get_explosion_frames(filename):
+    global explosion_cache_hits
+    global explosion_cache_misses
+    frames = explosion_frame_cache.get(filename)
+    if frames is not None:
+        explosion_cache_hits += 1
+        return frames
+
+    explosion_cache_misses += 1
+    if filename.endswith(".gif"):
+        frames = arcade.load_animated_gif(filename).frames
+    else:
+        frames = [arcade.AnimationKeyframe(0, math.inf, arcade.load_texture(filename))]
+    explosion_frame_cache[filename] = frames
+    return frames
+
+# Percentage of explosion frame lookups that were served from the cache
+def get_explosion_cache_hit_rate():
+    lookups = explosion_cache_hits + explosion_cache_misses
+    if lookups == 0:
+        return 0
+    return explosion_cache_hits / lookups * 100
+
+# A fixed-size set of explosion sprites that are handed out and taken back
+# instead of being created and thrown away for every hit. When every sprite
+# is in use, the oldest active explosion is recycled.
+class ExplosionPool:
+    def __init__(self, size = EXPLOSION_POOL_SIZE):
+        self.size = size
+        self.free = [arcade.AnimatedTimeBasedSprite() for _ in range(size)]
+        for explosion in self.free:
+            explosion.in_pool = True
+        self.active = []
+        # Explosions released since the last call to recycle
+        self.released = []
+
+        # Decode the frames up front so the first hit of a game doesn't stall
+        get_explosion_frames(EXPLOSION_LARGE_FILENAME)
+        get_explosion_frames(EXPLOSION_SMALL_FILENAME)
+
+    # Returns a sprite set up to play the given explosion at the given position
+    def acquire(self, filename, scale, timer, center_x, center_y):
+        if self.free:
+            explosion = self.free.pop()
+        else:
+            explosion = self.active.pop(0)
+            if explosion.in_pool:
+                self.released.remove(explosion)
+            explosion.remove_from_sprite_lists()
+
+        frames = get_explosion_frames(filename)
+        explosion.frames = frames
+        explosion.cur_frame_idx = 0
+        explosion.time_counter = 0.0
+        explosion.texture = frames[0].texture
+        explosion.scale = scale
+        explosion.timer = timer
+        explosion.center_x = center_x
+        explosion.center_y = center_y
+        explosion.in_pool = False
+        self.active.append(explosion)
+        return explosion
+
+    # Takes back a sprite once its explosion has finished. The sprite is
+    # marked dead in its DeferredSpriteLists, and only handed out again
+    # after they've been compacted and recycle has been called.
+    def release(self, explosion):
+        explosion.in_pool = True
+        for sprite_list in explosion.sprite_lists:
+            sprite_list.mark_dead(explosion)
+        self.released.append(explosion)
+
+    # Adds new sprites to the pool until it holds the given number
+    def grow(self, size):
+        for _ in range(size - self.size):
+            explosion = arcade.AnimatedTimeBasedSprite()
+            explosion.in_pool = True
+            self.free.append(explosion)
+        self.size = max(self.size, size)
+
+    # Makes the explosions released since the last call available again
+    def recycle(self):
+        if self.released:
+            self.active = [explosion for explosion in self.active if not explosion.in_pool]
+            self.free.extend(self.released)
+            self.released.clear()
+
+# A SpriteList that removes sprites in batches. Sprites marked with
+# mark_dead stay in the list until the next call to compact, which removes
+# all of them in one pass over the list and one rewrite of its GPU index
+# buffer. SpriteList.remove searches the list and shifts the index buffer
+# for every sprite removed. Loops over the list before it's compacted
+# should skip sprites whose in_pool is True.
+class DeferredSpriteList(arcade.SpriteList):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dead = set()
+
+    def mark_dead(self, sprite):
+        self.dead.add(sprite)
+
+    # A sprite removed straight away is no longer waiting to be removed, so
+    # it isn't dropped by the next compact if it's added back before then
+    def remove(self, sprite):
+        self.dead.discard(sprite)
+        super().remove(sprite)
+
+    # Puts the list's sprites in the given order. sprites must hold exactly
+    # the sprites in the list, so it must be compacted first.
+    def set_order(self, sprites):
+        if self.sprite_list == sprites:
+            return
+        self.sprite_list = list(sprites)
+        self._sprite_index_data[:len(sprites)] = array("i", [self.sprite_slot[sprite]
+                                                             for sprite in sprites])
+        self._sprite_index_changed = True
+
+    def compact(self):
+        dead = self.dead
+        if not dead:
+            return
+        dead_slots = set()
+        for sprite in dead:
+            # The sprite may have been removed some other way since
+            slot = self.sprite_slot.pop(sprite, None)
+            if slot is None:
+                continue
+            sprite.sprite_lists.remove(self)
+            self._sprite_buffer_free_slots.append(slot)
+            dead_slots.add(slot)
+            if self.spatial_hash:
+                self.spatial_hash.remove_object(sprite)
+        self.sprite_list = [sprite for sprite in self.sprite_list if sprite not in dead]
+
+        index_data = [slot for slot in self._sprite_index_data[:self._sprite_index_slots]
+                      if slot not in dead_slots]
+        self._sprite_index_data[:len(index_data)] = array("i", index_data)
+        self._sprite_index_slots = len(index_data)
+        self._sprite_index_changed = True
+        dead.clear()
+
+# Number of sprites each entity pool starts with for every type it hands out.
+# A pool doubles the number of sprites for a type whenever it runs out.
+ENEMY_POOL_CAPACITY = 8
+OBSTACLE_POOL_CAPACITY = 4
+COLLECTABLE_POOL_CAPACITY = 2
+
+# Hands out reusable sprites for one kind of entity (bullets, enemies, etc.)
+# so that spawning and destroying entities doesn't allocate new sprites.
+# Released sprites are marked dead in their DeferredSpriteLists and only
+# handed out again after recycle is called, once the lists are compacted.
+# Sprites are kept in a separate free list per type, since each type has its
+# own texture and scale. The factory is called with a type to create a new
+# sprite with the right texture already attached. Callers are responsible
+# for resetting any other values on the sprites they acquire.
+class EntityPool:
+    def __init__(self, name, factory, types, capacity):
+        self.name = name
+        self.factory = factory
+        self.free = {}
+        # Sprites released since the last call to recycle
+        self.released = []
+        self.type_capacity = {}
+        self.capacity = 0
+        self.in_use = 0
+        self.high_water_mark = 0
+        for type in types:
+            self.grow(type, capacity)
+
+    # Adds the given number of new sprites of the given type to the pool
+    def grow(self, type, amount):
+        free_list = self.free.setdefault(type, [])
+        for _ in range(amount):
+            sprite = self.factory(type)
+            sprite.pool_type = type
+            sprite.in_pool = True
+            free_list.append(sprite)
+        self.type_capacity[type] = self.type_capacity.get(type, 0) + amount
+        self.capacity += amount
+
+    # Returns an unused sprite of the given type, doubling the number of
+    # sprites of that type if none are left
+    def acquire(self, type):
+        free_list = self.free.get(type)
+        if not free_list:
+            self.grow(type, max(1, self.type_capacity.get(type, 0)))
+            free_list = self.free[type]
+        sprite = free_list.pop()
+        sprite.in_pool = False
+        self.in_use += 1
+        if self.in_use > self.high_water_mark:
+            self.high_water_mark = self.in_use
+        return sprite
+
+    # Marks a sprite dead in all its sprite lists and takes it back into the
+    # pool. Releasing a sprite that is already in the pool does nothing.
+    def release(self, sprite):
+        if sprite.in_pool:
+            return
+        sprite.in_pool = True
+        for sprite_list in sprite.sprite_lists:
+            sprite_list.mark_dead(sprite)
+        self.released.append(sprite)
+        self.in_use -= 1
+
+    # Makes the sprites released since the last call available again
+    def recycle(self):
+        for sprite in self.released:
+            self.free[sprite.pool_type].append(sprite)
+        self.released.clear()
+
+    # Summary of the pool's usage for the debug display
+    def stats(self):
+        return f"{self.name} pool: {self.in_use}/{self.capacity} (peak {self.high_water_mark})"
+
+# Width and height of each cell in a collision grid
+COLLISION_CELL_SIZE = 96
+
+# A uniform grid laid over the game area that sorts sprites into cells by
+# their position, used to skip collision checks between sprites that are
+# far apart. Sprites outside the game area are placed in the nearest edge
+# cells. The grid is meant to be rebuilt every tick, and only holds sprites
+# that belong to an entity pool, since released sprites are skipped.
+class CollisionGrid:
+    def __init__(self, cell_size = COLLISION_CELL_SIZE):
+        self.cell_size = cell_size
+        self.columns = math.ceil((GAME_AREA_RIGHT - GAME_AREA_LEFT) / cell_size)
+        self.rows = math.ceil((GAME_AREA_TOP - GAME_AREA_BOTTOM) / cell_size)
+        self.cells = [[] for _ in range(self.columns * self.rows)]
+        # Indices of the cells that have something in them, so clearing the
+        # grid doesn't need to visit every cell
+        self.occupied = []
+
+    # Returns the first and last column and row covered by the given sprite.
+    # The bounds are based on the sprite's diagonal so rotated hit boxes
+    # are always covered.
+    def get_cell_range(self, sprite):
+        radius = math.hypot(sprite.width, sprite.height) / 2
+        return self.get_area_cell_range(sprite.center_x, sprite.center_y, radius)
+
+    # Returns the first and last column and row covered by a square area
+    # reaching the given distance out from the given point
+    def get_area_cell_range(self, x, y, radius):
+        column_min = int((x - radius - GAME_AREA_LEFT) // self.cell_size)
+        column_max = int((x + radius - GAME_AREA_LEFT) // self.cell_size)
+        row_min = int((y - radius - GAME_AREA_BOTTOM) // self.cell_size)
+        row_max = int((y + radius - GAME_AREA_BOTTOM) // self.cell_size)
+        column_min = min(max(column_min, 0), self.columns - 1)
+        column_max = min(max(column_max, 0), self.columns - 1)
+        row_min = min(max(row_min, 0), self.rows - 1)
+        row_max = min(max(row_max, 0), self.rows - 1)
+        return column_min, column_max, row_min, row_max
+
+    def clear(self):
+        for index in self.occupied:
+            self.cells[index].clear()
+        self.occupied.clear()
+
+    def insert(self, sprite):
+        column_min, column_max, row_min, row_max = self.get_cell_range(sprite)
+        for row in range(row_min, row_max + 1):
+            for column in range(column_min, column_max + 1):
+                index = row * self.columns + column
+                cell = self.cells[index]
+                if not cell:
+                    self.occupied.append(index)
+                cell.append(sprite)
+
+    # Empties the grid and fills it with the sprites in the given list
+    def rebuild(self, sprite_list):
+        self.clear()
+        for sprite in sprite_list:
+            self.insert(sprite)
+
+    # Returns every sprite sharing a cell with the given sprite, without
+    # duplicates. These may or may not actually be colliding with it.
+    def query(self, sprite):
+        column_min, column_max, row_min, row_max = self.get_cell_range(sprite)
+        if column_min == column_max and row_min == row_max:
+            return self.cells[row_min * self.columns + column_min]
+
+        nearby = []
+        seen = set()
+        for row in range(row_min, row_max + 1):
+            for column in range(column_min, column_max + 1):
+                for other in self.cells[row * self.columns + column]:
+                    if id(other) not in seen:
+                        seen.add(id(other))
+                        nearby.append(other)
+        return nearby
+
+    # Returns the sprites in the grid that are colliding with the given
+    # sprite, skipping any that have been released back to their pool
+    def collisions(self, sprite):
+        return [other for other in self.query(sprite)
+                if not other.in_pool and arcade.check_for_collision(sprite, other)]
+
+# Returns the left, right, bottom and top of the box around a sprite's hit
+# box, worked out from its archetype's hit box size and the sprite's angle.
+# This is much cheaper than the sprite's own left, right, bottom and top,
+# which transform every point of the hit box.
+def get_hit_bounds(sprite):
+    archetype = sprite.archetype
+    half_width = archetype.half_width
+    half_height = archetype.half_height
+    if sprite.angle:
+        angle = math.radians(sprite.angle)
+        cos = abs(math.cos(angle))
+        sin = abs(math.sin(angle))
+        half_width, half_height = (cos * half_width + sin * half_height,
+                                   sin * half_width + cos * half_height)
+    return (sprite.center_x - half_width, sprite.center_x + half_width,
+            sprite.center_y - half_height, sprite.center_y + half_height)
+
+# Number of bullets the projectile store has room for to start with. The
+# store doubles its room whenever it runs out.
+PROJECTILE_CAPACITY = 256
+
+# Every bullet in a game, player and enemy alike, stored as one NumPy array
+# per value instead of as sprites. Bullets are moved, culled and checked for
+# hits all at once with array operations, and drawn straight from the
+# arrays by ProjectileRenderer. Index i of every array belongs to the same
+# bullet, and bullets are kept in the order they were fired.
+class ProjectileStore:
+    FLOAT_FIELDS = ("x", "y", "change_x", "change_y", "angle", "strength",
+                    "half_width", "half_height")
+    BOOL_FIELDS = ("friendly", "spent")
+
+    def __init__(self, capacity = PROJECTILE_CAPACITY):
+        self.count = 0
+        self.capacity = 0
+        for name in self.FLOAT_FIELDS:
+            setattr(self, name, np.zeros(0))
+        for name in self.BOOL_FIELDS:
+            setattr(self, name, np.zeros(0, dtype = bool))
+        self.type_id = np.zeros(0, dtype = np.int32)
+        self.grow(capacity)
+        # Bullets of the faction set by prepare_hits, sorted by x
+        self.hit_indices = np.zeros(0, dtype = np.intp)
+        self.hit_x = np.zeros(0)
+        self.max_half_width = 0
+
+    def grow(self, capacity):
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS + ("type_id",):
+            old_values = getattr(self, name)
+            values = np.zeros(capacity, dtype = old_values.dtype)
+            values[:self.count] = old_values[:self.count]
+            setattr(self, name, values)
+        self.capacity = capacity
+
+    # Adds a bullet of the given archetype (one of archetypes["bullet"]).
+    # angle is in degrees, counterclockwise like sprite angles.
+    def spawn(self, archetype, x, y, change_x, change_y, angle, strength):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        index = self.count
+        self.count += 1
+        self.x[index] = x
+        self.y[index] = y
+        self.change_x[index] = change_x
+        self.change_y[index] = change_y
+        self.angle[index] = angle
+        self.strength[index] = strength
+        self.friendly[index] = archetype.friendly
+        self.spent[index] = False
+        self.type_id[index] = archetype.type_id
+
+        # Bullets never turn, so the box around their rotated hit box is
+        # worked out once
+        half_width = archetype.half_width
+        half_height = archetype.half_height
+        if angle:
+            cos = abs(math.cos(math.radians(angle)))
+            sin = abs(math.sin(math.radians(angle)))
+            half_width, half_height = (cos * half_width + sin * half_height,
+                                       sin * half_width + cos * half_height)
+        self.half_width[index] = half_width
+        self.half_height[index] = half_height
+
+    # Removes the bullets where keep is False, keeping the rest in order.
+    # Returns whether any bullets were removed.
+    def compact(self, keep):
+        kept = np.count_nonzero(keep)
+        if kept == self.count:
+            return False
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS + ("type_id",):
+            values = getattr(self, name)
+            values[:kept] = values[:self.count][keep]
+        self.count = kept
+        return True
+
+    # Moves every bullet and removes the ones that have left the screen
+    def update(self):
+        count = self.count
+        x = self.x[:count]
+        y = self.y[:count]
+        x += self.change_x[:count]
+        y += self.change_y[:count]
+        half_width = self.half_width[:count]
+        half_height = self.half_height[:count]
+        self.compact((y - half_height <= SCREEN_HEIGHT) & (y + half_height >= 0) &
+                     (x - half_width <= SCREEN_WIDTH) & (x + half_width >= 0))
+
+    # Gets ready to look for hits from bullets of one faction. Bullets that
+    # hit something should be marked as spent, and are removed by
+    # remove_spent once every hit has been handled.
+    def prepare_hits(self, friendly):
+        count = self.count
+        if count == 0:
+            self.hit_indices = self.hit_indices[:0]
+            self.hit_x = self.hit_x[:0]
+            return
+        indices = np.flatnonzero(self.friendly[:count] == friendly)
+        self.hit_indices = indices[np.argsort(self.x[indices], kind = "stable")]
+        self.hit_x = self.x[self.hit_indices]
+        self.max_half_width = self.half_width[indices].max() if len(indices) else 0
+
+    # Returns the indices, in firing order, of the unspent bullets of the
+    # prepared faction that overlap the given box. Bullets are sorted by x,
+    # so only the ones in the box's x range are tested.
+    def hits(self, left, right, bottom, top):
+        start = np.searchsorted(self.hit_x, left - self.max_half_width, "right")
+        end = np.searchsorted(self.hit_x, right + self.max_half_width, "left")
+        indices = self.hit_indices[start:end]
+        if len(indices) == 0:
+            return indices
+        x = self.x[indices]
+        y = self.y[indices]
+        half_width = self.half_width[indices]
+        half_height = self.half_height[indices]
+        hit = ((x + half_width > left) & (x - half_width < right) &
+               (y + half_height > bottom) & (y - half_height < top) & ~self.spent[indices])
+        return np.sort(indices[hit])
+
+    # Returns the index of the first bullet of the prepared faction within
+    # the given distance of a point, or None if there isn't one
+    def find_within(self, x, y, radius):
+        start = np.searchsorted(self.hit_x, x - radius, "right")
+        end = np.searchsorted(self.hit_x, x + radius, "left")
+        indices = self.hit_indices[start:end]
+        if len(indices) == 0:
+            return None
+        distance_x = self.x[indices] - x
+        distance_y = self.y[indices] - y
+        within = indices[distance_x * distance_x + distance_y * distance_y < radius * radius]
+        if len(within) == 0:
+            return None
+        return within.min()
+
+    # Returns whether any bullets were removed
+    def remove_spent(self):
+        return self.compact(~self.spent[:self.count])
+
+# Returns a factory for an EntityPool that creates sprites from the
+# archetypes of the given kind
+def archetype_factory(kind):
+    return lambda type: archetypes[kind][type].create_sprite()
+
+# Replay file values. A replay file starts with a header holding the file
+# type, format version, RNG seed, number of key events and number of ticks.
+# It is followed by the key events and a checksum of the game state after
+# every tick, compressed with zlib.
+REPLAY_MAGIC = b"SGRP"
+REPLAY_VERSION = 4
+REPLAY_HEADER_FORMAT = "<4sHQII"
+# Tick the event happened before, key code, and 1 for press or 0 for release
+REPLAY_EVENT_FORMAT = "<IIB"
+
+# The key presses and releases of a single game, along with the seed it was
+# played with and a checksum of the game state after every tick. Playing the
+# events back into a game with the same seed reproduces the game exactly,
+# and the checksums are used to check that it did.
+class Replay:
+    def __init__(self, seed):
+        self.seed = seed
+        # List of (tick, key, pressed) tuples. tick is the number of ticks
+        # that had run when the key event happened.
+        self.events = []
+        self.checksums = array("I")
+
+    def save(self, filename):
+        events = b"".join(struct.pack(REPLAY_EVENT_FORMAT, tick, key, pressed)
+                          for tick, key, pressed in self.events)
+        header = struct.pack(REPLAY_HEADER_FORMAT, REPLAY_MAGIC, REPLAY_VERSION, self.seed,
+                             len(self.events), len(self.checksums))
+        with open(filename, "wb") as replay_file:
+            replay_file.write(header)
+            replay_file.write(zlib.compress(events + self.checksums.tobytes()))
+
+    @staticmethod
+    def load(filename):
+        with open(filename, "rb") as replay_file:
+            data = replay_file.read()
+        header_size = struct.calcsize(REPLAY_HEADER_FORMAT)
+        magic, version, seed, event_count, tick_count = struct.unpack(
+            REPLAY_HEADER_FORMAT, data[:header_size])
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{filename} is not a version {REPLAY_VERSION} replay file")
+
+        body = zlib.decompress(data[header_size:])
+        replay = Replay(seed)
+        event_size = struct.calcsize(REPLAY_EVENT_FORMAT)
+        events_end = event_count * event_size
+        replay.events = [(tick, key, bool(pressed)) for tick, key, pressed in
+                         struct.iter_unpack(REPLAY_EVENT_FORMAT, body[:events_end])]
+        replay.checksums.frombytes(body[events_end:])
+        if len(replay.checksums) != tick_count:
+            raise ValueError(f"{filename} is truncated")
+        return replay
+
+# Plays a replay back in a headless game as fast as possible, checking the
+# game state against the recorded checksum after every tick. Returns the
+# number of ticks run, the time taken in seconds, and the first tick whose
+# state didn't match the recording (None if every tick matched).
+def play_replay(replay):
+    game = SpaceGameSimulation(replay.seed)
+    game.setup()
+    events = replay.events
+    event_index = 0
+    mismatch_tick = None
+    start_time = time.perf_counter()
+    while game.tick_count < len(replay.checksums):
+        # Apply every key event that happened before this tick
+        while event_index < len(events) and events[event_index][0] <= game.tick_count:
+            _, key, pressed = events[event_index]
+            if pressed:
+                game.on_key_press(key, 0)
+            else:
+                game.on_key_release(key, 0)
+            event_index += 1
+
+        tick = game.tick_count
+        game.tick()
+        if game.tick_count == tick:
+            # The game is paused or over, so it can't match the recording
+            mismatch_tick = tick + 1
+            break
+        if game.get_checksum() != replay.checksums[tick]:
+            mismatch_tick = game.tick_count
+            break
+    elapsed = time.perf_counter() - start_time
+    return game.tick_count, elapsed, mismatch_tick
+
+# Snapshot values. A snapshot starts with a header holding the file type,
+# format version, RNG seed and the number of each kind of record that
+# follows. It's followed by the game counters, the player, both RNG states,
+# and then the records: stage ticks, collectables picked up, damage taken,
+# enemies, enemy batches, obstacles, collectables, explosions and bullets.
+SNAPSHOT_MAGIC = b"SGSS"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER_FORMAT = "<4sHQIIIIIIIII"
+# Score, kills, stage, enemies spawned, between stage timer, tick count,
+# stage start tick, the enemy, obstacle and collectable spawn timers, enemy
+# direction, game over and paused
+SNAPSHOT_GAME_FORMAT = "<qiiiiIIdddi??"
+# Position, velocity, the four moving flags, health, max health,
+# invincible timer, speed, bullet speed, bullet power, shoot cooldown
+# and the cooldown's starting value
+SNAPSHOT_PLAYER_FORMAT = "<dddd????iiiiiiii"
+# random.Random version and gauss_next (with whether it's set), then the
+# NumPy PCG64 state and increment as high and low halves, has_uint32 and
+# uinteger. The Mersenne Twister state follows as SNAPSHOT_MT_STATE_SIZE
+# unsigned ints.
+SNAPSHOT_RNG_FORMAT = "<i?dQQQQ?I"
+SNAPSHOT_MT_STATE_SIZE = 625
+# Kind and type id of a damage source, and the damage dealt. The death
+# cause is stored the same way, with kind SNAPSHOT_NO_SOURCE if not set.
+SNAPSHOT_SOURCE_FORMAT = "<BBi"
+SNAPSHOT_NO_SOURCE = 255
+# Collectable type id and the number picked up
+SNAPSHOT_COLLECTED_FORMAT = "<BI"
+# Type id, position and health
+SNAPSHOT_ENEMY_FORMAT = "<Bddi"
+# Type id and number of enemies. Followed by the index of each enemy slot's
+# sprite among the enemy records, as unsigned ints, and then the first
+# count values of each of the batch's FLOAT_FIELDS and BOOL_FIELDS.
+SNAPSHOT_BATCH_FORMAT = "<BI"
+# Type id, position, velocity, angle, spin and health
+SNAPSHOT_OBSTACLE_FORMAT = "<Bddddddi"
+# Type id, position and velocity
+SNAPSHOT_COLLECTABLE_FORMAT = "<Bdddd"
+# 1 for large or 0 for small, position, scale, timer, animation frame and
+# time into the frame
+SNAPSHOT_EXPLOSION_FORMAT = "<Bdddiid"
+
+# The kinds of archetype in ARCHETYPE_STATS, by the id they're stored with
+ARCHETYPE_KINDS = list(ARCHETYPE_STATS)
+# Entity types of each kind, by type_id
+ARCHETYPE_TYPES = { kind: list(stats) for kind, stats in ARCHETYPE_STATS.items() }
+
+# Reads the values out of a snapshot in order
+class SnapshotReader:
+    def __init__(self, snapshot):
+        self.data = memoryview(snapshot)
+        self.offset = 0
+
+    def unpack(self, format):
+        values = struct.unpack_from(format, self.data, self.offset)
+        self.offset += struct.calcsize(format)
+        return values
+
+    # Returns a list of count tuples of the given format
+    def unpack_records(self, format, count):
+        size = struct.calcsize(format) * count
+        records = list(struct.iter_unpack(format, self.data[self.offset:self.offset + size]))
+        self.offset += size
+        return records
+
+    # Returns the next count values as an array of the given dtype
+    def read_array(self, dtype, count):
+        values = np.frombuffer(self.data, dtype, count, self.offset)
+        self.offset += values.nbytes
+        return values
+
+# Pairs the live sprites in sprite_list with the types of a snapshot's
+# records, in order, so a restore can reuse sprites that are already in the
+# game. Returns the sprite for each type, or None where there isn't a live
+# sprite of that type left, and passes the live sprites that weren't used
+# to release. A sprite's type is its pool_type unless get_type is given.
+def match_sprites(sprite_list, types, release, get_type = None):
+    live = {}
+    for sprite in sprite_list:
+        if not sprite.in_pool:
+            live.setdefault(get_type(sprite) if get_type else sprite.pool_type, []).append(sprite)
+    for sprites in live.values():
+        sprites.reverse()
+    matched = [live[type].pop() if live.get(type) else None for type in types]
+    for sprites in live.values():
+        for sprite in sprites:
+            release(sprite)
+    return matched
+
+# Frame profiler values
+# Number of recent frames the rolling min/mean/p99 and the graph cover
+PROFILER_WINDOW = 240
+# Number of frames between updates of the on-screen stats
+PROFILER_STATS_INTERVAL = 30
+# Frame time graph position and size, and the frame time at its top
+PROFILER_GRAPH_LEFT = GAME_AREA_RIGHT + 20
+PROFILER_GRAPH_BOTTOM = 20
+PROFILER_GRAPH_WIDTH = 480
+PROFILER_GRAPH_HEIGHT = 120
+PROFILER_GRAPH_MAX_MS = 50
+# Every phase the profiler times, in the order they run in a frame
+PROFILER_PHASES = [
+    "player_list.update", "projectiles.update", "enemy_list.update",
+    "obstacle_list.update", "collectable_list.update", "explosion_list.update",
+    "cull_off_screen", "check_collision", "spawn_entities", "enemy_shooting",
+    "compact_sprite_lists",
+    "starfield.draw", "background_layer.draw", "player_list.draw", "projectiles.draw",
+    "enemy_list.draw", "obstacle_list.draw", "collectable_list.draw", "explosion_list.draw", "overlay_layer.draw", "text_layer.draw",
+    # Totals for all the ticks run in the frame and for drawing it
+    "simulation", "render"
+]
+# Entity counts recorded with every frame, the number of ticks run, and the
+# draw calls and texture binds counted by RenderStats
+PROFILER_COUNTS = ["bullets", "enemies", "obstacles", "collectables", "explosions", "ticks",
+                   "draw_calls", "texture_binds"]
+
+# Times each phase of a frame. lap(phase) adds the time since the previous
+# lap (or restart) to that phase, so a phase is timed by calling lap right
+# after it runs. Keeps the last PROFILER_WINDOW frames for rolling stats and
+# the frame time graph, and can write every frame to a CSV file.
+class FrameProfiler:
+    def __init__(self, csv_filename = None):
+        self.frame = 0
+        self.phase_times = dict.fromkeys(PROFILER_PHASES, 0.0)
+        self.history = { phase: collections.deque(maxlen = PROFILER_WINDOW)
+                         for phase in PROFILER_PHASES }
+        self.frame_times = collections.deque(maxlen = PROFILER_WINDOW)
+        self.counts = dict.fromkeys(PROFILER_COUNTS, 0)
+        # Rolling (min, mean, p99) in milliseconds for each phase, updated
+        # every PROFILER_STATS_INTERVAL frames
+        self.stats = {}
+        self.last_lap = time.perf_counter()
+        self.last_frame_end = None
+        self.csv_file = None
+        self.csv_writer = None
+        if csv_filename is not None:
+            self.csv_file = open(csv_filename, "w", newline = "")
+            self.csv_writer = csv.writer(self.csv_file)
+            self.csv_writer.writerow(["frame", "frame_ms"] + PROFILER_PHASES + PROFILER_COUNTS)
+
+    # Starts timing from now, so time spent outside the profiled code isn't
+    # added to the next phase
+    def restart(self):
+        self.last_lap = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.phase_times[phase] += now - self.last_lap
+        self.last_lap = now
+
+    # Adds time measured some other way, such as around several phases
+    def record(self, phase, seconds):
+        self.phase_times[phase] += seconds
+
+    # Stores the current frame's phase times and entity counts and starts a
+    # new frame. Frame time is measured between calls, so it includes
+    # everything done outside the profiled phases too.
+    def end_frame(self, **counts):
+        now = time.perf_counter()
+        frame_ms = 0.0
+        if self.last_frame_end is not None:
+            frame_ms = (now - self.last_frame_end) * 1000
+            self.frame_times.append(frame_ms)
+        self.last_frame_end = now
+        self.counts.update(counts)
+
+        row = [self.frame, round(frame_ms, 3)]
+        for phase in PROFILER_PHASES:
+            phase_ms = self.phase_times[phase] * 1000
+            self.history[phase].append(phase_ms)
+            row.append(round(phase_ms, 3))
+            self.phase_times[phase] = 0.0
+        if self.csv_writer is not None:
+            self.csv_writer.writerow(row + [self.counts[name] for name in PROFILER_COUNTS])
+
+        if self.frame % PROFILER_STATS_INTERVAL == 0:
+            self.update_stats()
+        self.frame += 1
+
+    def update_stats(self):
+        for phase, times in self.history.items():
+            times = np.fromiter(times, np.float64, len(times))
+            self.stats[phase] = (times.min(), times.mean(), np.percentile(times, 99))
+
+    # Returns the lines shown on screen, from top to bottom
+    def get_lines(self):
+        lines = ["Phase (ms): min / mean / p99"]
+        for phase in PROFILER_PHASES:
+            if phase in self.stats:
+                low, mean, p99 = self.stats[phase]
+                lines.append(f"{phase}: {low:.2f} / {mean:.2f} / {p99:.2f}")
+        lines.append(", ".join(f"{name}: {self.counts[name]}" for name in PROFILER_COUNTS))
+        if self.frame_times:
+            lines.append(f"Frame: {self.frame_times[-1]:.1f} ms "
+                         f"(max {max(self.frame_times):.1f} ms)")
+        return lines
+
+    # Draws the recent frame times as a line graph, with a line marking the
+    # 60 FPS frame budget
+    def draw_graph(self):
+        left = PROFILER_GRAPH_LEFT
+        bottom = PROFILER_GRAPH_BOTTOM
+        scale = PROFILER_GRAPH_HEIGHT / PROFILER_GRAPH_MAX_MS
+        arcade.draw_lrtb_rectangle_filled(left, left + PROFILER_GRAPH_WIDTH,
+            bottom + PROFILER_GRAPH_HEIGHT, bottom, arcade.color.BLACK + (150,))
+        budget_y = bottom + 1000 / 60 * scale
+        arcade.draw_line(left, budget_y, left + PROFILER_GRAPH_WIDTH, budget_y,
+                         arcade.color.GREEN)
+        if len(self.frame_times) > 1:
+            step = PROFILER_GRAPH_WIDTH / (PROFILER_WINDOW - 1)
+            points = [(left + index * step, bottom + min(frame_ms, PROFILER_GRAPH_MAX_MS) * scale)
+                      for index, frame_ms in enumerate(self.frame_times)]
+            arcade.draw_line_strip(points, arcade.color.YELLOW)
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = None
+            self.csv_writer = None
+
+# Stands in for a FrameProfiler when profiling is off, so the game can time
+# its phases without checking whether a profiler is running
+class NullProfiler:
+    def restart(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def record(self, phase, seconds):
+        pass
+
+NULL_PROFILER = NullProfiler()
+
+# The game rules for a single run: spawning, movement, collisions, stages
+# and powerups. Nothing here needs a window, a GPU or audio, so the
+# simulation can be stepped with tick() as fast as the CPU allows for
+# testing and tuning. Sprites are still loaded from res/img so hit boxes
+# match the real game. SpaceGameView adds drawing, music and sound on top.
+class SpaceGameSimulation:
+    # seed is used for every random decision in the game. A random seed is
+    # picked if none is given.
+    def __init__(self, seed = None):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # NumPy generator, seeded the same way, for the random decisions
+        # made for whole batches of enemies at once
+        self.np_rng = None
+        # The Replay the game is being recorded to, if any
+        self.replay = None
+        # Times the phases of each tick when set to a FrameProfiler
+        self.profiler = NULL_PROFILER
         self.player = None
         self.player_list = None
-        self.bullet_list = None
+        self.projectiles = None
         self.obstacle_list = None
         self.collectable_list = None
         self.explosion_list = None
-        self.player_shield = None
-
-        # Stuff for hud
-        self.hud_frame = None
-        self.bg_moon = None
+        self.explosion_pool = None
+        self.enemy_pool = None
+        self.obstacle_pool = None
+        self.collectable_pool = None
+        self.enemy_grid = None
+        self.obstacle_grid = None
+        self.collectable_grid = None
 
         self.enemy_spawn_timer = ENEMY_SPAWN_TIMERS[0]
         self.obstacle_spawn_timer = OBSTACLE_SPAWN_TIMERS[0]
@@ -360,11 +1537,11 @@ class SpaceGameView(arcade.View):
         
         #This is for the enemies when implamented 
         self.enemy_list = None
+        self.enemy_behaviors = None
         self.enemy_direction = 1
 
-        # Music stuff
-        self.music = None
-        self.music_player = None
+        # Sound effects are only loaded by SpaceGameView, and stay None when
+        # running without a window
         self.bullet_friendly_sfx = None
         self.bullet_enemy_sfx = None
         self.explosion_big_sfx = None
@@ -379,21 +1556,39 @@ class SpaceGameView(arcade.View):
         self.stage = 1
         self.paused = False
         self.between_stage_timer = BETWEEN_STAGE_TIMER
+        self.tick_count = 0
+
+        # Stats about the run for telemetry: collectables picked up by type,
+        # damage taken by whatever dealt it, what dealt the last damage, and
+        # the ticks spent in each stage that has been cleared
+        self.collected = None
+        self.damage_taken = None
+        self.death_cause = None
+        self.stage_ticks = None
+        self.stage_start_tick = 0
 
     def setup(self):
+        self.rng.seed(self.seed)
+        self.np_rng = np.random.default_rng(self.seed)
         self.player_list = arcade.SpriteList()
-        self.bullet_list = arcade.SpriteList()
-        self.enemy_list = arcade.SpriteList()
-        self.collectable_list = arcade.SpriteList()
-        self.obstacle_list = arcade.SpriteList()
-        self.star_list = arcade.SpriteList()
-        self.explosion_list = arcade.SpriteList()
-        self.player_shield = arcade.SpriteCircle(100, arcade.color.BABY_BLUE, True)
-        self.player_shield.alpha = 150
-        self.hud_frame = arcade.Sprite("./res/img/hud_frame.png", 
-            center_x = SCREEN_WIDTH // 2, center_y = SCREEN_HEIGHT // 2)
-        self.bg_moon = arcade.Sprite("./res/img/bg_moon.png", 
-            center_x = SCREEN_WIDTH // 2, center_y = -100)
+        self.projectiles = ProjectileStore()
+        self.enemy_list = DeferredSpriteList()
+        self.collectable_list = DeferredSpriteList()
+        self.obstacle_list = DeferredSpriteList()
+        self.explosion_list = DeferredSpriteList()
+        self.explosion_pool = ExplosionPool()
+        compile_archetypes()
+        self.enemy_behaviors = EnemyBehaviorSystem()
+        self.enemy_pool = EntityPool("Enemy",
+            lambda type: Enemy(archetypes["enemy"][type]), ENEMY_STATS,
+            ENEMY_POOL_CAPACITY)
+        self.obstacle_pool = EntityPool("Obstacle", archetype_factory("obstacle"), OBSTACLE_STATS,
+            OBSTACLE_POOL_CAPACITY)
+        self.collectable_pool = EntityPool("Collectable", archetype_factory("collectable"),
+            COLLECTABLE_STATS, COLLECTABLE_POOL_CAPACITY)
+        self.enemy_grid = CollisionGrid()
+        self.obstacle_grid = CollisionGrid()
+        self.collectable_grid = CollisionGrid()
         self.score = 0
         self.kills = 0
         self.enemies_spawned = 0
@@ -401,6 +1596,12 @@ class SpaceGameView(arcade.View):
         self.stage = 1
         self.paused = False
         self.between_stage_timer = 0
+        self.tick_count = 0
+        self.collected = collections.Counter()
+        self.damage_taken = collections.Counter()
+        self.death_cause = None
+        self.stage_ticks = []
+        self.stage_start_tick = 0
          
         # This is our player I tried to find different sprites but this is what I have for now 
         self.player = arcade.Sprite("./res/img/Player Ship.png")
@@ -420,74 +1621,10 @@ class SpaceGameView(arcade.View):
         self.player.shoot_cooldown = 0
         self.player_list.append(self.player)
 
-        self.music = arcade.load_sound("./res/music/game.wav", True)
-        self.music_player = arcade.play_sound(self.music, looping = True)
-        self.bullet_friendly_sfx = arcade.Sound(":resources:sounds/laser1.wav")
-        self.bullet_enemy_sfx = arcade.Sound(":resources:sounds/laser2.wav")
-        self.explosion_big_sfx = arcade.Sound(":resources:sounds/explosion1.wav")
-        self.explosion_small_sfx = arcade.Sound(":resources:sounds/hit4.wav")
-        self.powerup_sfx = arcade.Sound(":resources:sounds/upgrade1.wav")
-
-        # Spawn the initial stars
-        for _ in range(NUM_STARS):
-            self.spawn_star(True)
-        
-    # Drawing method that is called on every frame
-    def on_draw(self):
-        arcade.start_render()
-
-        self.star_list.draw()
-        self.bg_moon.draw()
-        self.player_list.draw()
-        self.bullet_list.draw()
-        self.enemy_list.draw()
-        self.obstacle_list.draw()
-        self.collectable_list.draw()
-        self.explosion_list.draw()
-
-        if self.player.invincible_timer > 0:
-            self.player_shield.center_x = self.player.center_x
-            self.player_shield.center_y = self.player.center_y
-            self.player_shield.draw()
-
-        # Draw hud on top of everything else
-        self.hud_frame.draw()
-        arcade.draw_text(f"Score: {self.score}", 20, 190, arcade.color.WHITE, 30,
-                         font_name = "Kenney Mini Square")
-        arcade.draw_text(f"Stage: {self.stage}", 20, 110, arcade.color.WHITE, 30,
-                         font_name = "Kenney Mini Square")
-        arcade.draw_text(f"HP: {self.player.health}", 20, 30, arcade.color.WHITE, 30,
-                         font_name = "Kenney Mini Square")
-        
-        # Debug info
-        global debug_mode
-        if debug_mode:
-            arcade.draw_text(f"Health: {self.player.health}/{self.player.health_max}", 10, 20)
-            arcade.draw_text(f"Shoot cooldown: {self.player.shoot_cooldown}", 10, 50)
-            arcade.draw_text(f"Bullet power: {self.player.current_bullet_power}", 10, 80)
-            arcade.draw_text(f"Bullet speed: {self.player.current_bullet_speed}", 10, 110)
-            arcade.draw_text(f"Speed: {self.player.current_speed}", 10, 140)
-            arcade.draw_text(f"Invincible timer: {self.player.invincible_timer}", 10, 170)
-            arcade.draw_text(f"Between stage timer: {self.between_stage_timer}", 10, 200)
-            arcade.draw_text(f"enemy spawn timer: {self.enemy_spawn_timer}", 10, 230)
-            arcade.draw_text(f"enemy spawn count: {self.enemies_spawned}", 10, 260)
-            for enemy in self.enemy_list:
-                arcade.draw_text(f"Health: {enemy.health}", enemy.center_x + 20, enemy.center_y)
-            for obstacle in self.obstacle_list:
-                arcade.draw_text(f"Health: {obstacle.health}", obstacle.center_x + 20, obstacle.center_y)
-            for collectable in self.collectable_list:
-                arcade.draw_text(collectable.type, collectable.center_x + 10, collectable.center_y)
-
-        # Draw the pause overlay
-        if self.paused:
-            # These draw functions accept colors in RGB or RGBA format. The built in colors,
-            # like arcade.color.BLACK, are RGB format. Adding (200,) adds an alpha value to
-            # make it RGBA, allowing for transparency.
-            arcade.draw_lrtb_rectangle_filled(0, SCREEN_WIDTH, SCREEN_HEIGHT, 0, arcade.color.BLACK + (200,))
-            arcade.draw_text("PAUSED", 0, SCREEN_HEIGHT / 2, font_size = 30,
-                width = SCREEN_WIDTH, align = "center", font_name = "Kenney Pixel Square")
-
     def on_key_press(self, key, modifiers):
+        if self.replay is not None:
+            self.replay.events.append((self.tick_count, key, True))
+
         if key == arcade.key.LEFT:
             self.player.moving_left = True
 
@@ -508,17 +1645,17 @@ class SpaceGameView(arcade.View):
         elif key == arcade.key.ENTER:
             self.paused = not self.paused
 
-    def update(self, delta_time):
+    # Advances the game by a single tick. Does nothing once the game is over
+    # or while paused.
+    def tick(self):
         if self.player.health <= 0:
-            arcade.stop_sound(self.music_player)
-            game_over = GameOverView()
-            game_over.setup(self.score)
-            self.window.show_view(game_over)
-            return
-        
-        if self.paused:
+            self.game_over = True
+
+        if self.game_over or self.paused:
             return
 
+        self.tick_count += 1
+
         # Update the player's movement and timers
         if self.player.moving_left and not self.player.moving_right:
             self.player.change_x = -self.player.current_speed
@@ -538,18 +1675,25 @@ class SpaceGameView(arcade.View):
 
         self.between_stage_timer -= 1
 
-        self.star_list.update()
+        profiler = self.profiler
+        profiler.restart()
         self.player_list.update()
-        self.bullet_list.update()
-        self.enemy_list.update()
+        profiler.lap("player_list.update")
+        self.projectiles.update()
+        profiler.lap("projectiles.update")
+        self.enemy_behaviors.update(self.np_rng)
+        profiler.lap("enemy_list.update")
         self.obstacle_list.update()
+        profiler.lap("obstacle_list.update")
         self.collectable_list.update()
+        profiler.lap("collectable_list.update")
         self.explosion_list.update_animation()
 
         for explosion in self.explosion_list:
             explosion.timer -= 1
             if explosion.timer < 0:
-                explosion.remove_from_sprite_lists()
+                self.explosion_pool.release(explosion)
+        profiler.lap("explosion_list.update")
 
         # This is what keeps our ship confined to our screen
         if self.player.left < GAME_AREA_LEFT:
@@ -565,18 +1709,33 @@ class SpaceGameView(arcade.View):
             self.player.top = GAME_AREA_TOP
 
         # Remove entities that have moved off screen
+        profiler.restart()
         self.cull_off_screen()
+        profiler.lap("cull_off_screen")
 
         # Check for collision between entities
         self.check_collision()
+        profiler.lap("check_collision")
 
         # Spawn all entities
         self.spawn_entities()
+        profiler.lap("spawn_entities")
 
         self.enemy_shooting()
-    
+        profiler.lap("enemy_shooting")
+
+        # Remove everything destroyed during the tick
+        self.compact_sprite_lists()
+        profiler.lap("compact_sprite_lists")
+
+        if self.replay is not None:
+            self.replay.checksums.append(self.get_checksum())
+
     #Updates button press on release so that we dont continue moving
     def on_key_release(self, key, modifiers):
+        if self.replay is not None:
+            self.replay.events.append((self.tick_count, key, False))
+
         if key == arcade.key.LEFT:
             self.player.moving_left = False
         elif key == arcade.key.RIGHT:
@@ -586,252 +1745,216 @@ class SpaceGameView(arcade.View):
         elif key == arcade.key.DOWN:
             self.player.moving_down = False
 
+    # Removes the sprites released during the tick from their lists, all at
+    # once, and lets the pools hand them out again
+    def compact_sprite_lists(self):
+        for sprite_list in (self.enemy_list, self.obstacle_list, self.collectable_list,
+                            self.explosion_list):
+            sprite_list.compact()
+        for pool in (self.enemy_pool, self.obstacle_pool, self.collectable_pool,
+                     self.explosion_pool):
+            pool.recycle()
+
     def cull_off_screen(self):
-        # Removes the bullets that are off screen 
-        for bullet in self.bullet_list:
-            if bullet.bottom > SCREEN_HEIGHT or bullet.top < 0:
-                bullet.remove_from_sprite_lists()
+        # Bullets that are off screen are removed by ProjectileStore.update
 
-        # Removes enemies that are off screen
+        # Removes enemies that are off screen. Enemies and collectables never
+        # rotate, so their top comes from the archetype instead of the
+        # sprite's top, which transforms every point of the hit box.
         for enemy in self.enemy_list:
-            if enemy.top < 0:
+            if enemy.center_y + enemy.archetype.top < 0:
                 type = enemy.type
-                enemy.remove_from_sprite_lists()
+                self.release_enemy(enemy)
                 self.spawn_enemy(type)
 
-        # Removes obstacles that are off screen
+        # Removes obstacles that are off screen. Only obstacles whose hit
+        # bounds reach below the screen need their exact top.
         for obstacle in self.obstacle_list:
-            if obstacle.top < 0:
-                obstacle.remove_from_sprite_lists()
+            if get_hit_bounds(obstacle)[2] < 0 and obstacle.top < 0:
+                self.obstacle_pool.release(obstacle)
 
         # Removes collectables that are off screen
         for collectable in self.collectable_list:
-            if collectable.top < 0:
-                collectable.remove_from_sprite_lists()
-
-        # Removes stars that are off screen and spawns new ones
-        for star in self.star_list:
-            if star.center_y < -5:
-                star.remove_from_sprite_lists()
-                self.spawn_star()
+            if collectable.center_y + collectable.archetype.top < 0:
+                self.collectable_pool.release(collectable)
 
     def check_collision(self):
+        # Sort everything that can be hit into the collision grids, so each
+        # check below only has to look at entities in nearby cells
+        self.enemy_grid.rebuild(self.enemy_list)
+        self.obstacle_grid.rebuild(self.obstacle_list)
+        self.collectable_grid.rebuild(self.collectable_list)
+        projectiles = self.projectiles
+        projectiles.prepare_hits(friendly = False)
+
         for player in self.player_list:
 
             # If player is not invincible
             if player.invincible_timer < 0:
                 # Check for player-enemy collisions
-                player_enemy_collision = arcade.check_for_collision_with_list(
-                    player, self.enemy_list
-                )
+                player_enemy_collision = self.enemy_grid.collisions(player)
                 # Decrement player health and destroy enemy
                 for enemy in player_enemy_collision:
-                    player.health -= enemy.strength
+                    self.damage_player(player, enemy.strength, enemy.archetype)
                     self.spawn_explosion(enemy.center_x, enemy.center_y)
-                    enemy.remove_from_sprite_lists()
+                    self.release_enemy(enemy)
 
                 # Check for player-bullet collisions
-                player_bullet_collision = arcade.check_for_collision_with_list(
-                    player, self.bullet_list
-                )
-                for bullet in player_bullet_collision:
-                    if bullet.friendly == False:
-                        player.health -= bullet.strength
-                        self.spawn_explosion(bullet.center_x, bullet.center_y, "small")
-                        bullet.remove_from_sprite_lists()
+                for bullet in projectiles.hits(player.left, player.right,
+                                               player.bottom, player.top).tolist():
+                    self.damage_player(player, int(projectiles.strength[bullet]),
+                        archetypes["bullet"][BULLET_TYPES[projectiles.type_id[bullet]]])
+                    self.spawn_explosion(projectiles.x[bullet], projectiles.y[bullet], "small")
+                    projectiles.spent[bullet] = True
 
                 # Check for player-obstacle collisions
-                player_obstacle_collision = arcade.check_for_collision_with_list(
-                    player, self.obstacle_list
-                )
+                player_obstacle_collision = self.obstacle_grid.collisions(player)
                 for obstacle in player_obstacle_collision:
-                    player.health -= obstacle.strength
+                    self.damage_player(player, obstacle.strength, obstacle.archetype)
                     self.spawn_explosion(obstacle.center_x, obstacle.center_y)
-                    obstacle.remove_from_sprite_lists()
+                    self.obstacle_pool.release(obstacle)
 
             # Check for player-collectable collisions
-            player_collectable_collision = arcade.check_for_collision_with_list(
-                player, self.collectable_list
-            )
+            player_collectable_collision = self.collectable_grid.collisions(player)
             for collectable in player_collectable_collision:
                 self.collect_collectable(player, collectable.type)
+                self.collected[collectable.type] += 1
                 self.score += collectable.score
-                collectable.remove_from_sprite_lists()
-
-        # Check for enemy-bullet collisions
-        for bullet in self.bullet_list:
-            if bullet.friendly == True:
-                enemy_bullet_collision = arcade.check_for_collision_with_list(
-                    bullet, self.enemy_list
-                )
-                for enemy in enemy_bullet_collision:
-                    enemy.health -= bullet.strength
-                    if enemy.health <= 0:
-                        self.score += enemy.score
-                        self.kills += 1
-                        self.set_stage()
-                        enemy.remove_from_sprite_lists()
-                        self.spawn_explosion(enemy.center_x, enemy.center_y)
-                    else:
-                        self.spawn_explosion(bullet.center_x, bullet.center_y, "small")
-                    bullet.remove_from_sprite_lists()
-                    
-                    # Break so one bullet doesn't affect multiple enemies
+                self.collectable_pool.release(collectable)
+
+        # Check for enemy-bullet and obstacle-bullet collisions. Enemies are
+        # checked first, and a bullet only ever hits one target. Bullets
+        # that overlap a target after it's destroyed carry on to the next.
+        # Targets destroyed earlier in the tick are still in their lists
+        # until compact_sprite_lists, so they're skipped.
+        projectiles.prepare_hits(friendly = True)
+        for enemy in self.enemy_list:
+            if enemy.in_pool:
+                continue
+            for bullet in projectiles.hits(*get_hit_bounds(enemy)).tolist():
+                projectiles.spent[bullet] = True
+                enemy.health -= int(projectiles.strength[bullet])
+                if enemy.health <= 0:
+                    self.score += enemy.score
+                    self.kills += 1
+                    self.set_stage()
+                    self.release_enemy(enemy)
+                    self.spawn_explosion(enemy.center_x, enemy.center_y)
                     break
+                self.spawn_explosion(projectiles.x[bullet], projectiles.y[bullet], "small")
 
-        # Check for obstacle-bullet collisions
-        for bullet in self.bullet_list:
-            if bullet.friendly == True:
-                obstacle_bullet_collision = arcade.check_for_collision_with_list(
-                    bullet, self.obstacle_list
-                )
-                for obstacle in obstacle_bullet_collision:
-                    obstacle.health -= bullet.strength
-                    if obstacle.health <= 0:
-                        self.spawn_explosion(obstacle.center_x, obstacle.center_y)
-                        obstacle.remove_from_sprite_lists()
-                    else:
-                        self.spawn_explosion(bullet.center_x, bullet.center_y, "small")
-                    bullet.remove_from_sprite_lists()
+        for obstacle in self.obstacle_list:
+            if obstacle.in_pool:
+                continue
+            for bullet in projectiles.hits(*get_hit_bounds(obstacle)).tolist():
+                projectiles.spent[bullet] = True
+                obstacle.health -= int(projectiles.strength[bullet])
+                if obstacle.health <= 0:
+                    self.spawn_explosion(obstacle.center_x, obstacle.center_y)
+                    self.obstacle_pool.release(obstacle)
                     break
+                self.spawn_explosion(projectiles.x[bullet], projectiles.y[bullet], "small")
+        if projectiles.remove_spent():
+            projectiles.prepare_hits(friendly = True)
 
-        # Do a special check for dodging enemies
-        for enemy in self.enemy_list:
-            if enemy.type == "basic_dodge" and enemy.dodge_count > 0 and not enemy.dodging:
-                for bullet in self.bullet_list:
-                    if bullet.friendly == True:
-                        distance = arcade.get_distance_between_sprites(enemy, bullet)
-                        if distance < enemy.tolerance:
-                            enemy.dodging = True
-                            enemy.dodge_direction = enemy.center_x - bullet.center_x
-                            enemy.dodge_count -= 1
-                            enemy.timer = enemy.dodge_time
+        # Do a special check for dodging enemies, which dodge the first
+        # friendly bullet found within their tolerance
+        for batch in self.enemy_behaviors.batches.values():
+            if isinstance(batch, DodgeEnemyBatch):
+                batch.dodge(projectiles)
+
+    # source is the archetype of the enemy, bullet or obstacle that hit the
+    # player, and is recorded as its kind and type, such as "bullet:enemy_basic"
+    def damage_player(self, player, amount, source):
+        source = f"{source.kind}:{source.type}"
+        player.health -= amount
+        self.damage_taken[source] += amount
+        self.death_cause = source
 
     def set_stage(self):
         if self.stage < MAX_STAGE and \
             self.kills >= KILL_COUNT_THRESHOLDS[self.stage - 1]:
                 self.stage += 1
                 self.between_stage_timer = BETWEEN_STAGE_TIMER
-    
+                self.stage_ticks.append(self.tick_count - self.stage_start_tick)
+                self.stage_start_tick = self.tick_count
+
     def spawn_explosion(self, center_x, center_y, type = "large"):
         if type == "large":
-            explosion = arcade.load_animated_gif("./res/img/explosion1.gif")
-            explosion.scale = 1
-            explosion.timer = 60
-            self.explosion_big_sfx.play()
+            explosion = self.explosion_pool.acquire(EXPLOSION_LARGE_FILENAME, 1,
+                EXPLOSION_LARGE_TIMER, center_x, center_y)
+            self.play_sound_effect(self.explosion_big_sfx)
         else:
-            explosion = arcade.Sprite("./res/img/spark.png")
-            explosion.scale = 0.5
-            explosion.timer = 3
-            self.explosion_small_sfx.play()
-        explosion.center_x = center_x
-        explosion.center_y = center_y
+            explosion = self.explosion_pool.acquire(EXPLOSION_SMALL_FILENAME, 0.5,
+                EXPLOSION_SMALL_TIMER, center_x, center_y)
+            self.play_sound_effect(self.explosion_small_sfx)
         self.explosion_list.append(explosion)
 
     # Spawns a new enemy of the given type (see ENEMY_STATS above)
     def spawn_enemy(self, type):
-        enemy = Enemy(type)
+        enemy = self.enemy_pool.acquire(type)
+        enemy.reset(self.rng)
+        self.enemy_behaviors.add(enemy, self.rng)
         self.enemy_list.append(enemy)
 
+    # Takes an enemy out of the game and back into the enemy pool
+    def release_enemy(self, enemy):
+        self.enemy_behaviors.remove(enemy)
+        self.enemy_pool.release(enemy)
+
     # Spawns a new obstacle of the given type (see OBSTACLE_STATS above)
     def spawn_obstacle(self, type):
-        if type == "small" or type == "small_fast":
-            image = "./res/img/Space Meatball.png"
-            scale = 0.6
-        elif type == "medium" or type == "medium_fast":
-            image = "./res/img/Space Meatball.png"
-            scale = 1
-        elif type == "large" or type == "large_fast":
-            image = "./res/img/Space Meatball.png"
-            scale = 2
-        else:
-            image = "./res/img/space_debris.png"
-            scale = 0.7
-        obstacle = arcade.Sprite(image, scale)
-        obstacle.center_x = random.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT)
+        archetype = archetypes["obstacle"][type]
+        obstacle = self.obstacle_pool.acquire(type)
+        obstacle.angle = 0
+        obstacle.center_x = self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT)
         obstacle.center_y = SCREEN_HEIGHT + obstacle.height
-        obstacle.change_x = random.uniform(*OBSTACLE_STATS[type]["velocity_x"])
-        obstacle.change_y = random.uniform(*OBSTACLE_STATS[type]["velocity_y"])
-        obstacle.change_angle = random.uniform(*OBSTACLE_STATS[type]["velocity_rotation"])
+        obstacle.change_x = self.rng.uniform(*archetype.velocity_x)
+        obstacle.change_y = self.rng.uniform(*archetype.velocity_y)
+        obstacle.change_angle = self.rng.uniform(*archetype.velocity_rotation)
         obstacle.type = type
-        obstacle.health = OBSTACLE_STATS[type]["health"]
-        obstacle.strength = OBSTACLE_STATS[type]["strength"]
+        obstacle.type_id = archetype.type_id
+        obstacle.health = archetype.health
+        obstacle.strength = archetype.strength
         self.obstacle_list.append(obstacle)
 
     # Spawns a new collectable of the given type (see COLLECTABLE_STATS above)
     def spawn_collectable(self, type):
-        scale = 0.2
-        if type == "health_small":
-            filename = "./res/img/Gold.png"
-        elif type == "health_large":
-            filename = "./res/img/Gold.png"
-            scale = 2
-        elif type == "attack_up":
-            filename = "./res/img/Buff-Debbuf 13.png"
-        elif type == "attack_down":
-            filename = "./res/img/Buff-Debbuf 12.png"
-        elif type == "defense_up":
-            filename = "./res/img/Buff-Debbuf 3.png"
-        elif type == "defense_down":
-            filename = "./res/img/Buff-Debbuf 4.png"
-        elif type == "speed_up":
-            filename = "./res/img/Buff-Debbuf 10.png"
-        elif type == "speed_down":
-            filename = "./res/img/Buff-Debbuf 11.png"
-        elif type == "fire_rate_up":
-            filename = "./res/img/Buff-Debbuf 15.png"
-        elif type == "fire_rate_down":
-            filename = "./res/img/Buff-Debbuf 14.png"
-        elif type == "bullet_speed_up":
-            filename = "./res/img/Buff-Debbuf 8.png"
-        elif type == "bullet_speed_down":
-            filename = "./res/img/Buff-Debbuf 9.png"
-        elif type == "destroy_all_enemies":
-            filename = "./res/img/Buff-Debbuf 1.png"
-        elif type == "invincible":
-            filename = "./res/img/Buff-Debbuf 7.png"
-        else:
-            filename = "./res/img/Buff-Debbuf 13.png"
-        
-        collectable = arcade.Sprite(filename, scale)
-        collectable.center_x = random.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT)
+        archetype = archetypes["collectable"][type]
+        collectable = self.collectable_pool.acquire(type)
+        collectable.center_x = self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT)
         collectable.center_y = SCREEN_HEIGHT + collectable.height
-        collectable.change_x = random.uniform(*COLLECTABLE_STATS[type]["velocity_x"])
-        collectable.change_y = random.uniform(*COLLECTABLE_STATS[type]["velocity_y"])
+        collectable.change_x = self.rng.uniform(*archetype.velocity_x)
+        collectable.change_y = self.rng.uniform(*archetype.velocity_y)
         collectable.type = type
-        collectable.score = COLLECTABLE_STATS[type]["score"]
+        collectable.type_id = archetype.type_id
+        collectable.score = archetype.score
         self.collectable_list.append(collectable)
 
     # Spawns a new bullet of the given type (see BULLET_STATS above)
     def spawn_bullet(self, type, x, y):
-        friendly = BULLET_STATS[type]["friendly"]
-        bullet = arcade.Sprite(":resources:images/space_shooter/laserRed01.png", 0.8)
-        bullet.center_x = x
-        bullet.center_y = y
-        bullet.change_x = random.uniform(*BULLET_STATS[type]["velocity_x"])
-        bullet.change_y = random.uniform(*BULLET_STATS[type]["velocity_y"])
-        bullet.friendly = friendly
-        bullet.strength = 1
+        archetype = archetypes["bullet"][type]
+        change_x = self.rng.uniform(*archetype.velocity_x)
+        change_y = self.rng.uniform(*archetype.velocity_y)
+        angle = 0
+        strength = 1
 
         if type == "enemy_tracker":
-            angle = arcade.get_angle_degrees(
-                bullet.center_x, bullet.center_y,
-                self.player.center_x, self.player.center_y
-            )
-            bullet.change_x = 15 * math.sin(math.radians(angle))
-            bullet.change_y = 15 * math.cos(math.radians(angle))
-            bullet.angle = -angle
+            angle = arcade.get_angle_degrees(x, y, self.player.center_x, self.player.center_y)
+            change_x = 15 * math.sin(math.radians(angle))
+            change_y = 15 * math.cos(math.radians(angle))
+            angle = -angle
         
         elif type == "player_basic":
-            bullet.change_y = self.player.current_bullet_speed
-            bullet.strength = self.player.current_bullet_power
+            change_y = self.player.current_bullet_speed
+            strength = self.player.current_bullet_power
 
-        if friendly:
-            self.bullet_friendly_sfx.play()
+        if archetype.friendly:
+            self.play_sound_effect(self.bullet_friendly_sfx)
         else:
-            self.bullet_enemy_sfx.play()
+            self.play_sound_effect(self.bullet_enemy_sfx)
 
-        self.bullet_list.append(bullet)
+        self.projectiles.spawn(archetype, x, y, change_x, change_y, angle, strength)
 
     # Contains all logic for spawning entities based on stage, time passed, etc.
     def spawn_entities(self):
@@ -841,57 +1964,27 @@ class SpaceGameView(arcade.View):
             self.enemy_spawn_timer -= 1
             if self.enemy_spawn_timer < 0 and \
                 self.enemies_spawned < KILL_COUNT_THRESHOLDS[self.stage - 1]:
-                    enemy_type = random.choice(list(ENEMIES_ON_STAGE[self.stage - 1]))
+                    enemy_type = self.rng.choice(list(ENEMIES_ON_STAGE[self.stage - 1]))
                     self.spawn_enemy(enemy_type)
                     new_timer = ENEMY_SPAWN_TIMERS[self.stage - 1]
-                    self.enemy_spawn_timer = random.uniform(new_timer * 0.9, new_timer * 1.1)
+                    self.enemy_spawn_timer = self.rng.uniform(new_timer * 0.9, new_timer * 1.1)
                     self.enemies_spawned += 1
 
             # Spawn obstacles
             self.obstacle_spawn_timer -= 1
             if self.obstacle_spawn_timer < 0:
-                obstacle_type = random.choice(list(OBSTACLES_ON_STAGE[self.stage - 1]))
+                obstacle_type = self.rng.choice(list(OBSTACLES_ON_STAGE[self.stage - 1]))
                 self.spawn_obstacle(obstacle_type)
                 new_timer = OBSTACLE_SPAWN_TIMERS[self.stage - 1]
-                self.obstacle_spawn_timer = random.uniform(new_timer * 0.9, new_timer * 1.1)
+                self.obstacle_spawn_timer = self.rng.uniform(new_timer * 0.9, new_timer * 1.1)
 
             # Spawn collectables
             self.collectable_spawn_timer -= 1
             if self.collectable_spawn_timer < 0:
-                collectable_type = random.choice(list(COLLECTABLES_ON_STAGE[self.stage - 1]))
+                collectable_type = self.rng.choice(list(COLLECTABLES_ON_STAGE[self.stage - 1]))
                 self.spawn_collectable(collectable_type)
                 new_timer = COLLECTABLE_SPAWN_TIMERS[self.stage - 1]
-                self.collectable_spawn_timer = random.uniform(new_timer * 0.9, new_timer * 1.1)
-                
-
-    # Spawns a new background star. If part of the initial batch of stars
-    # spawned at beginning of game, it will be place on the screen randomly.
-    # Otherwise, it will be placed at the top of the screen.
-    def spawn_star(self, initial = False):
-        star_size = random.randint(STAR_SIZE_MIN, STAR_SIZE_MAX)
-
-        color_random = random.uniform(0, 100)
-        if color_random < 70:
-            star_color = arcade.color.WHITE
-        elif color_random < 80:
-            star_color = arcade.color.WHITE_SMOKE
-        elif color_random < 90:
-            star_color = arcade.color.LIGHT_BLUE
-        elif color_random < 95:
-            star_color = arcade.color.PASTEL_ORANGE
-        else:
-            star_color = arcade.color.RED_ORANGE
-
-        star = arcade.SpriteCircle(star_size, star_color, True)
-
-        if initial:
-            star.center_y = random.uniform(0, SCREEN_HEIGHT)
-        else:
-            star.center_y = SCREEN_HEIGHT + 5
-
-        star.center_x = random.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT)
-        star.change_y = random.uniform(STAR_SPEED_MAX, STAR_SPEED_MIN)
-        self.star_list.append(star)
+                self.collectable_spawn_timer = self.rng.uniform(new_timer * 0.9, new_timer * 1.1)
 
     # Applies collectable effects to given player
     def collect_collectable(self, player, type):
@@ -945,38 +2038,1360 @@ class SpaceGameView(arcade.View):
                 player.current_bullet_speed = BULLET_SPEED_MIN
         elif type == "destroy_all_enemies":
             for enemy in self.enemy_list:
-                self.score += enemy.score
-                self.kills += 1
-                self.spawn_explosion(enemy.center_x, enemy.center_y)
-            self.enemy_list.clear()
+                if not enemy.in_pool:
+                    self.score += enemy.score
+                    self.kills += 1
+                    self.spawn_explosion(enemy.center_x, enemy.center_y)
+                    self.release_enemy(enemy)
             for obstacle in self.obstacle_list:
-                self.spawn_explosion(obstacle.center_x, obstacle.center_y)
-            self.obstacle_list.clear()
+                if not obstacle.in_pool:
+                    self.spawn_explosion(obstacle.center_x, obstacle.center_y)
+                    self.obstacle_pool.release(obstacle)
             self.set_stage()
         elif type == "invincible":
             self.player.invincible_timer = INVINCIBLE_TIMER
 
-        self.powerup_sfx.play()
+        self.play_sound_effect(self.powerup_sfx)
 
+    # Each enemy batch decides which of its enemies shoot (see the
+    # EnemyBatch shoot methods), and a bullet is spawned for each of them
     def enemy_shooting(self):
-        for enemy in self.enemy_list:
-            # Do a special check for zigzaggers who only shoot when the player is below them
-            if enemy.type == "basic_zigzag" and enemy.shoot_cooldown < 0:
-                if abs(enemy.center_x - self.player.center_x) < enemy.tolerance:
-                    random_value = random.uniform(0, 100)
-                    if random_value < 1:
-                        enemy.shooting = True
-                        enemy.shoot_cooldown = SHOOT_COOLDOWN
-
-            # Do a special check for waiters who always shoot when waiting
-            elif enemy.type == "basic_wait" and enemy.change_y == 0 \
-                    and enemy.shoot_cooldown < 0:
-                self.spawn_bullet("enemy_tracker", enemy.center_x, enemy.center_y)
-                enemy.shoot_cooldown = SHOOT_COOLDOWN // 4
-
-            if enemy.shooting and not enemy.type == "basic_wait":
-                enemy.shooting = False
-                self.spawn_bullet("enemy_basic", enemy.center_x, enemy.center_y)
+        for batch in self.enemy_behaviors.batches.values():
+            slots = batch.shoot(self.player.center_x, self.np_rng)
+            for x, y in zip(batch.x[slots].tolist(), batch.y[slots].tolist()):
+                self.spawn_bullet(batch.bullet_type, x, y)
+
+    # Plays a sound effect. Sound effects are only loaded when the game is
+    # shown in a window, so this does nothing in a headless simulation.
+    def play_sound_effect(self, sound):
+        if sound is not None:
+            sound.play()
+
+    # Starts recording key events and state checksums to a new Replay
+    def start_recording(self):
+        self.replay = Replay(self.seed)
+
+    # Returns a CRC32 checksum of the game state, covering the counters, the
+    # player and every enemy, bullet, obstacle and collectable
+    def get_checksum(self):
+        player = self.player
+        state = [
+            struct.pack("<qiiiiddiii", self.score, self.kills, self.stage, self.enemies_spawned,
+                        player.health, player.center_x, player.center_y,
+                        len(self.enemy_list), self.projectiles.count, len(self.obstacle_list))
+        ]
+        for sprite_list in (self.enemy_list, self.obstacle_list, self.collectable_list):
+            for sprite in sprite_list:
+                state.append(struct.pack("<dd", sprite.center_x, sprite.center_y))
+        count = self.projectiles.count
+        state.append(self.projectiles.x[:count].tobytes())
+        state.append(self.projectiles.y[:count].tobytes())
+        return zlib.crc32(b"".join(state))
+
+    # Returns the whole game state as a compact binary snapshot (see
+    # SNAPSHOT_HEADER_FORMAT above). Restoring it with restore_snapshot puts
+    # the game back exactly as it was, so the ticks after a restore play
+    # out the same as the ticks after the snapshot did. Must be called
+    # between ticks.
+    def get_snapshot(self):
+        player = self.player
+        projectiles = self.projectiles
+        count = projectiles.count
+        enemies = [enemy for enemy in self.enemy_list if not enemy.in_pool]
+        obstacles = [obstacle for obstacle in self.obstacle_list if not obstacle.in_pool]
+        collectables = [collectable for collectable in self.collectable_list if not collectable.in_pool]
+        explosions = [explosion for explosion in self.explosion_list if not explosion.in_pool]
+        batches = list(self.enemy_behaviors.batches.values())
+        rng_version, mt_state, gauss_next = self.rng.getstate()
+        np_state = self.np_rng.bit_generator.state
+        pcg_state = np_state["state"]["state"]
+        pcg_inc = np_state["state"]["inc"]
+
+        # Damage sources are stored as the archetype they were recorded from,
+        # followed by the death cause
+        sources = []
+        for source, amount in list(self.damage_taken.items()) + [(self.death_cause, 0)]:
+            if source is None:
+                sources.append((None, 0))
+            else:
+                kind, _, type = source.partition(":")
+                sources.append((archetypes[kind][type], amount))
+
+        parts = [
+            struct.pack(SNAPSHOT_HEADER_FORMAT, SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.seed,
+                        len(self.stage_ticks), len(self.collected), len(self.damage_taken),
+                        len(enemies), len(batches), len(obstacles), len(collectables),
+                        len(explosions), count),
+            struct.pack(SNAPSHOT_GAME_FORMAT, self.score, self.kills, self.stage,
+                        self.enemies_spawned, self.between_stage_timer, self.tick_count,
+                        self.stage_start_tick, self.enemy_spawn_timer, self.obstacle_spawn_timer,
+                        self.collectable_spawn_timer, self.enemy_direction, self.game_over,
+                        self.paused),
+            struct.pack(SNAPSHOT_PLAYER_FORMAT, player.center_x, player.center_y,
+                        player.change_x, player.change_y, player.moving_left,
+                        player.moving_right, player.moving_up, player.moving_down,
+                        player.health, player.health_max, player.invincible_timer,
+                        player.current_speed, player.current_bullet_speed,
+                        player.current_bullet_power, player.shoot_cooldown_initial,
+                        player.shoot_cooldown),
+            struct.pack(SNAPSHOT_RNG_FORMAT, rng_version, gauss_next is not None, gauss_next or 0,
+                        pcg_state >> 64, pcg_state & 0xFFFFFFFFFFFFFFFF,
+                        pcg_inc >> 64, pcg_inc & 0xFFFFFFFFFFFFFFFF,
+                        np_state["has_uint32"], np_state["uinteger"]),
+            array("I", mt_state).tobytes(),
+            array("I", self.stage_ticks).tobytes(),
+        ]
+        for type, amount in self.collected.items():
+            parts.append(struct.pack(SNAPSHOT_COLLECTED_FORMAT,
+                                     archetypes["collectable"][type].type_id, amount))
+        for archetype, amount in sources:
+            if archetype is None:
+                parts.append(struct.pack(SNAPSHOT_SOURCE_FORMAT, SNAPSHOT_NO_SOURCE, 0, 0))
+            else:
+                parts.append(struct.pack(SNAPSHOT_SOURCE_FORMAT,
+                    ARCHETYPE_KINDS.index(archetype.kind), archetype.type_id, amount))
+
+        for enemy in enemies:
+            parts.append(struct.pack(SNAPSHOT_ENEMY_FORMAT, enemy.type_id,
+                                     enemy.center_x, enemy.center_y, enemy.health))
+        enemy_indices = { enemy: index for index, enemy in enumerate(enemies) }
+        for batch in batches:
+            parts.append(struct.pack(SNAPSHOT_BATCH_FORMAT, batch.archetype.type_id, batch.count))
+            parts.append(array("I", [enemy_indices[enemy] for enemy in batch.sprites]).tobytes())
+            for name in batch.FLOAT_FIELDS + batch.BOOL_FIELDS:
+                parts.append(getattr(batch, name)[:batch.count].tobytes())
+        for obstacle in obstacles:
+            parts.append(struct.pack(SNAPSHOT_OBSTACLE_FORMAT, obstacle.type_id,
+                obstacle.center_x, obstacle.center_y, obstacle.change_x, obstacle.change_y,
+                obstacle.angle, obstacle.change_angle, obstacle.health))
+        for collectable in collectables:
+            parts.append(struct.pack(SNAPSHOT_COLLECTABLE_FORMAT, collectable.type_id,
+                collectable.center_x, collectable.center_y, collectable.change_x,
+                collectable.change_y))
+        for explosion in explosions:
+            parts.append(struct.pack(SNAPSHOT_EXPLOSION_FORMAT,
+                explosion.frames is explosion_frame_cache[EXPLOSION_LARGE_FILENAME],
+                explosion.center_x, explosion.center_y, explosion.scale, explosion.timer,
+                explosion.cur_frame_idx, explosion.time_counter))
+        for name in ProjectileStore.FLOAT_FIELDS + ProjectileStore.BOOL_FIELDS + ("type_id",):
+            parts.append(getattr(projectiles, name)[:count].tobytes())
+        return b"".join(parts)
+
+    # Puts the game back into the state of a snapshot from get_snapshot,
+    # which may have been taken in another game or another run. Entities
+    # already in the game are reused where they can be, the rest are
+    # released, and entities from the pools make up the difference. A replay
+    # being recorded can't reproduce a restored game, so recording stops.
+    # Must be called between ticks. The whole snapshot is read before the
+    # game is changed, so one that's cut short or corrupted raises
+    # ValueError, IndexError or struct.error and leaves the game as it was.
+    def restore_snapshot(self, snapshot):
+        reader = SnapshotReader(snapshot)
+        (magic, version, seed, stage_tick_count, collected_count, damage_count, enemy_count,
+         batch_count, obstacle_count, collectable_count, explosion_count,
+         projectile_count) = reader.unpack(SNAPSHOT_HEADER_FORMAT)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Not a version {SNAPSHOT_VERSION} snapshot")
+        game_values = reader.unpack(SNAPSHOT_GAME_FORMAT)
+        player_values = reader.unpack(SNAPSHOT_PLAYER_FORMAT)
+        (rng_version, has_gauss_next, gauss_next, pcg_state_high, pcg_state_low, pcg_inc_high,
+         pcg_inc_low, has_uint32, uinteger) = reader.unpack(SNAPSHOT_RNG_FORMAT)
+        mt_state = tuple(reader.read_array(np.uint32, SNAPSHOT_MT_STATE_SIZE).tolist())
+        enemy_types = ARCHETYPE_TYPES["enemy"]
+
+        stage_ticks = reader.read_array(np.uint32, stage_tick_count).tolist()
+        collected = collections.Counter({ ARCHETYPE_TYPES["collectable"][type_id]: amount
+            for type_id, amount in reader.unpack_records(SNAPSHOT_COLLECTED_FORMAT, collected_count) })
+        sources = [None if kind_id == SNAPSHOT_NO_SOURCE else
+                   (f"{ARCHETYPE_KINDS[kind_id]}:{ARCHETYPE_TYPES[ARCHETYPE_KINDS[kind_id]][type_id]}",
+                    amount)
+                   for kind_id, type_id, amount in
+                   reader.unpack_records(SNAPSHOT_SOURCE_FORMAT, damage_count + 1)]
+        death_cause = sources.pop()
+
+        enemy_records = reader.unpack_records(SNAPSHOT_ENEMY_FORMAT, enemy_count)
+        batch_records = []
+        for _ in range(batch_count):
+            type_id, count = reader.unpack(SNAPSHOT_BATCH_FORMAT)
+            type = enemy_types[type_id]
+            batch_class = ENEMY_BEHAVIORS[archetypes["enemy"][type].behavior]
+            indices = reader.read_array(np.uint32, count).tolist()
+            if indices and max(indices) >= enemy_count:
+                raise ValueError("Snapshot has a batch slot with no enemy record")
+            values = [reader.read_array(np.float64, count) for _ in batch_class.FLOAT_FIELDS]
+            values += [reader.read_array(np.bool_, count) for _ in batch_class.BOOL_FIELDS]
+            batch_records.append((type, indices, values))
+        obstacle_records = reader.unpack_records(SNAPSHOT_OBSTACLE_FORMAT, obstacle_count)
+        collectable_records = reader.unpack_records(SNAPSHOT_COLLECTABLE_FORMAT, collectable_count)
+        explosion_records = reader.unpack_records(SNAPSHOT_EXPLOSION_FORMAT, explosion_count)
+        projectile_values = [reader.read_array(np.float64, projectile_count)
+                             for _ in ProjectileStore.FLOAT_FIELDS]
+        projectile_values += [reader.read_array(np.bool_, projectile_count)
+                              for _ in ProjectileStore.BOOL_FIELDS]
+        projectile_values.append(reader.read_array(np.int32, projectile_count))
+        if reader.offset != len(snapshot):
+            raise ValueError("Snapshot has data past its records")
+        obstacle_types = ARCHETYPE_TYPES["obstacle"]
+        collectable_types = ARCHETYPE_TYPES["collectable"]
+        enemy_record_types = [enemy_types[record[0]] for record in enemy_records]
+        obstacle_record_types = [obstacle_types[record[0]] for record in obstacle_records]
+        collectable_record_types = [collectable_types[record[0]] for record in collectable_records]
+
+        self.seed = seed
+        self.replay = None
+        (self.score, self.kills, self.stage, self.enemies_spawned, self.between_stage_timer,
+         self.tick_count, self.stage_start_tick, self.enemy_spawn_timer,
+         self.obstacle_spawn_timer, self.collectable_spawn_timer, self.enemy_direction,
+         self.game_over, self.paused) = game_values
+        player = self.player
+        (player.center_x, player.center_y, player.change_x, player.change_y,
+         player.moving_left, player.moving_right, player.moving_up, player.moving_down,
+         player.health, player.health_max, player.invincible_timer, player.current_speed,
+         player.current_bullet_speed, player.current_bullet_power,
+         player.shoot_cooldown_initial, player.shoot_cooldown) = player_values
+        self.stage_ticks = stage_ticks
+        self.collected = collected
+        self.damage_taken = collections.Counter(dict(sources))
+        self.death_cause = None if death_cause is None else death_cause[0]
+
+        # Entities already in the game are reused for the snapshot's entities
+        # of the same type, so they don't leave their lists only to be added
+        # back. The rest are released.
+        large_frames = explosion_frame_cache[EXPLOSION_LARGE_FILENAME]
+        enemies = match_sprites(self.enemy_list, enemy_record_types, self.release_enemy)
+        obstacles = match_sprites(self.obstacle_list, obstacle_record_types,
+                                  self.obstacle_pool.release)
+        collectables = match_sprites(self.collectable_list, collectable_record_types,
+                                     self.collectable_pool.release)
+        explosions = match_sprites(self.explosion_list,
+            [bool(record[0]) for record in explosion_records], self.explosion_pool.release,
+            lambda explosion: explosion.frames is large_frames)
+        self.compact_sprite_lists()
+
+        self.rng.setstate((rng_version, mt_state, gauss_next if has_gauss_next else None))
+        self.np_rng.bit_generator.state = {
+            "bit_generator": "PCG64",
+            "state": { "state": pcg_state_high << 64 | pcg_state_low,
+                       "inc": pcg_inc_high << 64 | pcg_inc_low },
+            "has_uint32": has_uint32,
+            "uinteger": uinteger,
+        }
+
+        for index, (type_id, center_x, center_y, health) in enumerate(enemy_records):
+            enemy = enemies[index]
+            if enemy is None:
+                enemy = self.enemy_pool.acquire(enemy_types[type_id])
+                enemy.strength = enemy.archetype.strength
+                enemy.score = enemy.archetype.score
+                self.enemy_list.append(enemy)
+                enemies[index] = enemy
+            enemy.position = (center_x, center_y)
+            enemy.health = health
+        self.enemy_list.set_order(enemies)
+
+        # Batches are kept in the order they were made in, since that's the
+        # order they use the NumPy generator in
+        old_batches = self.enemy_behaviors.batches
+        batches = {}
+        for type, indices, values in batch_records:
+            batch = old_batches.get(type)
+            if batch is None:
+                archetype = archetypes["enemy"][type]
+                batch = ENEMY_BEHAVIORS[archetype.behavior](archetype)
+            count = len(indices)
+            if batch.capacity < count:
+                batch.grow(count)
+            batch.sprites = [enemies[index] for index in indices]
+            batch.count = count
+            for slot, enemy in enumerate(batch.sprites):
+                enemy.batch = batch
+                enemy.slot = slot
+            for name, field_values in zip(batch.FLOAT_FIELDS + batch.BOOL_FIELDS, values):
+                getattr(batch, name)[:count] = field_values
+            batches[type] = batch
+        self.enemy_behaviors.batches = batches
+
+        for index, (type_id, center_x, center_y, change_x, change_y, angle, change_angle,
+                    health) in enumerate(obstacle_records):
+            obstacle = obstacles[index]
+            if obstacle is None:
+                type = obstacle_types[type_id]
+                obstacle = self.obstacle_pool.acquire(type)
+                obstacle.type = type
+                obstacle.type_id = type_id
+                obstacle.strength = archetypes["obstacle"][type].strength
+                self.obstacle_list.append(obstacle)
+                obstacles[index] = obstacle
+            obstacle.position = (center_x, center_y)
+            obstacle.change_x = change_x
+            obstacle.change_y = change_y
+            obstacle.angle = angle
+            obstacle.change_angle = change_angle
+            obstacle.health = health
+        self.obstacle_list.set_order(obstacles)
+
+        for index, (type_id, center_x, center_y, change_x, change_y) in enumerate(collectable_records):
+            collectable = collectables[index]
+            if collectable is None:
+                type = collectable_types[type_id]
+                collectable = self.collectable_pool.acquire(type)
+                collectable.type = type
+                collectable.type_id = type_id
+                collectable.score = archetypes["collectable"][type].score
+                self.collectable_list.append(collectable)
+                collectables[index] = collectable
+            collectable.position = (center_x, center_y)
+            collectable.change_x = change_x
+            collectable.change_y = change_y
+        self.collectable_list.set_order(collectables)
+
+        # The pool's active explosions are in the order they were acquired,
+        # which is the order they're recycled in when the pool runs out
+        self.explosion_pool.grow(explosion_count)
+        for index, (large, center_x, center_y, scale, timer, frame, time_counter) in enumerate(
+                explosion_records):
+            explosion = explosions[index]
+            if explosion is None:
+                explosion = self.explosion_pool.acquire(
+                    EXPLOSION_LARGE_FILENAME if large else EXPLOSION_SMALL_FILENAME,
+                    scale, timer, center_x, center_y)
+                self.explosion_list.append(explosion)
+                explosions[index] = explosion
+            else:
+                explosion.position = (center_x, center_y)
+                explosion.scale = scale
+                explosion.timer = timer
+            explosion.cur_frame_idx = frame
+            explosion.time_counter = time_counter
+            explosion.texture = explosion.frames[frame].texture
+        self.explosion_list.set_order(explosions)
+        self.explosion_pool.active = list(explosions)
+
+        # Bullets are stored one field after another, so each field is one
+        # slice copy
+        projectiles = self.projectiles
+        if projectiles.capacity < projectile_count:
+            projectiles.grow(projectile_count)
+        projectiles.count = projectile_count
+        for name, values in zip(ProjectileStore.FLOAT_FIELDS + ProjectileStore.BOOL_FIELDS +
+                                ("type_id",), projectile_values):
+            getattr(projectiles, name)[:projectile_count] = values
+
+    # Returns the stats about the run recorded by TelemetryStore. The last
+    # stage's ticks are included even though it wasn't cleared.
+    def get_run_stats(self):
+        return {
+            "seed": self.seed,
+            "score": self.score,
+            "kills": self.kills,
+            "stage": self.stage,
+            "enemies_spawned": self.enemies_spawned,
+            "ticks": self.tick_count,
+            "death_cause": self.death_cause,
+            "collected": dict(self.collected),
+            "damage_taken": dict(self.damage_taken),
+            "stage_ticks": self.stage_ticks + [self.tick_count - self.stage_start_tick]
+        }
+
+    # Runs the game for up to the given number of ticks as fast as possible,
+    # stopping early if the game ends. Returns the number of ticks run.
+    def run(self, ticks):
+        start_tick = self.tick_count
+        for _ in range(ticks):
+            self.tick()
+            if self.game_over:
+                break
+        return self.tick_count - start_tick
+
+# Shaders used to draw the starfield. Each star is a single point, sized and
+# colored per star, that fades out towards its edge like a soft circle.
+STAR_VERTEX_SHADER = """
+#version 330
+
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+uniform float point_scale;
+
+in vec2 in_position;
+in float in_size;
+in vec4 in_color;
+out vec4 v_color;
+
+void main() {
+    gl_Position = proj.matrix * vec4(in_position, 0.0, 1.0);
+    gl_PointSize = in_size * 2.0 * point_scale;
+    v_color = in_color;
+}
+"""
+STAR_FRAGMENT_SHADER = """
+#version 330
+
+in vec4 v_color;
+out vec4 out_color;
+
+void main() {
+    float distance = length(gl_PointCoord - vec2(0.5)) * 2.0;
+    if (distance > 1.0) {
+        discard;
+    }
+    out_color = vec4(v_color.rgb, v_color.a * (1.0 - distance));
+}
+"""
+
+# The scrolling background stars. Star positions, sizes, colors and speeds
+# are kept in NumPy arrays and moved all at once, and stars that scroll off
+# the bottom of the screen wrap back around to the top. All the stars are
+# drawn with a single draw call from one point buffer.
+class Starfield:
+    def __init__(self, ctx, count = NUM_STARS):
+        self.ctx = ctx
+        self.count = count
+        self.rng = np.random.default_rng()
+
+        # Initial stars are placed randomly on the screen
+        self.positions = np.empty((count, 2), dtype = np.float32)
+        self.positions[:, 0] = self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT, count)
+        self.positions[:, 1] = self.rng.uniform(0, SCREEN_HEIGHT, count)
+        self.speeds = self.rng.uniform(STAR_SPEED_MAX, STAR_SPEED_MIN, count).astype(np.float32)
+        sizes = self.rng.integers(STAR_SIZE_MIN, STAR_SIZE_MAX, count, endpoint = True)
+        color_chances = np.array(STAR_COLOR_CHANCES) / sum(STAR_COLOR_CHANCES)
+        color_indices = self.rng.choice(len(STAR_COLORS), count, p = color_chances)
+        colors = np.array([color[:3] + (255,) for color in STAR_COLORS], dtype = np.uint8)
+
+        # Sizes and colors never change, so they are only uploaded once
+        self.position_buffer = ctx.buffer(data = self.positions, usage = "stream")
+        size_buffer = ctx.buffer(data = sizes.astype(np.float32))
+        color_buffer = ctx.buffer(data = colors[color_indices])
+        self.geometry = ctx.geometry([
+            arcade.gl.BufferDescription(self.position_buffer, "2f", ["in_position"]),
+            arcade.gl.BufferDescription(size_buffer, "f", ["in_size"]),
+            arcade.gl.BufferDescription(color_buffer, "4f1", ["in_color"],
+                                        normalized = ["in_color"]),
+        ])
+        self.program = ctx.program(vertex_shader = STAR_VERTEX_SHADER,
+                                   fragment_shader = STAR_FRAGMENT_SHADER)
+
+    # Moves every star down by its speed, wrapping the ones that have moved
+    # off screen back to the top at a new random horizontal position
+    def update(self):
+        self.positions[:, 1] += self.speeds
+        wrapped = self.positions[:, 1] < -5
+        wrapped_count = np.count_nonzero(wrapped)
+        if wrapped_count:
+            self.positions[wrapped, 1] = SCREEN_HEIGHT + 5
+            self.positions[wrapped, 0] = self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT,
+                                                          wrapped_count)
+
+    def draw(self):
+        self.position_buffer.write(self.positions)
+        # Point sizes are in window pixels, so scale them to match the way
+        # the internal canvas is scaled to the window
+        self.program["point_scale"] = self.ctx.viewport[2] / SCREEN_WIDTH
+        with self.ctx.enabled(self.ctx.PROGRAM_POINT_SIZE):
+            self.geometry.render(self.program, mode = self.ctx.POINTS, vertices = self.count)
+
+# Shaders used to draw bullets. A single quad is drawn once per bullet with
+# instancing, moved and rotated by that bullet's position and angle.
+PROJECTILE_VERTEX_SHADER = """
+#version 330
+
+uniform Projection {
+    uniform mat4 matrix;
+} proj;
+
+// Half the width and height of the bullet image, after scaling
+uniform vec2 half_size;
+// Where the bullet image is in the texture atlas: offset, then size
+uniform vec4 atlas_region;
+
+in vec2 in_vert;
+in vec2 in_position;
+in float in_angle;
+out vec2 v_uv;
+
+void main() {
+    float angle = radians(in_angle);
+    mat2 rotate = mat2(cos(angle), sin(angle), -sin(angle), cos(angle));
+    vec2 position = in_position + rotate * (in_vert * half_size);
+    gl_Position = proj.matrix * vec4(position, 0.0, 1.0);
+    // Same texture coordinates as arcade's sprite shader uses for the atlas
+    v_uv = (atlas_region.xy + (in_vert * 0.5 + 0.5) * atlas_region.zw) * vec2(1.0, -1.0);
+}
+"""
+PROJECTILE_FRAGMENT_SHADER = """
+#version 330
+
+uniform sampler2D atlas_texture;
+
+in vec2 v_uv;
+out vec4 out_color;
+
+void main() {
+    out_color = texture(atlas_texture, v_uv);
+    if (out_color.a == 0.0) {
+        discard;
+    }
+}
+"""
+
+# Draws every bullet in a ProjectileStore with one instanced draw call,
+# reading positions and angles straight from the store's arrays. Every
+# bullet type shares the same image (see BULLET_STATS), which is read from
+# the texture atlas the sprite lists use, so drawing bullets doesn't bind
+# another texture.
+class ProjectileRenderer:
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.atlas = ctx.default_atlas
+        compile_archetypes()
+        archetype = next(iter(archetypes["bullet"].values()))
+        self.texture = archetype.texture
+        self.atlas.add(self.texture)
+        image = self.texture.image
+        self.half_size = (image.width * archetype.scale / 2, image.height * archetype.scale / 2)
+
+        # x, y and angle of each bullet, grown along with the store
+        self.capacity = PROJECTILE_CAPACITY
+        self.instances = np.zeros((self.capacity, 3), dtype = np.float32)
+        self.instance_buffer = ctx.buffer(reserve = self.instances.nbytes, usage = "stream")
+        quad = np.array([-1, -1, 1, -1, -1, 1, 1, 1], dtype = np.float32)
+        self.geometry = ctx.geometry([
+            arcade.gl.BufferDescription(ctx.buffer(data = quad), "2f", ["in_vert"]),
+            arcade.gl.BufferDescription(self.instance_buffer, "2f 1f",
+                                        ["in_position", "in_angle"], instanced = True),
+        ], mode = ctx.TRIANGLE_STRIP)
+        self.program = ctx.program(vertex_shader = PROJECTILE_VERTEX_SHADER,
+                                   fragment_shader = PROJECTILE_FRAGMENT_SHADER)
+        self.program["half_size"] = self.half_size
+        self.program["atlas_texture"] = 0
+
+    # alpha is how far the frame is between the previous tick and the
+    # latest one. Bullets move in straight lines, so they're drawn that far
+    # along from where their velocity says they were on the previous tick.
+    def draw(self, projectiles, alpha):
+        count = projectiles.count
+        if count == 0:
+            return
+        if count > self.capacity:
+            while count > self.capacity:
+                self.capacity *= 2
+            self.instances = np.zeros((self.capacity, 3), dtype = np.float32)
+            self.instance_buffer.orphan(self.instances.nbytes)
+
+        behind = alpha - 1
+        instances = self.instances[:count]
+        instances[:, 0] = projectiles.x[:count] + projectiles.change_x[:count] * behind
+        instances[:, 1] = projectiles.y[:count] + projectiles.change_y[:count] * behind
+        instances[:, 2] = projectiles.angle[:count]
+        self.instance_buffer.write(instances)
+        # The image moves whenever the atlas grows, so look it up each time
+        self.program["atlas_region"] = self.atlas.get_region_info(self.texture.name).texture_coordinates
+        self.atlas.texture.use(0)
+        with self.ctx.enabled(self.ctx.BLEND):
+            self.geometry.render(self.program, instances = count)
+
+# Counts the draw calls made while drawing a frame, and how many times the
+# texture being drawn from changes. Each layer records the texture it
+# draws from after drawing, or None if it doesn't use one. The text layer
+# is counted as a single call, although pyglet may split it by font.
+class RenderStats:
+    def __init__(self):
+        self.draw_calls = 0
+        self.texture_binds = 0
+        self.bound_texture = None
+
+    def restart(self):
+        self.draw_calls = 0
+        self.texture_binds = 0
+        self.bound_texture = None
+
+    def record(self, texture = None):
+        self.draw_calls += 1
+        if texture is not None and texture != self.bound_texture:
+            self.texture_binds += 1
+            self.bound_texture = texture
+
+# A set of named text labels that are drawn together with a single batched
+# draw call. Each label is laid out when it is created, and only laid out
+# again when its text actually changes, unlike arcade.draw_text and new
+# arcade.Text objects, which lay the text out on every frame.
+class TextLayer:
+    def __init__(self):
+        self.batch = pyglet.graphics.Batch()
+        self.labels = {}
+        # Number of labels currently shown for each group set with set_group
+        self.group_sizes = {}
+
+    # Creates a label with the given name. Takes the same options as
+    # arcade.draw_text.
+    def add(self, name, text, x, y, color = arcade.color.WHITE, font_size = 12, width = 0,
+            align = "left", font_name = ("calibri", "arial"), visible = True):
+        label = pyglet.text.Label(
+            text = str(text),
+            x = x,
+            y = y,
+            font_name = font_name,
+            font_size = font_size,
+            color = arcade.get_four_byte_color(color),
+            width = width,
+            align = align,
+            multiline = align != "left",
+            batch = self.batch
+        )
+        label.visible = visible
+        self.labels[name] = label
+        return label
+
+    def get(self, name):
+        return self.labels[name]
+
+    # Changes the text of a label. The label is only laid out again if the
+    # text is different from what it already shows.
+    def set_text(self, name, text):
+        label = self.labels[name]
+        text = str(text)
+        if label.text != text:
+            label.text = text
+
+    def set_position(self, name, x, y):
+        label = self.labels[name]
+        if label.x != x or label.y != y:
+            label.position = x, y
+
+    def set_color(self, name, color):
+        label = self.labels[name]
+        color = arcade.get_four_byte_color(color)
+        if label.color != color:
+            label.color = color
+
+    def set_visible(self, name, visible):
+        label = self.labels[name]
+        if label.visible != visible:
+            label.visible = visible
+
+    # Shows one label for each (text, x, y) entry in the given list, such as
+    # a label next to every enemy. Labels are named after the group and are
+    # reused between frames, and any left over from earlier frames are
+    # hidden. Style options are the same as for add.
+    def set_group(self, group, entries, **style):
+        for index, (text, x, y) in enumerate(entries):
+            name = f"{group}_{index}"
+            if name not in self.labels:
+                self.add(name, text, x, y, **style)
+            else:
+                self.set_text(name, text)
+                self.set_position(name, x, y)
+                self.set_visible(name, True)
+        for index in range(len(entries), self.group_sizes.get(group, 0)):
+            self.set_visible(f"{group}_{index}", False)
+        self.group_sizes[group] = len(entries)
+
+    # Hides every label in a group set with set_group
+    def hide_group(self, group):
+        self.set_group(group, [])
+
+    def draw(self):
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
+
+# Sound effects played by SpaceGameView, by the name of the attribute they
+# are loaded into
+SOUND_EFFECT_FILENAMES = {
+    "bullet_friendly_sfx": ":resources:sounds/laser1.wav",
+    "bullet_enemy_sfx": ":resources:sounds/laser2.wav",
+    "explosion_big_sfx": ":resources:sounds/explosion1.wav",
+    "explosion_small_sfx": ":resources:sounds/hit4.wav",
+    "powerup_sfx": ":resources:sounds/upgrade1.wav"
+}
+GAME_MUSIC_FILENAME = "./res/music/game.wav"
+
+# Number of sound effects that can play at once
+MIXER_VOICES = 12
+# Number of voices each sound effect can use at once, by attribute name
+SOUND_EFFECT_VOICE_LIMITS = {
+    "bullet_friendly_sfx": 3,
+    "bullet_enemy_sfx": 3,
+    "explosion_big_sfx": 4,
+    "explosion_small_sfx": 3,
+    "powerup_sfx": 1
+}
+# Seconds within which playing the same sound again is merged into the
+# first play, such as for every explosion from destroy_all_enemies
+SOUND_MERGE_WINDOW = 0.03
+
+# Everything SpaceGameView uses that isn't listed in ARCHETYPE_STATS. The
+# entity textures listed there are preloaded too. Music is streamed from
+# disk as it plays, so there is nothing to preload for it.
+ASSET_MANIFEST = {
+    "textures": ["./res/img/Player Ship.png", "./res/img/hud_frame.png",
+                 "./res/img/bg_moon.png"],
+    "explosions": [EXPLOSION_LARGE_FILENAME, EXPLOSION_SMALL_FILENAME],
+    "sounds": list(SOUND_EFFECT_FILENAMES.values())
+}
+
+# Seconds of each frame the title screen spends preloading assets
+PRELOAD_FRAME_BUDGET = 1 / 120
+
+# Sounds are loaded on this worker thread, so decoding them never holds up
+# a frame
+audio_executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1,
+                                                       thread_name_prefix = "audio")
+# Futures for the sound effects loaded or being loaded, by filename
+sound_futures = {}
+
+# Loads a texture into arcade's texture cache, where later sprites using
+# the same file will find it, and adds it to the GPU texture atlas that
+# sprite lists draw from so it doesn't have to be uploaded mid-game
+def preload_texture(ctx, filename, flipped_vertically = False):
+    texture = arcade.load_texture(filename, flipped_vertically = flipped_vertically)
+    if ctx is not None:
+        ctx.default_atlas.add(texture)
+
+def preload_explosion(ctx, filename):
+    for frame in get_explosion_frames(filename):
+        if ctx is not None:
+            ctx.default_atlas.add(frame.texture)
+
+# Starts loading a sound on the audio thread and returns a Future for the
+# arcade.Sound. Sound effects are only loaded once, and the same future is
+# returned for them every time. Streamed sounds (music) can only be played
+# once, so each call loads a new one.
+def load_sound_async(filename, streaming = False):
+    if streaming:
+        return audio_executor.submit(arcade.load_sound, filename, True)
+    if filename not in sound_futures:
+        sound_futures[filename] = audio_executor.submit(arcade.load_sound, filename)
+    return sound_futures[filename]
+
+# Plays sound effects on a fixed pool of pyglet players (voices), rather
+# than the new player Sound.play creates every time, so heavy combat can't
+# pile up players. Each sound added with a limit can only use that many
+# voices at once. Playing a sound that is at its limit restarts its oldest
+# voice, and when every voice is busy the oldest one is taken over. A
+# sound played again within SOUND_MERGE_WINDOW seconds is skipped.
+class SoundMixer:
+    def __init__(self, voice_count = MIXER_VOICES):
+        self.voices = [pyglet.media.Player() for _ in range(voice_count)]
+        # The sound each voice was last given, and when it started it
+        self.voice_sounds = [None] * voice_count
+        self.voice_start_times = [0.0] * voice_count
+        self.limits = {}
+        self.lengths = {}
+        self.last_played = {}
+        self.merged = 0
+        self.stolen = 0
+
+    def add(self, sound, limit):
+        self.limits[sound] = limit
+        self.lengths[sound] = sound.get_length()
+
+    def is_playing(self, voice, now):
+        sound = self.voice_sounds[voice]
+        return sound is not None and now - self.voice_start_times[voice] < self.lengths[sound]
+
+    def play(self, sound):
+        now = time.perf_counter()
+        if now - self.last_played.get(sound, -math.inf) < SOUND_MERGE_WINDOW:
+            self.merged += 1
+            return
+        self.last_played[sound] = now
+
+        voices = range(len(self.voices))
+        playing = [voice for voice in voices if self.is_playing(voice, now)]
+        same_sound = [voice for voice in playing if self.voice_sounds[voice] is sound]
+        if len(same_sound) >= self.limits.get(sound, len(self.voices)):
+            voice = min(same_sound, key = self.voice_start_times.__getitem__)
+            self.stolen += 1
+        elif len(playing) == len(self.voices):
+            voice = min(playing, key = self.voice_start_times.__getitem__)
+            self.stolen += 1
+        else:
+            # Prefer a voice that last played this sound, which only has
+            # to be rewound
+            free = [voice for voice in voices if voice not in playing]
+            voice = next((voice for voice in free if self.voice_sounds[voice] is sound), free[0])
+
+        player = self.voices[voice]
+        if self.voice_sounds[voice] is sound and player.source is not None:
+            player.seek(0)
+        else:
+            if player.source is not None:
+                player.next_source()
+            player.queue(sound.source)
+        player.play()
+        self.voice_sounds[voice] = sound
+        self.voice_start_times[voice] = now
+
+    # Summary of the mixer's usage for the debug display
+    def stats(self):
+        now = time.perf_counter()
+        playing = sum(self.is_playing(voice, now) for voice in range(len(self.voices)))
+        return (f"Sound voices: {playing}/{len(self.voices)} "
+                f"(merged {self.merged}, stolen {self.stolen})")
+
+    def close(self):
+        for player in self.voices:
+            player.pause()
+            player.delete()
+
+# Loads and decodes every asset in ASSET_MANIFEST and ARCHETYPE_STATS a
+# step at a time, so the title screen can keep drawing a progress bar
+# while it runs and the first spawn of each entity type doesn't stall a
+# frame mid-game. ctx is the window's context, or None without a window.
+class AssetPreloader:
+    def __init__(self, ctx):
+        self.steps = []
+        textures = {}
+        for kind, stats in ARCHETYPE_STATS.items():
+            for type_stats in stats.values():
+                flipped_vertically = type_stats.get("flipped_vertically", kind == "enemy")
+                textures[type_stats["filename"], flipped_vertically] = True
+        for filename, flipped_vertically in textures:
+            self.steps.append(functools.partial(preload_texture, ctx, filename, flipped_vertically))
+        self.steps.append(compile_archetypes)
+        for filename in ASSET_MANIFEST["textures"]:
+            self.steps.append(functools.partial(preload_texture, ctx, filename))
+        for filename in ASSET_MANIFEST["explosions"]:
+            self.steps.append(functools.partial(preload_explosion, ctx, filename))
+        for filename in ASSET_MANIFEST["sounds"]:
+            self.steps.append(functools.partial(load_sound_async, filename))
+        self.steps_done = 0
+        self.elapsed = 0.0
+
+    def is_done(self):
+        return self.steps_done == len(self.steps)
+
+    def get_progress(self):
+        return self.steps_done / len(self.steps)
+
+    # Runs steps until the given number of seconds have passed or every
+    # step is done. Records the startup time once the last step finishes.
+    def load(self, budget):
+        start_time = time.perf_counter()
+        while not self.is_done() and time.perf_counter() - start_time < budget:
+            self.steps[self.steps_done]()
+            self.steps_done += 1
+        self.elapsed += time.perf_counter() - start_time
+
+        global startup_time
+        global preload_time
+        if self.is_done() and startup_time is None:
+            startup_time = time.perf_counter() - PROCESS_START_TIME
+            preload_time = self.elapsed
+
+# Alpha of the shield drawn around the player while invincible
+PLAYER_SHIELD_ALPHA = 150
+
+# File the quicksave key saves a snapshot of the game to, and the quickload
+# key restores it from. Snapshots for rewinding are taken every
+# REWIND_INTERVAL ticks when rewind_mode is on, and the latest
+# REWIND_SNAPSHOTS are kept.
+QUICKSAVE_FILENAME = "quicksave.sgs"
+QUICKSAVE_KEY = arcade.key.F5
+QUICKLOAD_KEY = arcade.key.F9
+REWIND_KEY = arcade.key.BACKSPACE
+REWIND_INTERVAL = TICK_RATE
+REWIND_SNAPSHOTS = 10
+# Seconds a notice, such as a quickload failing, stays on screen
+NOTICE_DURATION = 3
+
+# Class for the main game loop, extends Arcade's View class. Runs the game
+# rules from SpaceGameSimulation and handles drawing, music and sound.
+# Everything but the starfield and text is drawn from the one texture atlas
+# the preload fills, so each layer is a single draw call. Enemies, obstacles
+# and collectables are drawn from their own lists, in that order, so a
+# collectable is never hidden under an enemy or obstacle.
+class SpaceGameView(SpaceGameSimulation, arcade.View):
+    def __init__(self):
+        arcade.View.__init__(self)
+        SpaceGameSimulation.__init__(self)
+        self.starfield = None
+        self.projectile_renderer = None
+        self.player_shield = None
+        self.render_stats = RenderStats()
+
+        # Stuff for hud
+        self.hud_frame = None
+        self.bg_moon = None
+
+        # The moon behind everything, and the shield and hud frame in front
+        # of everything
+        self.background_layer = None
+        self.overlay_layer = None
+
+        # Music stuff
+        self.music = None
+        self.music_player = None
+        self.mixer = None
+        # Futures for the music and the sound effects that haven't finished
+        # loading yet. Sound effects stay None until they have.
+        self.music_future = None
+        self.sound_effect_futures = {}
+
+        # Text for the hud and debug info, and for the pause overlay, which
+        # is drawn on top of everything else
+        self.text_layer = None
+        self.pause_text_layer = None
+        # Seconds the notice shown with show_notice has left on screen
+        self.notice_time = 0.0
+
+        # Time that hasn't been simulated yet, and the ticks run since the
+        # last frame was drawn
+        self.tick_accumulator = 0.0
+        self.frame_ticks = 0
+        # Positions of the moving sprites before the latest tick, which are
+        # interpolated towards their current positions when drawing
+        self.previous_positions = {}
+        # Sprites moved by interpolate_positions, and where they really are
+        self.interpolated_positions = []
+        # Recent snapshots of the game, oldest first, for rewinding, and
+        # whether they're being taken (see rewind_mode)
+        self.rewind_snapshots = collections.deque(maxlen = REWIND_SNAPSHOTS)
+        self.rewind_enabled = rewind_mode
+
+    def setup(self):
+        SpaceGameSimulation.setup(self)
+        if replay_filename is not None:
+            self.start_recording()
+        global debug_mode
+        if debug_mode:
+            self.profiler = FrameProfiler(profile_filename)
+        self.starfield = Starfield(self.window.ctx)
+        self.projectile_renderer = ProjectileRenderer(self.window.ctx)
+        self.player_shield = arcade.SpriteCircle(100, arcade.color.BABY_BLUE, True)
+        self.player_shield.alpha = 0
+        self.hud_frame = arcade.Sprite("./res/img/hud_frame.png", 
+            center_x = SCREEN_WIDTH // 2, center_y = SCREEN_HEIGHT // 2)
+        self.bg_moon = arcade.Sprite("./res/img/bg_moon.png", 
+            center_x = SCREEN_WIDTH // 2, center_y = -100)
+        self.background_layer = arcade.SpriteList()
+        self.background_layer.append(self.bg_moon)
+        self.overlay_layer = arcade.SpriteList()
+        self.overlay_layer.append(self.player_shield)
+        self.overlay_layer.append(self.hud_frame)
+
+        self.mixer = SoundMixer()
+        self.music_future = load_sound_async(GAME_MUSIC_FILENAME, True)
+        self.sound_effect_futures = { name: load_sound_async(filename)
+                                      for name, filename in SOUND_EFFECT_FILENAMES.items() }
+        self.receive_sounds()
+
+        self.text_layer = TextLayer()
+        self.text_layer.add("score", "", 20, 190, arcade.color.WHITE, 30,
+                            font_name = "Kenney Mini Square")
+        self.text_layer.add("stage", "", 20, 110, arcade.color.WHITE, 30,
+                            font_name = "Kenney Mini Square")
+        self.text_layer.add("hp", "", 20, 30, arcade.color.WHITE, 30,
+                            font_name = "Kenney Mini Square")
+        self.text_layer.add("notice", "", 0, SCREEN_HEIGHT - 60, font_size = 16,
+                            width = SCREEN_WIDTH, align = "center", visible = False)
+        self.pause_text_layer = TextLayer()
+        self.pause_text_layer.add("paused", "PAUSED", 0, SCREEN_HEIGHT / 2, font_size = 30,
+            width = SCREEN_WIDTH, align = "center", font_name = "Kenney Pixel Square")
+
+    # Returns the lines of debug info shown in debug mode, from bottom to top
+    def get_debug_lines(self):
+        return [
+            f"Health: {self.player.health}/{self.player.health_max}",
+            f"Shoot cooldown: {self.player.shoot_cooldown}",
+            f"Bullet power: {self.player.current_bullet_power}",
+            f"Bullet speed: {self.player.current_bullet_speed}",
+            f"Speed: {self.player.current_speed}",
+            f"Invincible timer: {self.player.invincible_timer}",
+            f"Between stage timer: {self.between_stage_timer}",
+            f"enemy spawn timer: {self.enemy_spawn_timer}",
+            f"enemy spawn count: {self.enemies_spawned}",
+            f"Explosion pool: {len(self.explosion_pool.active)}/{self.explosion_pool.size}",
+            f"Explosion cache hit rate: {get_explosion_cache_hit_rate():.1f}%",
+            f"Projectiles: {self.projectiles.count}/{self.projectiles.capacity}",
+            self.enemy_pool.stats(),
+            self.obstacle_pool.stats(),
+            self.collectable_pool.stats(),
+            self.mixer.stats(),
+            f"Rewind snapshots: {len(self.rewind_snapshots)}/{REWIND_SNAPSHOTS}",
+            f"Startup: {startup_time or 0:.2f}s (preload {preload_time or 0:.2f}s)",
+        ]
+
+    # Updates the text layer with the current hud and debug info
+    def update_text(self):
+        self.text_layer.set_text("score", f"Score: {self.score}")
+        self.text_layer.set_text("stage", f"Stage: {self.stage}")
+        self.text_layer.set_text("hp", f"HP: {self.player.health}")
+
+        global debug_mode
+        if debug_mode:
+            self.text_layer.set_group("debug",
+                [(line, 10, 20 + 30 * index) for index, line in enumerate(self.get_debug_lines())])
+            self.text_layer.set_group("enemy_health",
+                [(f"Health: {enemy.health}", enemy.center_x + 20, enemy.center_y)
+                 for enemy in self.enemy_list])
+            self.text_layer.set_group("obstacle_health",
+                [(f"Health: {obstacle.health}", obstacle.center_x + 20, obstacle.center_y)
+                 for obstacle in self.obstacle_list])
+            self.text_layer.set_group("collectable_type",
+                [(collectable.type, collectable.center_x + 10, collectable.center_y)
+                 for collectable in self.collectable_list])
+            self.text_layer.set_group("profiler",
+                [(line, PROFILER_GRAPH_LEFT, SCREEN_HEIGHT - 30 - 24 * index)
+                 for index, line in enumerate(self.profiler.get_lines())],
+                font_size = 10)
+
+    # Starts the music and hands sound effects to the mixer as they finish
+    # loading on the audio thread. Until then the game runs without them.
+    def receive_sounds(self):
+        if self.music_future is not None and self.music_future.done():
+            self.music = self.music_future.result()
+            self.music_future = None
+            self.music_player = arcade.play_sound(self.music, looping = True)
+        for name, future in list(self.sound_effect_futures.items()):
+            if future.done():
+                sound = future.result()
+                setattr(self, name, sound)
+                self.mixer.add(sound, SOUND_EFFECT_VOICE_LIMITS[name])
+                del self.sound_effect_futures[name]
+
+    # Sound effects are played through the mixer's voice pool
+    def play_sound_effect(self, sound):
+        if sound is not None:
+            self.mixer.play(sound)
+
+    def on_key_press(self, key, modifiers):
+        if key == QUICKSAVE_KEY:
+            self.quicksave()
+        elif key == QUICKLOAD_KEY:
+            self.quickload()
+        elif key == REWIND_KEY:
+            self.rewind()
+        else:
+            SpaceGameSimulation.on_key_press(self, key, modifiers)
+
+    def quicksave(self):
+        with open(QUICKSAVE_FILENAME, "wb") as quicksave_file:
+            quicksave_file.write(self.get_snapshot())
+
+    # Snapshots from before the quickload are of another run, so they're
+    # dropped rather than rewound into. A quicksave that can't be loaded
+    # leaves the game as it was.
+    def quickload(self):
+        if not os.path.exists(QUICKSAVE_FILENAME):
+            return
+        try:
+            with open(QUICKSAVE_FILENAME, "rb") as quicksave_file:
+                snapshot = quicksave_file.read()
+            self.restore_snapshot(snapshot)
+        except (OSError, ValueError, IndexError, struct.error) as error:
+            self.show_notice(f"Couldn't load {QUICKSAVE_FILENAME}: {error}")
+            return
+        self.rewind_snapshots.clear()
+
+    # Shows a line of text at the top of the screen for NOTICE_DURATION
+    def show_notice(self, text):
+        self.text_layer.set_text("notice", text)
+        self.text_layer.set_visible("notice", True)
+        self.notice_time = NOTICE_DURATION
+
+    # Goes back to the latest rewind snapshot. Each press goes back one
+    # more, until the oldest kept. Does nothing unless rewind_mode is on.
+    def rewind(self):
+        if self.rewind_snapshots:
+            self.restore_snapshot(self.rewind_snapshots.pop())
+
+    # The keys held down and whether the game is paused follow the keyboard,
+    # so they're kept as they are instead of restored
+    def restore_snapshot(self, snapshot):
+        player = self.player
+        moving = (player.moving_left, player.moving_right, player.moving_up, player.moving_down)
+        paused = self.paused
+        SpaceGameSimulation.restore_snapshot(self, snapshot)
+        player.moving_left, player.moving_right, player.moving_up, player.moving_down = moving
+        self.paused = paused
+        self.previous_positions.clear()
+
+    # Draws a sprite list as one layer, if there's anything in it
+    def draw_layer(self, sprite_list):
+        if sprite_list:
+            sprite_list.draw()
+            self.render_stats.record(sprite_list.atlas)
+
+    def get_moving_lists(self):
+        return [self.player_list, self.enemy_list,
+                self.obstacle_list, self.collectable_list]
+
+    def store_previous_positions(self):
+        self.previous_positions = { sprite: sprite.position
+                                    for sprite_list in self.get_moving_lists()
+                                    for sprite in sprite_list }
+
+    # Moves each sprite to alpha of the way from where it was before the
+    # latest tick to where it is now, so movement looks smooth when frames
+    # aren't drawn in step with ticks. Sprites spawned by the latest tick
+    # stay where they are.
+    def interpolate_positions(self, alpha):
+        self.interpolated_positions.clear()
+        for sprite_list in self.get_moving_lists():
+            for sprite in sprite_list:
+                previous = self.previous_positions.get(sprite)
+                if previous is None:
+                    continue
+                x, y = sprite.position
+                previous_x, previous_y = previous
+                if abs(x - previous_x) + abs(y - previous_y) > INTERPOLATION_MAX_DISTANCE:
+                    continue
+                self.interpolated_positions.append((sprite, x, y))
+                sprite.position = (previous_x + (x - previous_x) * alpha,
+                                   previous_y + (y - previous_y) * alpha)
+
+    # Puts the sprites moved by interpolate_positions back where they are
+    # in the simulation
+    def restore_positions(self):
+        for sprite, x, y in self.interpolated_positions:
+            sprite.position = (x, y)
+        self.interpolated_positions.clear()
+
+    # Drawing method that is called on every frame
+    def on_draw(self):
+        arcade.start_render()
+        render_start = time.perf_counter()
+        alpha = min(self.tick_accumulator / TICK_DURATION, 1)
+        self.interpolate_positions(alpha)
+
+        profiler = self.profiler
+        render_stats = self.render_stats
+        render_stats.restart()
+        profiler.restart()
+        self.starfield.draw()
+        render_stats.record()
+        profiler.lap("starfield.draw")
+        self.draw_layer(self.background_layer)
+        profiler.lap("background_layer.draw")
+        self.draw_layer(self.player_list)
+        profiler.lap("player_list.draw")
+        if self.projectiles.count:
+            self.projectile_renderer.draw(self.projectiles, alpha)
+            render_stats.record(self.projectile_renderer.atlas)
+        profiler.lap("projectiles.draw")
+        # Enemies, then obstacles, then collectables, so collectables are
+        # never hidden under the others
+        self.draw_layer(self.enemy_list)
+        profiler.lap("enemy_list.draw")
+        self.draw_layer(self.obstacle_list)
+        profiler.lap("obstacle_list.draw")
+        self.draw_layer(self.collectable_list)
+        profiler.lap("collectable_list.draw")
+        self.draw_layer(self.explosion_list)
+        profiler.lap("explosion_list.draw")
+
+        # Draw the shield, hud and debug info on top of everything else.
+        # The shield stays in the overlay and is hidden when not needed.
+        if self.player.invincible_timer > 0:
+            self.player_shield.center_x = self.player.center_x
+            self.player_shield.center_y = self.player.center_y
+            self.player_shield.alpha = PLAYER_SHIELD_ALPHA
+        else:
+            self.player_shield.alpha = 0
+        self.draw_layer(self.overlay_layer)
+        profiler.lap("overlay_layer.draw")
+        self.update_text()
+        profiler.restart()
+        self.text_layer.draw()
+        render_stats.record("text")
+        profiler.lap("text_layer.draw")
+        self.restore_positions()
+        profiler.record("render", time.perf_counter() - render_start)
+
+        global debug_mode
+        if debug_mode:
+            profiler.draw_graph()
+            profiler.end_frame(bullets = self.projectiles.count, enemies = len(self.enemy_list),
+                               obstacles = len(self.obstacle_list),
+                               collectables = len(self.collectable_list),
+                               explosions = len(self.explosion_list),
+                               ticks = self.frame_ticks,
+                               draw_calls = render_stats.draw_calls,
+                               texture_binds = render_stats.texture_binds)
+        self.frame_ticks = 0
+
+        # Draw the pause overlay
+        if self.paused:
+            # These draw functions accept colors in RGB or RGBA format. The built in colors,
+            # like arcade.color.BLACK, are RGB format. Adding (200,) adds an alpha value to
+            # make it RGBA, allowing for transparency.
+            arcade.draw_lrtb_rectangle_filled(0, SCREEN_WIDTH, SCREEN_HEIGHT, 0, arcade.color.BLACK + (200,))
+            self.pause_text_layer.draw()
+
+    def update(self, delta_time):
+        if self.player.health <= 0:
+            if self.replay is not None:
+                self.replay.save(replay_filename)
+            if self.profiler is not NULL_PROFILER:
+                self.profiler.close()
+            global telemetry
+            if telemetry is not None:
+                telemetry.record_run(self.get_run_stats())
+            if self.music_player is not None:
+                arcade.stop_sound(self.music_player)
+            self.mixer.close()
+            game_over = GameOverView()
+            game_over.setup(self.score)
+            self.window.show_view(game_over)
+            return
+
+        self.receive_sounds()
+        if self.notice_time > 0:
+            self.notice_time -= delta_time
+            if self.notice_time <= 0:
+                self.text_layer.set_visible("notice", False)
+        if self.paused:
+            return
+
+        # Run one tick for each TICK_DURATION of time that has passed,
+        # keeping any leftover time for the next update. The leftover is
+        # how far between ticks the next frame is drawn.
+        self.tick_accumulator += delta_time
+        ticks = min(int(self.tick_accumulator / TICK_DURATION), MAX_TICKS_PER_FRAME)
+        self.tick_accumulator -= ticks * TICK_DURATION
+        if ticks == MAX_TICKS_PER_FRAME:
+            # Too far behind to catch up, so drop the time that's left
+            self.tick_accumulator = min(self.tick_accumulator, TICK_DURATION)
+
+        simulation_start = time.perf_counter()
+        for tick in range(ticks):
+            if tick == ticks - 1:
+                self.store_previous_positions()
+            self.starfield.update()
+            tick_count = self.tick_count
+            self.tick()
+            if self.rewind_enabled and self.tick_count != tick_count and \
+                    self.tick_count % REWIND_INTERVAL == 0:
+                self.rewind_snapshots.append(self.get_snapshot())
+        self.profiler.record("simulation", time.perf_counter() - simulation_start)
+        self.frame_ticks += ticks
+
+# Entities kept alive in the first step of the stress test. Each step
+# multiplies every count by STRESS_GROWTH.
+STRESS_START_COUNTS = { "enemies": 10, "obstacles": 5, "bullets": 50, "explosions": 5 }
+STRESS_GROWTH = 1.5
+STRESS_MAX_STEPS = 16
+# Frames each step runs before it's measured, and frames it's measured for
+STRESS_SETTLE_FRAMES = 30
+STRESS_STEP_FRAMES = 120
+# Time one frame can take at 60 FPS, in milliseconds
+FRAME_BUDGET_MS = 1000 / 60
+STRESS_FILENAME_DEFAULT = "stress.csv"
+
+# Ramps up the number of enemies, obstacles, bullets and explosions in a
+# normal game, step by step, keeping each count topped up every tick. The
+# tick and draw times of each step are measured. The tick time leaves out
+# the topping up, and rewind snapshots aren't taken, so it only grows with
+# the entity counts. The test stops after the first step whose frames
+# don't fit in FRAME_BUDGET_MS, or after STRESS_MAX_STEPS. The scaling
+# curve is printed and written to a CSV file.
+class StressView(SpaceGameView):
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+        self.step = 0
+        self.step_frames = 0
+        self.results = []
+        self.reset_step_times()
+        self.rewind_enabled = False
+
+    def setup(self):
+        super().setup()
+        self.player.health_max = 10 ** 9
+        self.player.health = 10 ** 9
+
+    def reset_step_times(self):
+        self.tick_time = 0.0
+        self.ticks = 0
+        self.draw_time = 0.0
+        self.draw_frames = 0
+
+    def get_target_counts(self):
+        return { name: round(count * STRESS_GROWTH ** self.step)
+                 for name, count in STRESS_START_COUNTS.items() }
+
+    def get_counts(self):
+        return {
+            "enemies": sum(not enemy.in_pool for enemy in self.enemy_list),
+            "obstacles": sum(not obstacle.in_pool for obstacle in self.obstacle_list),
+            "bullets": self.projectiles.count,
+            "explosions": len(self.explosion_pool.active) - len(self.explosion_pool.released),
+        }
+
+    # Spawns whatever is needed to bring each count back up to the step's
+    # target before the tick runs, then times the tick
+    def tick(self):
+        targets = self.get_target_counts()
+        counts = self.get_counts()
+        stage = self.stage - 1
+        for _ in range(targets["enemies"] - counts["enemies"]):
+            self.spawn_enemy(self.rng.choice(ENEMIES_ON_STAGE[stage]))
+        for _ in range(targets["obstacles"] - counts["obstacles"]):
+            self.spawn_obstacle(self.rng.choice(OBSTACLES_ON_STAGE[stage]))
+        for _ in range(targets["bullets"] - counts["bullets"]):
+            self.spawn_bullet("enemy_basic", self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT),
+                              self.rng.uniform(GAME_AREA_BOTTOM, GAME_AREA_TOP))
+        self.explosion_pool.grow(targets["explosions"])
+        for _ in range(targets["explosions"] - counts["explosions"]):
+            self.spawn_explosion(self.rng.uniform(GAME_AREA_LEFT, GAME_AREA_RIGHT),
+                                 self.rng.uniform(GAME_AREA_BOTTOM, GAME_AREA_TOP))
+        ticks_before = self.tick_count
+        start_time = time.perf_counter()
+        super().tick()
+        if self.step_frames >= STRESS_SETTLE_FRAMES:
+            self.tick_time += time.perf_counter() - start_time
+            self.ticks += self.tick_count - ticks_before
+
+    # Waits for the GPU to finish each frame, so the draw time includes
+    # the time spent drawing as well as issuing the draw calls
+    def on_draw(self):
+        start_time = time.perf_counter()
+        super().on_draw()
+        self.window.ctx.finish()
+        if self.step_frames >= STRESS_SETTLE_FRAMES:
+            self.draw_time += time.perf_counter() - start_time
+            self.draw_frames += 1
+        self.step_frames += 1
+        if self.step_frames == STRESS_SETTLE_FRAMES + STRESS_STEP_FRAMES:
+            self.finish_step()
+
+    def finish_step(self):
+        tick_ms = self.tick_time * 1000 / max(self.ticks, 1)
+        draw_ms = self.draw_time * 1000 / max(self.draw_frames, 1)
+        result = dict(step = self.step, **self.get_counts(), tick_ms = tick_ms, draw_ms = draw_ms,
+                      frame_ms = tick_ms + draw_ms)
+        self.results.append(result)
+        print(f"Step {self.step}: {result['enemies']} enemies, {result['obstacles']} obstacles, "
+              f"{result['bullets']} bullets, {result['explosions']} explosions: "
+              f"tick {tick_ms:.2f} ms, draw {draw_ms:.2f} ms")
+
+        self.step += 1
+        self.step_frames = 0
+        self.reset_step_times()
+        if result["frame_ms"] > FRAME_BUDGET_MS or self.step == STRESS_MAX_STEPS:
+            self.finish()
+
+    def finish(self):
+        with open(self.filename, "w", newline = "") as file:
+            writer = csv.DictWriter(file, fieldnames = list(self.results[0]))
+            writer.writeheader()
+            writer.writerows(self.results)
+        over_budget = [result for result in self.results if result["frame_ms"] > FRAME_BUDGET_MS]
+        if over_budget:
+            result = over_budget[0]
+            print(f"Frame budget of {FRAME_BUDGET_MS:.1f} ms exceeded at {result['enemies']} enemies, "
+                  f"{result['obstacles']} obstacles, {result['bullets']} bullets and "
+                  f"{result['explosions']} explosions ({result['frame_ms']:.2f} ms)")
+        else:
+            print(f"Frame budget of {FRAME_BUDGET_MS:.1f} ms never exceeded")
+        print(f"Wrote the scaling curve to {self.filename}")
+        if self.music_player is not None:
+            arcade.stop_sound(self.music_player)
+        self.mixer.close()
+        arcade.exit()
 
 START_GAME = 0
 HIGH_SCORE = 1
@@ -990,60 +3405,71 @@ class TitleView(arcade.View):
         self.bg_moon = None
         self.music = None
         self.music_player = None
+        self.music_future = None
+        self.text_layer = None
+        self.preloader = None
 
-    # setup is currently redundant, left it here in case we want to
-    # do more with it in the future
     def setup(self):
         self.selected_action = START_GAME
+        # Assets only need preloading the first time the title screen is shown
+        if startup_time is None:
+            self.preloader = AssetPreloader(self.window.ctx)
         self.bg_moon = self.bg_moon = arcade.Sprite("./res/img/bg_moon.png", 
             center_x = SCREEN_WIDTH // 2, center_y = 0)
-        self.music = arcade.load_sound("./res/music/title.wav", True)
-        self.music_player = arcade.play_sound(self.music, looping = True)
-
-    def on_draw(self):
-        arcade.start_render()
-
-        self.bg_moon.draw()
+        self.music_player = None
+        self.music_future = load_sound_async("./res/music/title.wav", True)
 
-        arcade.draw_text("SDEV 265\nSPACE GAME", 0, SCREEN_HEIGHT * 0.7,
+        self.text_layer = TextLayer()
+        self.text_layer.add("title", "SDEV 265\nSPACE GAME", 0, SCREEN_HEIGHT * 0.7,
             font_size = 50, width = SCREEN_WIDTH, align = "center",
             font_name = "Kenney Blocks")
-        
+
         # Values to make changing text layout easier
         option_font_size = 25
         option_line_height = 35
         option_y_start = SCREEN_HEIGHT * 0.4
         options_font = "Kenney Mini Square"
 
-        text_start_game = arcade.Text(" Start Game ", 0, option_y_start, 
-            font_size = option_font_size, width = SCREEN_WIDTH, align = "center",
-            font_name = options_font)
-        text_start_game.draw()
-
-        text_high_score = arcade.Text(" High Scores ", 0, option_y_start - option_line_height, 
-            font_size = option_font_size, width = SCREEN_WIDTH, align = "center",
-            font_name = options_font)
-        text_high_score.draw()
-
-        text_settings = arcade.Text(" Settings ", 0, option_y_start - option_line_height * 2, 
-            font_size = option_font_size, width = SCREEN_WIDTH, align = "center",
-            font_name = options_font)
-        text_settings.draw()
-
-        text_quit = arcade.Text(" Quit ", 0, option_y_start - option_line_height * 3, 
-            font_size = option_font_size, width = SCREEN_WIDTH, align = "center",
-            font_name = options_font)
-        text_quit.draw()
-        
-        if self.selected_action == START_GAME:
-            selected_text = text_start_game
-        elif self.selected_action == HIGH_SCORE:
-            selected_text = text_high_score
-        elif self.selected_action == SETTINGS:
-            selected_text = text_settings
-        else:
-            selected_text = text_quit
+        # Each option's label is named after the action it selects
+        options = { START_GAME: " Start Game ", HIGH_SCORE: " High Scores ",
+                    SETTINGS: " Settings ", QUIT_GAME: " Quit " }
+        for action, text in options.items():
+            self.text_layer.add(action, text, 0, option_y_start - option_line_height * action,
+                font_size = option_font_size, width = SCREEN_WIDTH, align = "center",
+                font_name = options_font)
+        self.text_layer.add("loading", "Loading...", 0, SCREEN_HEIGHT * 0.15 + 30,
+            font_size = 15, width = SCREEN_WIDTH, align = "center",
+            font_name = "Kenney Pixel Square", visible = self.preloader is not None)
+
+    def update(self, delta_time):
+        # The music is loaded on the audio thread, and starts once it's ready
+        if self.music_future is not None and self.music_future.done():
+            self.music = self.music_future.result()
+            self.music_future = None
+            self.music_player = arcade.play_sound(self.music, looping = True)
+        if self.preloader is not None and not self.preloader.is_done():
+            self.preloader.load(PRELOAD_FRAME_BUDGET)
+            if self.preloader.is_done():
+                self.text_layer.set_visible("loading", False)
+
+    def on_draw(self):
+        arcade.start_render()
 
+        self.bg_moon.draw()
+        self.text_layer.draw()
+
+        # Draw the preload progress bar
+        if self.preloader is not None and not self.preloader.is_done():
+            bar_width = SCREEN_WIDTH * 0.3
+            bar_left = (SCREEN_WIDTH - bar_width) / 2
+            bar_bottom = SCREEN_HEIGHT * 0.15
+            arcade.draw_lrtb_rectangle_outline(bar_left, bar_left + bar_width,
+                bar_bottom + 20, bar_bottom, arcade.color.WHITE, 2)
+            arcade.draw_lrtb_rectangle_filled(bar_left,
+                bar_left + bar_width * self.preloader.get_progress(),
+                bar_bottom + 20, bar_bottom, arcade.color.WHITE)
+
+        selected_text = self.text_layer.get(self.selected_action)
         arrow_size = 25
         text_width = selected_text.content_width
         arrow_left_x = SCREEN_WIDTH / 2 - text_width / 2 - arrow_size
@@ -1076,7 +3502,11 @@ class TitleView(arcade.View):
     def on_key_release(self, key, modifiers):
         if key == arcade.key.ENTER:
             if self.selected_action == START_GAME:
-                arcade.stop_sound(self.music_player)
+                # Finish preloading before the game starts, if it hasn't yet
+                if self.preloader is not None:
+                    self.preloader.load(math.inf)
+                if self.music_player is not None:
+                    arcade.stop_sound(self.music_player)
                 game = SpaceGameView()
                 game.setup()
                 self.window.show_view(game)
@@ -1095,50 +3525,54 @@ class GameOverView(arcade.View):
         super().__init__()
         self.score = 0
         self.new_high_score = False
-        self.replace_score_id = 0
         self.initials = []
         self.initials_colors = []
         self.selected_initial = 0
+        self.text_layer = None
 
     def setup(self, score):
         self.score = score
-        global save_db
-        # Grab the lowest score in the leaderboard for comparison
-        lowest_score = save_db.execute("SELECT *, MIN(SCORE) FROM SCORES").fetchall()
-        if score <= lowest_score[0][2]:
+        if not score_repository.is_high_score(score):
             # Score is too low for leaderboards, set flag accordingly
             self.new_high_score = False
         else:
             # The player has set a high score
             self.new_high_score = True
-            self.replace_score_id = lowest_score[0][0]
             # Initialize an array of characters used for the name entry screen
             self.initials = ['A', 'A', 'A']
             # Set the color of the selected initial as red
             self.initials_colors = [arcade.color.RED, arcade.color.WHITE, arcade.color.WHITE]
 
-    def on_draw(self):
-        arcade.start_render()
-        arcade.draw_text("GAME OVER", 0, SCREEN_HEIGHT * 0.7,
+        self.text_layer = TextLayer()
+        self.text_layer.add("game_over", "GAME OVER", 0, SCREEN_HEIGHT * 0.7,
             font_size = 50, width = SCREEN_WIDTH, align = "center", font_name = "Kenney Rocket")
         if self.new_high_score:
-            arcade.draw_text(f"Your score was {self.score}\nNew high score set!\nEnter your initials.", \
+            self.text_layer.add("message", f"Your score was {self.score}\nNew high score set!\nEnter your initials.", \
                 0, SCREEN_HEIGHT * 0.4, font_size = 25, width = SCREEN_WIDTH, align = "center",
                 font_name = "Kenney Rocket")
-            
-            arcade.draw_text(self.initials[0], 0, SCREEN_HEIGHT * .5, \
+
+            self.text_layer.add(0, self.initials[0], 0, SCREEN_HEIGHT * .5, \
                 color = self.initials_colors[0], font_size = 80, width = SCREEN_WIDTH * .4, align = "right",
                 font_name = "Kenney Blocks")
-            arcade.draw_text(self.initials[1], 0, SCREEN_HEIGHT * .5, \
+            self.text_layer.add(1, self.initials[1], 0, SCREEN_HEIGHT * .5, \
                 color = self.initials_colors[1], font_size = 80, width = SCREEN_WIDTH, align = "center",
                 font_name = "Kenney Blocks")
-            arcade.draw_text(self.initials[2], SCREEN_WIDTH * .6, SCREEN_HEIGHT * .5, \
+            self.text_layer.add(2, self.initials[2], SCREEN_WIDTH * .6, SCREEN_HEIGHT * .5, \
                 color = self.initials_colors[2], font_size = 80, width = SCREEN_WIDTH * .4, align = "left",
                 font_name = "Kenney Blocks")
         else:
-            arcade.draw_text(f"Your score was {self.score}\nPress Enter to return to title screen.", 
+            self.text_layer.add("message", f"Your score was {self.score}\nPress Enter to return to title screen.", 
                 0, SCREEN_HEIGHT * 0.4, font_size = 25, width = SCREEN_WIDTH, align = "center",
                 font_name = "Kenney Rocket")
+
+    def on_draw(self):
+        arcade.start_render()
+        if self.new_high_score:
+            # The labels for the initials are named after their position
+            for index in range(3):
+                self.text_layer.set_text(index, self.initials[index])
+                self.text_layer.set_color(index, self.initials_colors[index])
+        self.text_layer.draw()
         
     def on_key_press(self, key, moddifiers):
         # Left and Right will change which initial is being modified,
@@ -1175,7 +3609,7 @@ class GameOverView(arcade.View):
                 # Combine the initials into a single string
                 name = self.initials[0] + self.initials[1] + self.initials[2]
                 # Save the score to the database
-                save_score(name, self.score, self.replace_score_id)
+                save_score(name, self.score)
             title = TitleView()
             title.setup()
             self.window.show_view(title)
@@ -1184,35 +3618,61 @@ class HighScoreView(arcade.View):
     def __init__(self):
         super().__init__()
         self.bg_moon = None
+        self.text_layer = None
+        # Pages of scores seen so far, and the one being shown
+        self.pages = []
+        self.page = 0
 
     def setup(self):
         # Ensure the most up-to-date scores are loaded
         load_game()
+        global high_scores
+        self.pages = [high_scores]
+        self.page = 0
         self.bg_moon = arcade.Sprite(filename = "./res/img/bg_moon.png", scale = 2, center_x = -150, center_y = SCREEN_HEIGHT // 2)
         self.bg_moon.color = arcade.color.RED
         self.bg_moon.alpha = 100
 
+        self.text_layer = TextLayer()
+        self.text_layer.add("title", "HIGH SCORES", 0, SCREEN_HEIGHT * .8, font_size = 25, \
+                            width = SCREEN_WIDTH, align = "center",
+                            font_name = "Kenney Rocket")
+        self.show_page()
+
+        self.text_layer.add("return", "Press ENTER to return, LEFT and RIGHT to change page", \
+                            0, SCREEN_HEIGHT * .15, font_size = 12, width = SCREEN_WIDTH,
+                            align = "center", font_name = "Kenney Pixel Square")
+
+    def show_page(self):
+        first_rank = self.page * LEADERBOARD_SIZE + 1
+        print_y = SCREEN_HEIGHT * .7
+        line_height = 50
+        self.text_layer.set_group("scores",
+            [(f"{first_rank + index}. {name}: {score}", 0, print_y - line_height * index)
+             for index, (_, name, score) in enumerate(self.pages[self.page])],
+            font_size = 30, width = SCREEN_WIDTH, align = "center",
+            font_name = "Kenney High Square")
+
     def on_draw(self):
         arcade.start_render()
         self.bg_moon.draw()
-        arcade.draw_text("HIGH SCORES", 0, SCREEN_HEIGHT * .8, font_size = 25, \
-                         width = SCREEN_WIDTH, align = "center",
-                         font_name = "Kenney Rocket")
-        score_rank = 1
-        print_y = SCREEN_HEIGHT * .7
-        line_height = 50
-        global high_scores
-        for score in high_scores:
-            arcade.draw_text(
-                f"{score_rank}. {high_scores[score_rank - 1][1]}: {high_scores[score_rank - 1][2]}", \
-                0, print_y, font_size = 30, width = SCREEN_WIDTH, align = "center",
-                font_name = "Kenney High Square")
-            score_rank += 1
-            print_y -= line_height
-
-        arcade.draw_text("Press ENTER to return", 0, SCREEN_HEIGHT * .15, \
-                         font_size = 12, width = SCREEN_WIDTH, align = "center",
-                         font_name = "Kenney Pixel Square")
+        self.text_layer.draw()
+
+    # Pages are loaded as they're reached, each one following on from the
+    # last score of the page before
+    def on_key_press(self, key, modifiers):
+        if key == arcade.key.RIGHT:
+            rows = self.pages[self.page]
+            if self.page + 1 == len(self.pages) and len(rows) == LEADERBOARD_SIZE:
+                next_rows = score_repository.get_page(rows[-1])
+                if next_rows:
+                    self.pages.append(next_rows)
+            if self.page + 1 < len(self.pages):
+                self.page += 1
+                self.show_page()
+        elif key == arcade.key.LEFT and self.page > 0:
+            self.page -= 1
+            self.show_page()
         
     def on_key_release(self, key, modifiers):
         if key == arcade.key.ENTER:
@@ -1231,38 +3691,30 @@ class SettingsView(arcade.View):
         self.delete_confirmation = False
         self.selected_action = DELETE_SCORES
 
-    def on_draw(self):
-        arcade.start_render()
+        # Each option's label is named after the action it selects
         print_y = SCREEN_HEIGHT * .7
         line_height = 45
         font_name = "Kenney Pixel Square"
-        text_delete_scores = arcade.Text("  Reset high scores  ", 0, print_y, \
+        self.text_layer = TextLayer()
+        self.text_layer.add(DELETE_SCORES, "  Reset high scores  ", 0, print_y, \
             font_size = 25, width = SCREEN_WIDTH, align = "center", font_name = font_name)
-        text_return_to_tile = arcade.Text("  Return to title screen  ", 0, print_y - line_height * 5, \
+        self.text_layer.add(RETURN_TO_TITLE, "  Return to title screen  ", 0, print_y - line_height * 5, \
             font_size = 25, width = SCREEN_WIDTH, align = "center", font_name = font_name)
-        text_confirmation = arcade.Text("Are you sure?", 0, print_y - line_height, \
+        self.text_layer.add("confirmation", "Are you sure?", 0, print_y - line_height, \
             font_size = 25, width = SCREEN_WIDTH, align = "center", font_name = font_name)
-        text_confirmation_no = arcade.Text("  No  ", 0, print_y - line_height * 2, \
+        self.text_layer.add(CONFIRM_NO, "  No  ", 0, print_y - line_height * 2, \
             font_size = 25, width = SCREEN_WIDTH, align = "center", font_name = font_name)
-        text_confirmation_yes = arcade.Text("  Yes  ", 0, print_y - line_height * 3, \
+        self.text_layer.add(CONFIRM_YES, "  Yes  ", 0, print_y - line_height * 3, \
             font_size = 25, width = SCREEN_WIDTH, align = "center", font_name = font_name)
-        
-        text_delete_scores.draw()
-        text_return_to_tile.draw()
-
-        if self.delete_confirmation:
-            text_confirmation.draw()
-            text_confirmation_no.draw()
-            text_confirmation_yes.draw()
-
-        if self.selected_action == DELETE_SCORES:
-            selected_text = text_delete_scores
-        elif self.selected_action == RETURN_TO_TITLE:
-            selected_text = text_return_to_tile
-        elif self.selected_action == CONFIRM_NO:
-            selected_text = text_confirmation_no
-        else:
-            selected_text = text_confirmation_yes
+
+    def on_draw(self):
+        arcade.start_render()
+
+        for name in ("confirmation", CONFIRM_NO, CONFIRM_YES):
+            self.text_layer.set_visible(name, self.delete_confirmation)
+        self.text_layer.draw()
+
+        selected_text = self.text_layer.get(self.selected_action)
 
         arrow_size = 25
         text_width = selected_text.content_width
@@ -1306,25 +3758,259 @@ class SettingsView(arcade.View):
                 self.delete_confirmation = False
                 self.selected_action = DELETE_SCORES
         
-# Reads all the scores from the database into an easily accessible list
+# SQL run by ScoreRepository. Each statement always has the same text, with
+# values passed as parameters, so sqlite3 prepares it once and reuses it.
+SCORE_INDEX_SQL = "CREATE INDEX IF NOT EXISTS SCORES_BY_SCORE ON SCORES(SCORE)"
+SCORE_INSERT_SQL = "INSERT INTO SCORES(NAME, SCORE) VALUES(?, ?)"
+SCORE_FIRST_PAGE_SQL = "SELECT ID, NAME, SCORE FROM SCORES ORDER BY SCORE DESC, ID DESC LIMIT ?"
+SCORE_NEXT_PAGE_SQL = '''SELECT ID, NAME, SCORE FROM SCORES WHERE (SCORE, ID) < (?, ?)
+                         ORDER BY SCORE DESC, ID DESC LIMIT ?'''
+
+# Every score ever saved in the given database file, ordered from highest
+# to lowest by the index on SCORE, with ties ordered newest first. Pages are
+# found from the last row of the previous page rather than an offset, so
+# every page is an index lookup however many scores there are. The
+# leaderboard is cached until the next write, and whether a score makes the
+# leaderboard is decided from it, so a game over never reads more than the
+# leaderboard's rows. add only queues the score, and a writer thread with
+# its own connection commits it, so the game never waits on the disk. Reads
+# wait for the scores queued before them.
+class ScoreRepository:
+    def __init__(self, filename):
+        self.filename = filename
+        self.db = sqlite3.connect(filename)
+        self.db.execute(SCORE_INDEX_SQL)
+        # Commits only wait for the write ahead log, not the database file
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.commit()
+        self.leaderboard = None
+        # (name, score) of each score waiting to be written, ending with
+        # None once closed
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target = self.run_writer, name = "scores", daemon = True)
+        self.writer.start()
+
+    def run_writer(self):
+        db = sqlite3.connect(self.filename)
+        db.execute("PRAGMA synchronous = NORMAL")
+        while True:
+            score = self.queue.get()
+            if score is None:
+                self.queue.task_done()
+                break
+            try:
+                with db:
+                    db.execute(SCORE_INSERT_SQL, score)
+            except sqlite3.Error as error:
+                print(f"Couldn't save score: {error}")
+            self.queue.task_done()
+        db.close()
+
+    # Waits until every score added so far has been written
+    def flush(self):
+        self.queue.join()
+
+    # Writes the scores still queued and closes both connections
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.db.close()
+
+    # Returns the rows on the page after the given row, or the first page
+    # if after is None. Rows are (ID, Name, Score).
+    def get_page(self, after = None, size = LEADERBOARD_SIZE):
+        self.flush()
+        if after is None:
+            return self.db.execute(SCORE_FIRST_PAGE_SQL, (size,)).fetchall()
+        id, _, score = after
+        return self.db.execute(SCORE_NEXT_PAGE_SQL, (score, id, size)).fetchall()
+
+    def get_leaderboard(self):
+        if self.leaderboard is None:
+            self.leaderboard = self.get_page()
+        return self.leaderboard
+
+    # A score makes the leaderboard if it isn't full yet, or if it beats the
+    # lowest score on it. Tying the lowest score isn't enough.
+    def is_high_score(self, score):
+        leaderboard = self.get_leaderboard()
+        return len(leaderboard) < LEADERBOARD_SIZE or score > leaderboard[-1][2]
+
+    def add(self, name, score):
+        self.queue.put((name, score))
+        self.leaderboard = None
+
+# Reads the leaderboard's scores into an easily accessible list
 def load_game():
     global high_scores
-    global save_db
-    high_scores = save_db.execute("SELECT * FROM SCORES ORDER BY SCORE DESC").fetchall()
+    high_scores = score_repository.get_leaderboard()
 
-# Updates the leaderboard with the given name and score, replacing the existing
-# score represented by replace_id in the database
-def save_score(name, score, replace_id):
-    global save_db
-    save_db.execute(f'''UPDATE SCORES SET NAME = "{name}", SCORE = {score}
-                    WHERE ID = {replace_id}''')
-    save_db.commit()
+# Adds the given name and score to the saved scores
+def save_score(name, score):
+    score_repository.add(name, score)
+
+# Filename for the telemetry database. It's kept apart from the save file,
+# so resetting the high scores doesn't delete it.
+TELEMETRY_DB_FILENAME = "telemetry.db"
+# Most runs written to the telemetry database in one transaction
+TELEMETRY_BATCH_SIZE = 256
+
+# Tables for the runs recorded by TelemetryStore. Each index covers the
+# columns an aggregate query reads, so the queries only scan the index.
+TELEMETRY_SCHEMA_SQL = [
+    '''CREATE TABLE IF NOT EXISTS RUNS (
+        ID INTEGER PRIMARY KEY,
+        SEED INT NOT NULL,
+        SCORE INT NOT NULL,
+        KILLS INT NOT NULL,
+        STAGE INT NOT NULL,
+        ENEMIES_SPAWNED INT NOT NULL,
+        TICKS INT NOT NULL,
+        DEATH_CAUSE TEXT
+    )''',
+    '''CREATE TABLE IF NOT EXISTS RUN_COLLECTABLES (
+        RUN_ID INT NOT NULL,
+        TYPE TEXT NOT NULL,
+        COUNT INT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS RUN_DAMAGE (
+        RUN_ID INT NOT NULL,
+        SOURCE TEXT NOT NULL,
+        AMOUNT INT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS RUN_STAGES (
+        RUN_ID INT NOT NULL,
+        STAGE INT NOT NULL,
+        TICKS INT NOT NULL
+    )''',
+    "CREATE INDEX IF NOT EXISTS RUNS_BY_STAGE ON RUNS(STAGE, DEATH_CAUSE)",
+    "CREATE INDEX IF NOT EXISTS RUN_COLLECTABLES_BY_TYPE ON RUN_COLLECTABLES(TYPE, COUNT)",
+    "CREATE INDEX IF NOT EXISTS RUN_DAMAGE_BY_SOURCE ON RUN_DAMAGE(SOURCE, AMOUNT)",
+    "CREATE INDEX IF NOT EXISTS RUN_STAGES_BY_STAGE ON RUN_STAGES(STAGE, TICKS)"
+]
+TELEMETRY_RUN_SQL = '''INSERT INTO RUNS(SEED, SCORE, KILLS, STAGE, ENEMIES_SPAWNED, TICKS, DEATH_CAUSE)
+                       VALUES(?, ?, ?, ?, ?, ?, ?)'''
+TELEMETRY_COLLECTABLE_SQL = "INSERT INTO RUN_COLLECTABLES(RUN_ID, TYPE, COUNT) VALUES(?, ?, ?)"
+TELEMETRY_DAMAGE_SQL = "INSERT INTO RUN_DAMAGE(RUN_ID, SOURCE, AMOUNT) VALUES(?, ?, ?)"
+TELEMETRY_STAGE_SQL = "INSERT INTO RUN_STAGES(RUN_ID, STAGE, TICKS) VALUES(?, ?, ?)"
+
+# Records the stats of every finished run (see get_run_stats) to a SQLite
+# database. record_run only queues the run, and a writer thread writes
+# everything queued so far in a single transaction, so the game never waits
+# on the database. Aggregate queries read through a separate connection on
+# the calling thread.
+class TelemetryStore:
+    def __init__(self, filename = TELEMETRY_DB_FILENAME):
+        self.filename = filename
+        db = sqlite3.connect(filename)
+        db.execute("PRAGMA journal_mode = WAL")
+        for sql in TELEMETRY_SCHEMA_SQL:
+            db.execute(sql)
+        db.commit()
+        db.close()
+        self.read_db = None
+        # Runs waiting to be written, ending with None once closed
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target = self.run_writer, name = "telemetry", daemon = True)
+        self.writer.start()
+
+    def record_run(self, run):
+        self.queue.put(run)
+
+    # Waits until every run recorded so far has been written
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        if self.read_db is not None:
+            self.read_db.close()
+            self.read_db = None
+
+    def run_writer(self):
+        db = sqlite3.connect(self.filename)
+        db.execute("PRAGMA synchronous = NORMAL")
+        closed = False
+        while not closed:
+            batch = [self.queue.get()]
+            while len(batch) < TELEMETRY_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get())
+            runs = [run for run in batch if run is not None]
+            closed = len(runs) < len(batch)
+            try:
+                self.write_runs(db, runs)
+            except sqlite3.Error as error:
+                print(f"Couldn't write telemetry: {error}")
+            for _ in batch:
+                self.queue.task_done()
+        db.close()
+
+    def write_runs(self, db, runs):
+        with db:
+            for run in runs:
+                run_id = db.execute(TELEMETRY_RUN_SQL, (run["seed"], run["score"], run["kills"],
+                    run["stage"], run["enemies_spawned"], run["ticks"], run["death_cause"])).lastrowid
+                db.executemany(TELEMETRY_COLLECTABLE_SQL,
+                    [(run_id, type, count) for type, count in run["collected"].items()])
+                db.executemany(TELEMETRY_DAMAGE_SQL,
+                    [(run_id, source, amount) for source, amount in run["damage_taken"].items()])
+                db.executemany(TELEMETRY_STAGE_SQL,
+                    [(run_id, stage, ticks) for stage, ticks in enumerate(run["stage_ticks"], 1)])
+
+    def query(self, sql, parameters = ()):
+        if self.read_db is None:
+            self.read_db = sqlite3.connect(self.filename)
+        return self.read_db.execute(sql, parameters).fetchall()
+
+    # Returns the number of runs and the average stage they reached
+    def get_average_stage(self):
+        return self.query("SELECT COUNT(*), AVG(STAGE) FROM RUNS")[0]
+
+    # Returns (stage, death cause, runs) for every stage runs ended on,
+    # with the most common cause first
+    def get_death_causes(self):
+        return self.query('''SELECT STAGE, DEATH_CAUSE, COUNT(*) FROM RUNS
+                             GROUP BY STAGE, DEATH_CAUSE ORDER BY STAGE, COUNT(*) DESC''')
+
+    # Returns (stage, runs, average seconds spent in it) for every stage
+    def get_stage_times(self):
+        return self.query('''SELECT STAGE, COUNT(*), AVG(TICKS) / ? FROM RUN_STAGES
+                             GROUP BY STAGE ORDER BY STAGE''', (TICK_RATE,))
+
+    # Returns (type, total picked up) for every type of collectable
+    def get_collectable_totals(self):
+        return self.query('''SELECT TYPE, SUM(COUNT) FROM RUN_COLLECTABLES
+                             GROUP BY TYPE ORDER BY SUM(COUNT) DESC''')
+
+    # Returns (source, total damage) for everything that damaged the player
+    def get_damage_totals(self):
+        return self.query('''SELECT SOURCE, SUM(AMOUNT) FROM RUN_DAMAGE
+                             GROUP BY SOURCE ORDER BY SUM(AMOUNT) DESC''')
+
+# Prints a summary of every run recorded in the telemetry database
+def print_telemetry():
+    store = TelemetryStore()
+    runs, average_stage = store.get_average_stage()
+    print(f"Runs: {runs}, average stage reached: {average_stage or 0:.2f}")
+    print("Deaths by stage:")
+    for stage, cause, count in store.get_death_causes():
+        print(f"  Stage {stage}: {cause}: {count}")
+    print("Average time per stage:")
+    for stage, count, seconds in store.get_stage_times():
+        print(f"  Stage {stage}: {seconds:.1f}s over {count} runs")
+    print("Collectables picked up:")
+    for type, total in store.get_collectable_totals():
+        print(f"  {type}: {total}")
+    print("Damage taken:")
+    for source, total in store.get_damage_totals():
+        print(f"  {source}: {total}")
+    store.close()
 
 # Ensures that a valid save file exists. Used in init_save to overwrite potentially
 # corrupted save files with brand new ones.
 def validate_save():
     global save_db
-    global high_scores
 
     # Save file does not exist
     if not os.path.exists(DB_FILENAME):
@@ -1338,14 +4024,10 @@ def validate_save():
     
     # Score table not present in save file
     try:
-        high_scores = save_db.execute('''SELECT * FROM SCORES''').fetchall()
+        save_db.execute('''SELECT ID FROM SCORES LIMIT 1''').fetchall()
     except:
         return False
     
-    # Incorrect number of scores present
-    if len(high_scores) != 10:
-        return False
-    
     # Incorrect score format
     try:
         schema = save_db.execute('''PRAGMA table_info('SCORES')''').fetchall()
@@ -1361,16 +4043,25 @@ def validate_save():
     return True
 
 # Initializes a new save file if one doesn't already exist,
-# populating the leaderboard with default values
+# populating the leaderboard with default values. Every connection to the
+# save file is closed before it's checked or replaced, so nothing still has
+# it open, or writes to it, while it's deleted.
 def init_save(reset = False):
     global save_db
-    save_db = sqlite3.connect(DB_FILENAME)
-    if reset or not validate_save():
-        if os.path.exists(DB_FILENAME):
-            save_db.close()
-            save_db = None
-            os.remove(DB_FILENAME)
-            save_db = sqlite3.connect(DB_FILENAME)
+    global score_repository
+    if score_repository is not None:
+        score_repository.close()
+        score_repository = None
+    valid = not reset and validate_save()
+    if save_db is not None:
+        save_db.close()
+        save_db = None
+    if not valid:
+        # The write ahead log and its index belong to the old file too
+        for filename in (DB_FILENAME, DB_FILENAME + "-wal", DB_FILENAME + "-shm"):
+            if os.path.exists(filename):
+                os.remove(filename)
+        save_db = sqlite3.connect(DB_FILENAME)
         save_db.execute('''CREATE TABLE SCORES (
                             ID INTEGER PRIMARY KEY,
                             NAME TEXT NOT NULL,
@@ -1397,18 +4088,106 @@ def init_save(reset = False):
         save_db.execute('''INSERT INTO SCORES(NAME, SCORE)
                             VALUES("KEI", 3900)''')
         save_db.commit()
+        save_db.close()
+        save_db = None
+    score_repository = ScoreRepository(DB_FILENAME)
+
+# Runs a game without a window for up to the given number of ticks, then
+# prints how fast it ran and how far it got
+def run_headless(ticks, seed = None):
+    game = SpaceGameSimulation(seed)
+    game.setup()
+    start_time = time.perf_counter()
+    ticks_run = game.run(ticks)
+    elapsed = time.perf_counter() - start_time
+    print(f"Ran {ticks_run} ticks in {elapsed:.2f}s ({ticks_run / elapsed:.0f} ticks per second)")
+    print(f"Seed: {game.seed}, Stage: {game.stage}, Score: {game.score}, "
+          f"Kills: {game.kills}, Game over: {game.game_over}")
+
+# Plays back a replay file without a window and reports whether the game
+# matched the recording
+def run_replay(filename):
+    replay = Replay.load(filename)
+    ticks, elapsed, mismatch_tick = play_replay(replay)
+    print(f"Replayed {ticks} ticks in {elapsed:.2f}s ({ticks / elapsed:.0f} ticks per second)")
+    if mismatch_tick is None:
+        print("Replay matched the recording")
+    else:
+        print(f"Replay diverged from the recording at tick {mismatch_tick}")
+        sys.exit(1)
+
+# Runs the stress test in a window, writing its results to the given file
+def run_stress_test(filename):
+    window = SpaceGameWindow()
+    stress = StressView(filename)
+    stress.setup()
+    window.show_view(stress)
+    arcade.run()
+
+# Command line options:
+#   debug              Show debug info and the frame profiler while playing
+#   profile <file>     Show debug info and write every frame's profiler
+#                      numbers to the given CSV file
+#   record <file>      Record each game played to the given replay file
+#   rewind             Keep a snapshot of every second for the rewind key
+#   replay <file>      Play back a replay file without a window
+#   headless [ticks] [seed]
+#                      Run a game without a window as fast as possible
+#   telemetry          Print a summary of the runs recorded so far
+#   stress [file]      Ramp up entity counts until frames go over budget,
+#                      writing the scaling curve to the given CSV file
+COMMAND_LINE_OPTIONS = ("debug", "profile", "record", "rewind", "replay",
+                        "headless", "telemetry", "stress")
+
+# Gets the filename given after an option, printing the usage and exiting
+# if it's missing or is another option
+def get_option_filename(args, option):
+    index = args.index(option) + 1
+    if index >= len(args) or args[index] in COMMAND_LINE_OPTIONS:
+        print(f"Usage: space_game.py {option} <file>")
+        sys.exit(2)
+    return args[index]
 
 def main():
     global debug_mode
-    if len(sys.argv) > 1 and sys.argv[1] == "debug":
+    global telemetry
+    global replay_filename
+    global profile_filename
+    global rewind_mode
+    args = sys.argv[1:]
+    if "debug" in args:
+        debug_mode = True
+    if "profile" in args:
         debug_mode = True
+        profile_filename = get_option_filename(args, "profile")
+    if "record" in args:
+        replay_filename = get_option_filename(args, "record")
+    if "rewind" in args:
+        rewind_mode = True
+    if len(args) > 0 and args[0] == "replay":
+        run_replay(get_option_filename(args, "replay"))
+        return
+    if len(args) > 0 and args[0] == "headless":
+        ticks = int(args[1]) if len(args) > 1 else HEADLESS_TICKS_DEFAULT
+        seed = int(args[2]) if len(args) > 2 else None
+        run_headless(ticks, seed)
+        return
+    if len(args) > 0 and args[0] == "telemetry":
+        print_telemetry()
+        return
+    if len(args) > 0 and args[0] == "stress":
+        run_stress_test(args[1] if len(args) > 1 else STRESS_FILENAME_DEFAULT)
+        return
     init_save()
     load_game()
+    telemetry = TelemetryStore()
     window = SpaceGameWindow()
     title = TitleView()
     title.setup()
     window.show_view(title)
     arcade.run()
+    telemetry.close()
+    score_repository.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
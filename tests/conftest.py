@@ -0,0 +1,4 @@
+import os
+
+# The sprites load their images from paths relative to the repository root
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,92 @@
+import pytest
+
+import balance_sim
+import space_game
+from balance_sim import Pilot, play_game, play_games, summarize
+from space_game import SpaceGameSimulation
+
+def make_game(seed = 1):
+    game = SpaceGameSimulation(seed)
+    game.setup()
+    return game
+
+def make_run(stage, ticks, death_cause = None, stalled = False):
+    return {
+        "seed": 0, "score": 0, "kills": 0, "stage": stage, "enemies_spawned": 0,
+        "ticks": ticks, "death_cause": death_cause, "collected": {"health": 1},
+        "damage_taken": {death_cause: 3} if death_cause else {},
+        "stage_ticks": [600] * (stage - 1) + [ticks - 600 * (stage - 1)], "stalled": stalled
+    }
+
+def test_hold_presses_and_releases_once():
+    game = make_game()
+    pilot = Pilot(game)
+    pilot.hold("left", True)
+    assert game.player.moving_left
+    game.player.moving_left = False
+    # Holding a key that's already held doesn't press it again
+    pilot.hold("left", True)
+    assert not game.player.moving_left
+    game.player.moving_left = True
+    pilot.hold("left", False)
+    assert not game.player.moving_left
+
+@pytest.mark.parametrize("x, left, right", [(-100, True, False), (100, False, True), (4, False, False)])
+def test_steer_to(x, left, right):
+    game = make_game()
+    pilot = Pilot(game)
+    pilot.steer_to(game.player.center_x + x)
+    assert (game.player.moving_left, game.player.moving_right) == (left, right)
+
+def test_shoot_respects_cooldown():
+    game = make_game()
+    pilot = Pilot(game)
+    game.player.shoot_cooldown = -1
+    pilot.shoot()
+    pilot.shoot()
+    assert game.projectiles.count == 1
+
+def test_get_pilot():
+    assert balance_sim.get_pilot("dodge") is balance_sim.DodgePilot
+    assert balance_sim.get_pilot("balance_sim:TurretPilot") is balance_sim.TurretPilot
+
+def test_play_game_is_deterministic():
+    first = play_game(3, "dodge", 600)
+    assert first == play_game(3, "dodge", 600)
+    assert first["ticks"] == 600
+    assert not first["stalled"]
+    assert sum(first["stage_ticks"]) == 600
+
+def test_play_game_stops_stalled_games():
+    run = play_game(2, "dodge", balance_sim.BALANCE_TICKS)
+    assert run["stalled"]
+    assert run["ticks"] < balance_sim.BALANCE_TICKS
+    assert run["kills"] < space_game.KILL_COUNT_THRESHOLDS[run["stage"] - 1]
+
+def test_is_stalled():
+    game = make_game()
+    assert not balance_sim.is_stalled(game)
+    game.enemies_spawned = space_game.KILL_COUNT_THRESHOLDS[0]
+    assert balance_sim.is_stalled(game)
+    game.spawn_enemy("basic_straight")
+    assert not balance_sim.is_stalled(game)
+    game.kills = space_game.KILL_COUNT_THRESHOLDS[0]
+    game.release_enemy(game.enemy_list[0])
+    assert not balance_sim.is_stalled(game)
+
+def test_play_games_matches_play_game():
+    seeds = [0, 1, 2]
+    runs = play_games(seeds, "turret", 300, 1)
+    assert runs == [play_game(seed, "turret", 300) for seed in seeds]
+
+def test_summarize(capsys):
+    runs = [make_run(1, 900, stalled = True), make_run(2, 1500, "bullet:enemy_basic"),
+            make_run(2, 1800), make_run(3, 1800)]
+    summarize(runs, 1800)
+    output = capsys.readouterr().out
+    assert "Runs: 4, average stage reached: 2.00, survived all 1800 ticks: 2, stalled: 1" in output
+    assert "bullet:enemy_basic (100% of 1 deaths)" in output
+    # Stalled runs aren't counted as deaths
+    stage_1 = next(line for line in output.splitlines() if line.strip().startswith("1 "))
+    assert stage_1.split()[-1] == "none"
+    assert "bullet:enemy_basic                3 100.0%" in output
@@ -0,0 +1,130 @@
+import random
+
+import arcade
+import pytest
+
+import space_game
+from space_game import CollisionGrid, ProjectileStore, SpaceGameSimulation
+
+def make_game():
+    game = SpaceGameSimulation(1)
+    game.setup()
+    return game
+
+# Fires a player bullet of the given power straight at the sprite
+def shoot_at(game, sprite, power):
+    game.projectiles.spawn(space_game.archetypes["bullet"]["player_basic"],
+        sprite.center_x, sprite.center_y, 0, 0, 0, power)
+
+# Bullet strengths are stored as floats, but health stays an int after a hit
+def test_bullet_hit_keeps_enemy_health_int():
+    game = make_game()
+    game.spawn_enemy("basic_straight")
+    enemy = game.enemy_list[0]
+    enemy.center_y = space_game.SCREEN_HEIGHT // 2
+    enemy.health = 5
+    shoot_at(game, enemy, 2)
+    game.check_collision()
+    assert enemy.health == 3
+    assert type(enemy.health) is int
+
+def test_bullet_hit_keeps_obstacle_health_int():
+    game = make_game()
+    game.spawn_obstacle("medium")
+    obstacle = game.obstacle_list[0]
+    obstacle.center_y = space_game.SCREEN_HEIGHT // 2
+    shoot_at(game, obstacle, 1)
+    game.check_collision()
+    assert obstacle.health == 2
+    assert type(obstacle.health) is int
+
+def make_bullets(seed, count):
+    rng = random.Random(seed)
+    bullets = space_game.archetypes["bullet"]
+    projectiles = ProjectileStore(4)
+    for _ in range(count):
+        archetype = bullets[rng.choice(["player_basic", "enemy_basic"])]
+        projectiles.spawn(archetype, rng.uniform(-50, space_game.SCREEN_WIDTH + 50),
+            rng.uniform(-50, space_game.SCREEN_HEIGHT + 50), rng.uniform(-10, 10),
+            rng.uniform(-10, 10), rng.choice([0, 30, 90, 135]), 1)
+    return projectiles
+
+def overlaps(projectiles, index, left, right, bottom, top):
+    x = projectiles.x[index]
+    y = projectiles.y[index]
+    half_width = projectiles.half_width[index]
+    half_height = projectiles.half_height[index]
+    return (x + half_width > left and x - half_width < right and
+            y + half_height > bottom and y - half_height < top)
+
+def test_projectile_update_moves_and_culls_in_order():
+    space_game.compile_archetypes()
+    projectiles = make_bullets(1, 300)
+    assert projectiles.capacity >= 300
+    expected = []
+    for index in range(300):
+        x = projectiles.x[index] + projectiles.change_x[index]
+        y = projectiles.y[index] + projectiles.change_y[index]
+        half_width = projectiles.half_width[index]
+        half_height = projectiles.half_height[index]
+        if (y - half_height <= space_game.SCREEN_HEIGHT and y + half_height >= 0 and
+                x - half_width <= space_game.SCREEN_WIDTH and x + half_width >= 0):
+            expected.append((x, y, projectiles.friendly[index]))
+    projectiles.update()
+    count = projectiles.count
+    assert list(zip(projectiles.x[:count], projectiles.y[:count],
+                    projectiles.friendly[:count])) == expected
+
+# hits and find_within only test the bullets in range of x, so they're
+# checked against testing every bullet
+@pytest.mark.parametrize("friendly", [True, False])
+def test_projectile_hit_search_matches_checking_every_bullet(friendly):
+    space_game.compile_archetypes()
+    projectiles = make_bullets(2, 400)
+    projectiles.spent[:400:7] = True
+    projectiles.prepare_hits(friendly)
+    rng = random.Random(3)
+    for _ in range(200):
+        left = rng.uniform(0, space_game.SCREEN_WIDTH)
+        bottom = rng.uniform(0, space_game.SCREEN_HEIGHT)
+        right = left + rng.uniform(1, 150)
+        top = bottom + rng.uniform(1, 150)
+        expected = [index for index in range(400)
+                    if projectiles.friendly[index] == friendly and not projectiles.spent[index]
+                    and overlaps(projectiles, index, left, right, bottom, top)]
+        assert projectiles.hits(left, right, bottom, top).tolist() == expected
+
+        x, y, radius = left, bottom, rng.uniform(10, 100)
+        within = [index for index in range(400) if projectiles.friendly[index] == friendly
+                  and (projectiles.x[index] - x) ** 2 + (projectiles.y[index] - y) ** 2 < radius ** 2]
+        assert projectiles.find_within(x, y, radius) == (min(within) if within else None)
+
+def test_remove_spent_keeps_the_rest_in_order():
+    space_game.compile_archetypes()
+    projectiles = make_bullets(4, 50)
+    x = projectiles.x[:50].copy()
+    projectiles.spent[:50:3] = True
+    assert projectiles.remove_spent()
+    assert projectiles.x[:projectiles.count].tolist() == [x[index] for index in range(50) if index % 3]
+    assert not projectiles.remove_spent()
+
+# The grid only skips sprites too far apart to collide, so it finds the
+# same collisions as checking every sprite
+def test_collision_grid_matches_checking_every_sprite():
+    rng = random.Random(5)
+    sprites = []
+    for _ in range(150):
+        sprite = arcade.SpriteSolidColor(rng.randint(5, 120), rng.randint(5, 120), arcade.color.WHITE)
+        sprite.center_x = rng.uniform(space_game.GAME_AREA_LEFT - 100, space_game.GAME_AREA_RIGHT + 100)
+        sprite.center_y = rng.uniform(-100, space_game.SCREEN_HEIGHT + 100)
+        sprite.angle = rng.choice([0, 45])
+        sprite.in_pool = rng.random() < 0.1
+        sprites.append(sprite)
+    grid = CollisionGrid()
+    grid.rebuild(sprites)
+    for sprite in sprites[:40]:
+        expected = [other for other in sprites if not other.in_pool
+                    and arcade.check_for_collision(sprite, other)]
+        assert sorted(map(id, grid.collisions(sprite))) == sorted(map(id, expected))
+    grid.clear()
+    assert not any(grid.cells)
@@ -0,0 +1,28 @@
+import sys
+
+import pytest
+
+import space_game
+
+# A filename option with nothing after it, or with another option after it,
+# exits with the usage instead of failing or taking the option as the file
+@pytest.mark.parametrize("args", [
+    ["record"],
+    ["profile"],
+    ["replay"],
+    ["record", "debug"],
+    ["profile", "record", "replay.rec"],
+])
+def test_missing_filename_prints_usage(monkeypatch, capsys, args):
+    monkeypatch.setattr(sys, "argv", ["space_game.py"] + args)
+    # main sets these globals from the options, so put them back afterwards
+    for name in ("debug_mode", "profile_filename", "replay_filename", "rewind_mode"):
+        monkeypatch.setattr(space_game, name, getattr(space_game, name))
+    with pytest.raises(SystemExit) as exit:
+        space_game.main()
+    assert exit.value.code == 2
+    assert "Usage: space_game.py" in capsys.readouterr().out
+
+def test_option_filename():
+    args = ["debug", "record", "games.rec", "rewind"]
+    assert space_game.get_option_filename(args, "record") == "games.rec"
@@ -0,0 +1,118 @@
+import random
+
+import numpy as np
+
+import space_game
+from space_game import Enemy, EnemyBehaviorSystem, ProjectileStore
+
+def make_batch(type, count, seed = 1):
+    space_game.compile_archetypes()
+    system = EnemyBehaviorSystem()
+    rng = random.Random(seed)
+    enemies = []
+    for _ in range(count):
+        enemy = Enemy(space_game.archetypes["enemy"][type])
+        enemy.reset(rng)
+        system.add(enemy, rng)
+        enemies.append(enemy)
+    return system.batches[type], enemies
+
+def check_slots(batch):
+    assert len(batch.sprites) == batch.count
+    for slot, enemy in enumerate(batch.sprites):
+        assert enemy.batch is batch
+        assert enemy.slot == slot
+        assert enemy.center_x == batch.x[slot]
+
+def test_grows_and_removes_by_moving_the_last_enemy():
+    batch, enemies = make_batch("basic_straight", space_game.ENEMY_BATCH_CAPACITY + 3)
+    assert batch.capacity == space_game.ENEMY_BATCH_CAPACITY * 2
+    check_slots(batch)
+    last_change_y = batch.change_y[batch.count - 1]
+    batch.remove(enemies[2])
+    assert enemies[2].batch is None
+    assert batch.sprites[2] is enemies[-1]
+    assert batch.change_y[2] == last_change_y
+    check_slots(batch)
+
+def test_update_moves_enemies_and_their_sprites():
+    batch, enemies = make_batch("basic_fast", 5)
+    x = batch.x[:5].copy()
+    y = batch.y[:5].copy()
+    batch.update(np.random.default_rng(1))
+    assert np.array_equal(batch.x[:5], x + batch.change_x[:5])
+    assert np.array_equal(batch.y[:5], y + batch.change_y[:5])
+    check_slots(batch)
+    assert all(enemy.center_y == batch.y[enemy.slot] for enemy in enemies)
+
+def test_straight_enemies_shoot_once_their_cooldown_is_over(monkeypatch):
+    monkeypatch.setattr(space_game, "STRAIGHT_SHOOT_CHANCE", 100)
+    batch, _ = make_batch("basic_straight", 4)
+    rng = np.random.default_rng(1)
+    batch.shoot_cooldown[:2] = 0
+    batch.update(rng)
+    assert batch.shoot(0, rng).tolist() == [0, 1]
+    assert not batch.shooting[:4].any()
+    assert (batch.shoot_cooldown[:2] == space_game.SHOOT_COOLDOWN).all()
+    assert batch.shoot(0, rng).tolist() == []
+
+def test_zigzag_enemies_turn_when_their_timer_runs_out():
+    batch, _ = make_batch("basic_zigzag", 4)
+    batch.timer[:4] = [0, 5, 0, 5]
+    change_x = batch.change_x[:4].copy()
+    batch.update(np.random.default_rng(1))
+    assert np.array_equal(batch.change_x[:4], change_x * [-1, 1, -1, 1])
+    low, high = space_game.ZIGZAG_TIMER
+    assert ((batch.timer[[0, 2]] >= low) & (batch.timer[[0, 2]] <= high)).all()
+    assert (batch.timer[[1, 3]] == 4).all()
+
+def test_wave_enemies_follow_a_sine_wave():
+    batch, _ = make_batch("basic_wave", 3)
+    initial = batch.initial_change_x[:3].copy()
+    rng = np.random.default_rng(1)
+    for step in range(4):
+        batch.update(rng)
+        sine_input = space_game.WAVE_SINE_START + space_game.WAVE_SINE_STEP * step
+        assert np.allclose(batch.change_x[:3], np.sin(sine_input) * initial)
+
+def test_wait_enemies_stop_shoot_and_zoom_off():
+    batch, _ = make_batch("basic_wait", 1)
+    batch.timer[0] = 1
+    batch.timer_wait[0] = 1
+    batch.shoot_cooldown[0] = 0
+    rng = np.random.default_rng(1)
+    batch.update(rng)
+    batch.update(rng)
+    assert batch.change_y[0] == 0
+    assert batch.shoot(0, rng).tolist() == [0]
+    assert batch.shoot_cooldown[0] == space_game.SHOOT_COOLDOWN // 4
+    batch.update(rng)
+    batch.update(rng)
+    assert batch.zoom[0]
+    low, high = space_game.WAIT_ZOOM_VELOCITY_Y
+    assert low <= batch.change_y[0] <= high
+    assert batch.shoot(0, rng).tolist() == []
+
+def test_dodge_enemies_dart_away_from_close_bullets():
+    batch, _ = make_batch("basic_dodge", 2)
+    batch.dodge_count[:2] = 1
+    projectiles = ProjectileStore()
+    # A bullet just to the right of the first enemy, and none near the second
+    projectiles.spawn(space_game.archetypes["bullet"]["player_basic"],
+                      batch.x[0] + 10, batch.y[0], 0, 0, 0, 1)
+    batch.x[1] = batch.x[0] + 3 * space_game.DODGE_TOLERANCE
+    projectiles.prepare_hits(friendly = True)
+    batch.dodge(projectiles)
+    assert batch.dodging[:2].tolist() == [True, False]
+    assert batch.dodge_count[:2].tolist() == [0, 1]
+
+    rng = np.random.default_rng(1)
+    batch.update(rng)
+    assert batch.change_x[0] == -space_game.DODGE_SPEED
+    for _ in range(space_game.DODGE_TIME):
+        batch.update(rng)
+    assert not batch.dodging[0]
+    assert batch.change_x[0] == 0
+    # No dodges are left, so the bullet is ignored now
+    batch.dodge(projectiles)
+    assert not batch.dodging[0]
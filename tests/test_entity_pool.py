@@ -0,0 +1,82 @@
+import arcade
+
+import space_game
+from space_game import DeferredSpriteList, EntityPool, SpaceGameSimulation
+
+def make_sprite(type):
+    return arcade.SpriteSolidColor(4, 4, arcade.color.WHITE)
+
+# The list's sprites, and the order the index buffer would draw them in
+def get_draw_order(sprite_list):
+    slots = { slot: sprite for sprite, slot in sprite_list.sprite_slot.items() }
+    return [slots[slot] for slot in sprite_list._sprite_index_data[:sprite_list._sprite_index_slots]]
+
+def test_acquire_grows_and_release_waits_for_recycle():
+    pool = EntityPool("Test", make_sprite, ["a", "b"], 2)
+    assert pool.capacity == 4
+    sprites = [pool.acquire("a") for _ in range(3)]
+    assert pool.type_capacity["a"] == 4
+    assert pool.in_use == 3
+    assert not any(sprite.in_pool for sprite in sprites)
+
+    pool.release(sprites[0])
+    pool.release(sprites[0])
+    assert pool.in_use == 2
+    assert sprites[0] not in pool.free["a"]
+    pool.recycle()
+    assert sprites[0] in pool.free["a"]
+    assert pool.high_water_mark == 3
+
+def test_compact_matches_removing_one_at_a_time():
+    pool = EntityPool("Test", make_sprite, ["a"], 8)
+    deferred = DeferredSpriteList()
+    plain = arcade.SpriteList()
+    sprites = [pool.acquire("a") for _ in range(8)]
+    for sprite in sprites:
+        deferred.append(sprite)
+        plain.append(sprite)
+    # Pooled sprites are only meant to be in DeferredSpriteLists, so the
+    # plain list gives its sprites up first
+    for sprite in sprites[1::3]:
+        plain.remove(sprite)
+        pool.release(sprite)
+    assert len(deferred) == 8
+    deferred.compact()
+    pool.recycle()
+
+    assert deferred.sprite_list == plain.sprite_list
+    assert get_draw_order(deferred) == deferred.sprite_list
+    assert all(deferred not in sprite.sprite_lists for sprite in sprites[1::3])
+    assert not deferred.dead
+
+    # Appending reuses the freed buffer slots and draws after the rest
+    reused = pool.acquire("a")
+    deferred.append(reused)
+    assert deferred.sprite_list[-1] is reused
+    assert get_draw_order(deferred) == deferred.sprite_list
+
+def test_set_order():
+    sprite_list = DeferredSpriteList()
+    sprites = [make_sprite(None) for _ in range(5)]
+    for sprite in sprites:
+        sprite_list.append(sprite)
+    order = sprites[::-1]
+    sprite_list.set_order(order)
+    assert sprite_list.sprite_list == order
+    assert get_draw_order(sprite_list) == order
+
+# Growing a pool creates sprites without making random decisions, so a game
+# plays out the same however large its pools are
+def test_pool_size_does_not_change_seeded_game():
+    checksums = []
+    for extra in (0, 50):
+        game = SpaceGameSimulation(7)
+        game.setup()
+        for type in space_game.ENEMY_STATS:
+            game.enemy_pool.grow(type, extra)
+        for tick in range(1500):
+            if tick % 10 == 0:
+                game.on_key_press(arcade.key.SPACE, 0)
+            game.tick()
+        checksums.append(game.get_checksum())
+    assert checksums[0] == checksums[1]
@@ -0,0 +1,25 @@
+import space_game
+from space_game import DeferredSpriteList, ExplosionPool
+
+def acquire(pool, explosion_list):
+    explosion = pool.acquire(space_game.EXPLOSION_SMALL_FILENAME, 0.5, 3, 0, 0)
+    explosion_list.append(explosion)
+    return explosion
+
+# An exhausted pool steals its oldest explosion. If that explosion was
+# released earlier in the same tick, it must survive the end of tick compact.
+def test_steal_explosion_released_same_tick():
+    pool = ExplosionPool(2)
+    explosion_list = DeferredSpriteList()
+    oldest = acquire(pool, explosion_list)
+    acquire(pool, explosion_list)
+    pool.release(oldest)
+
+    stolen = acquire(pool, explosion_list)
+    explosion_list.compact()
+    pool.recycle()
+
+    assert stolen is oldest
+    assert not stolen.in_pool
+    assert stolen in explosion_list
+    assert len(pool.active) == len(explosion_list) == 2
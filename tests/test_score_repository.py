@@ -0,0 +1,67 @@
+import os
+import sqlite3
+
+import pytest
+
+import space_game
+from space_game import ScoreRepository
+
+@pytest.fixture
+def save_file(tmp_path, monkeypatch):
+    filename = str(tmp_path / "save.db")
+    monkeypatch.setattr(space_game, "DB_FILENAME", filename)
+    monkeypatch.setattr(space_game, "save_db", None)
+    monkeypatch.setattr(space_game, "score_repository", None)
+    space_game.init_save()
+    yield filename
+    space_game.score_repository.close()
+
+# Paging through every score gives them all, highest first and ties newest
+# first, with none skipped or repeated across page boundaries
+def test_pages_cover_every_score_in_order(save_file):
+    repository = space_game.score_repository
+    for index in range(37):
+        repository.add(f"P{index:02}", 1000 * (index % 7))
+    pages = [repository.get_page()]
+    while len(pages[-1]) == space_game.LEADERBOARD_SIZE:
+        pages.append(repository.get_page(pages[-1][-1]))
+    rows = [row for page in pages for row in page]
+
+    db = sqlite3.connect(save_file)
+    expected = db.execute("SELECT ID, NAME, SCORE FROM SCORES ORDER BY SCORE DESC, ID DESC").fetchall()
+    db.close()
+    assert rows == expected
+    assert len(rows) == 47
+
+def test_leaderboard_is_cached_until_a_score_is_added(save_file):
+    repository = space_game.score_repository
+    leaderboard = repository.get_leaderboard()
+    assert repository.get_leaderboard() is leaderboard
+    assert leaderboard[-1][2] == 3900
+
+    repository.add("NEW", 20000)
+    leaderboard = repository.get_leaderboard()
+    assert leaderboard[0][1:] == ("NEW", 20000)
+    assert leaderboard[-1][2] == 4100
+
+def test_high_score_must_beat_the_lowest_on_the_leaderboard(save_file):
+    repository = space_game.score_repository
+    assert not repository.is_high_score(3900)
+    assert repository.is_high_score(3901)
+
+def test_scores_are_written_by_close(save_file):
+    space_game.score_repository.add("END", 99999)
+    space_game.score_repository.close()
+    repository = space_game.score_repository = ScoreRepository(save_file)
+    assert repository.get_leaderboard()[0][1:] == ("END", 99999)
+
+# Resetting closes the old connections first, and removes the write ahead
+# log with the database so none of the old scores come back
+def test_reset_replaces_the_save_file(save_file):
+    space_game.score_repository.add("OLD", 99999)
+    space_game.score_repository.flush()
+    assert os.path.exists(save_file + "-wal")
+    space_game.init_save(True)
+    leaderboard = space_game.score_repository.get_leaderboard()
+    assert [name for _, name, _ in leaderboard].count("OLD") == 0
+    assert len(leaderboard) == space_game.LEADERBOARD_SIZE
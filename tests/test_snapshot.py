@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+import space_game
+from space_game import Replay, SpaceGameSimulation
+
+KEYS = [space_game.arcade.key.LEFT, space_game.arcade.key.RIGHT,
+        space_game.arcade.key.UP, space_game.arcade.key.SPACE]
+
+# Presses and releases random keys every few ticks, the same way for the
+# same seed, and returns the checksum after every tick
+def play(game, ticks, seed):
+    rng = random.Random(seed)
+    checksums = []
+    for tick in range(ticks):
+        if tick % 15 == 0:
+            key = rng.choice(KEYS)
+            if rng.random() < 0.6:
+                game.on_key_press(key, 0)
+            else:
+                game.on_key_release(key, 0)
+        game.tick()
+        checksums.append(game.get_checksum())
+    return checksums
+
+def make_game(seed):
+    game = SpaceGameSimulation(seed)
+    game.setup()
+    game.player.health = game.player.health_max = 10 ** 6
+    return game
+
+def test_replay_plays_back_the_same(tmp_path):
+    game = SpaceGameSimulation(3)
+    game.setup()
+    game.start_recording()
+    play(game, 3000, 3)
+    filename = str(tmp_path / "game.rec")
+    game.replay.save(filename)
+
+    ticks, _, mismatch_tick = space_game.play_replay(Replay.load(filename))
+    assert ticks == game.tick_count
+    assert mismatch_tick is None
+
+# A snapshot restored into the game it came from, or into another game in
+# any state, carries on exactly as the original did
+@pytest.mark.parametrize("other_seed", [None, 99])
+def test_snapshot_round_trip(other_seed):
+    game = make_game(5)
+    play(game, 1200, 5)
+    snapshot = game.get_snapshot()
+    expected = play(game, 1200, 6)
+
+    target = game if other_seed is None else make_game(other_seed)
+    if other_seed is not None:
+        play(target, 700, other_seed)
+    target.restore_snapshot(snapshot)
+    assert target.get_snapshot() == snapshot
+    assert play(target, 1200, 6) == expected
+
+def test_restore_keeps_health_ints():
+    game = make_game(5)
+    play(game, 1500, 5)
+    game.restore_snapshot(game.get_snapshot())
+    for sprite in list(game.enemy_list) + list(game.obstacle_list):
+        assert type(sprite.health) is int
+
+@pytest.mark.parametrize("corrupt", [
+    lambda snapshot: snapshot[:len(snapshot) // 2],
+    lambda snapshot: snapshot + b"\0",
+    lambda snapshot: b"junk",
+])
+def test_bad_snapshot_leaves_game_unchanged(corrupt):
+    game = make_game(5)
+    play(game, 900, 5)
+    snapshot = game.get_snapshot()
+    before = game.get_checksum()
+    with pytest.raises((ValueError, IndexError, space_game.struct.error)):
+        game.restore_snapshot(corrupt(snapshot))
+    assert game.get_checksum() == before
+    assert game.get_snapshot() == snapshot
@@ -0,0 +1,16 @@
+import space_game
+from space_game import TelemetryStore
+
+def make_run(stage_ticks):
+    return {"seed": 1, "score": 100, "kills": 2, "stage": len(stage_ticks),
+            "enemies_spawned": 5, "ticks": sum(stage_ticks), "death_cause": "enemy",
+            "collected": {}, "damage_taken": {}, "stage_ticks": stage_ticks}
+
+# Stage times are the average ticks spent in each stage, in seconds
+def test_stage_times(tmp_path):
+    store = TelemetryStore(str(tmp_path / "telemetry.db"))
+    store.record_run(make_run([space_game.TICK_RATE * 10, space_game.TICK_RATE * 4]))
+    store.record_run(make_run([space_game.TICK_RATE * 20]))
+    store.flush()
+    assert store.get_stage_times() == [(1, 2, 15.0), (2, 1, 4.0)]
+    store.close()